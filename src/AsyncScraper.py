@@ -0,0 +1,266 @@
+"""
+Concurrent variant of the Scraper class built on asyncio.
+
+Requests are still sent through the pooled `requests.Session`, but they run
+on a thread pool so that many pages can be in flight at once. A single
+HostRateLimiter, the same one Scraper waits on, spaces out request starts
+across all of them. Failed requests are retried like Scraper.fetch, but a request waiting out its
+backoff does not hold one of the max_in_flight slots.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+from time import perf_counter
+
+from bs4 import BeautifulSoup
+import requests
+
+from Exceptions import InvalidPageError
+from HtmlCache import find_page
+from Profiler import profiler
+from Scraper import Scraper
+
+
+class CrawlStats:
+    """Throughput and latency counters for a crawl.
+
+    Attributes:
+        latencies (List (float)) -- Seconds spent on each request.
+        bytes_fetched (int) -- Total size of all response bodies.
+        retries (int) -- Failed requests that were sent again.
+
+    Methods:
+        __init__ (None) -- Initialize empty counters.
+        start (None) -- Mark the start of the crawl.
+        record (None) -- Record one finished request.
+        summary (dict) -- Pages, pages/sec and latency percentiles.
+    """
+
+    def __init__(self):
+        """Initialize CrawlStats."""
+        self.latencies = []
+        self.bytes_fetched = 0
+        self.retries = 0
+        self._start = perf_counter()
+
+
+    def start(self):
+        """Mark the start of the crawl. Returns: None"""
+        self._start = perf_counter()
+        return None
+
+
+    def record(self, latency, nbytes):
+        """Record one finished request.
+
+        Arguments:
+            latency (float) -- Seconds between sending the request and receiving the body.
+            nbytes (int) -- Size of the response body.
+
+        Returns: None
+        """
+        self.latencies.append(latency)
+        self.bytes_fetched += nbytes
+        return None
+
+
+    def summary(self):
+        """Summarize the crawl so far.
+
+        Returns: dict with pages, elapsed seconds, pages/sec, bytes, retries
+            and p50/p95/p99/max request latency in seconds.
+        """
+        elapsed = perf_counter() - self._start
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+        return {
+            'pages': len(latencies),
+            'elapsed': elapsed,
+            'pages_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+            'bytes': self.bytes_fetched,
+            'retries': self.retries,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': latencies[-1] if latencies else 0.0,
+        }
+
+
+class AsyncScraper(Scraper):
+    """Scraper that keeps a bounded number of requests in flight.
+
+    fetch, make_soup and write_html take the arguments of their Scraper
+    counterparts but are coroutines, so every caller must await them.
+
+    Attributes:
+        stats (CrawlStats) -- Throughput and latency of every fetch.
+
+    Methods:
+        __init__ (None) -- Initialize scraper.
+        fetch (bytes) -- Fetch raw html from given url.
+        make_soup (BeautifulSoup object) -- Fetch and parse html from given url.
+        write_html (bytes) -- Write given url to disc at specified path.
+        crawl (None) -- Write many (url, path) pairs concurrently.
+        close (None) -- Shut down the worker threads.
+    """
+
+    def __init__(self, *, use_VPN=False, encoding='utf-8', crawl_delay=5, compress=False,
+                 retry=None, timeout=30, jitter=0, min_crawl_delay=None, rate_limiter=None,
+                 http_cache=None, max_in_flight=8):
+        """Initialize AsyncScraper class.
+
+        Keyword arguments:
+            use_VPN (bool) -- Whether to use VPN headers in request. (default False)
+            encoding (str) -- Which encoding to use when writing html to disk. (default 'utf-8')
+            crawl_delay (int, float) -- Seconds between request starts on one host. (default 5)
+            compress (bool) -- Store raw responses gzip-compressed. See HtmlCache. (default False)
+            retry (RetryPolicy) -- When to retry failed requests. (default RetryPolicy())
+            timeout (int, float) -- Seconds to wait for the server before a request fails. (default 30)
+            jitter (int, float) -- Randomly stretch each crawl delay by up to this share. (default 0)
+            min_crawl_delay (int, float) -- Shortest crawl delay while the site is healthy. (default crawl_delay)
+            rate_limiter (HostRateLimiter) -- Limiter shared with other scrapers. (default None)
+            http_cache (HttpCache) -- Cache of validators and bodies for conditional requests. (default None)
+            max_in_flight (int) -- Maximum number of concurrent requests. (default 8)
+
+        Returns: None
+        """
+        Scraper.__init__(self, use_VPN=use_VPN, encoding=encoding, crawl_delay=crawl_delay,
+                         compress=compress, retry=retry, timeout=timeout, jitter=jitter,
+                         min_crawl_delay=min_crawl_delay, rate_limiter=rate_limiter,
+                         http_cache=http_cache)
+        assert isinstance(max_in_flight, int), TypeError('max_in_flight parameter must be a positive int')
+        assert max_in_flight > 0, TypeError('max_in_flight parameter must be a positive int')
+
+        self._max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._in_flight = None
+        self.stats = CrawlStats()
+
+        return None
+
+
+    async def fetch(self, url):
+        """Fetch raw html from a given url, retrying transient failures
+        and answering from the http cache like Scraper.fetch.
+
+        Arguments:
+            url (str) -- Full url to site.
+
+        Returns: bytes
+        """
+        assert isinstance(url, str), TypeError('`url` must be a string')
+        content = self._frozen_body(url)
+        if content is not None:
+            return content
+        # The semaphore must belong to the running event loop.
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self._max_in_flight)
+
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            async with self._in_flight:
+                with profiler.timer('scraper.rate_limit'):
+                    await self._limiter.acquire(url)
+                start = perf_counter()
+                r, err = None, None
+                try:
+                    r = await loop.run_in_executor(self._executor, self._get, url)
+                    content = await loop.run_in_executor(self._executor, self._content, url, r)
+                except (requests.exceptions.RequestException, InvalidPageError) as e:
+                    err = e
+                latency = perf_counter() - start
+                self._record(url, r, latency)
+            profiler.add_time('scraper.fetch', latency, url)
+            if err is None:
+                self.stats.record(latency, len(r.content))
+                return content
+
+            delay = self._retry.backoff(attempt, err)
+            if delay is None:
+                raise err
+            self.stats.retries += 1
+            profiler.count('scraper.retries')
+            with profiler.timer('scraper.backoff'):
+                await asyncio.sleep(delay)
+            attempt += 1
+
+
+    async def make_soup(self, url):
+        """Make a BeautifulSoup object out of html from a given url.
+        Overrides Scraper.make_soup, which would parse the un-awaited
+        coroutine of fetch.
+
+        Arguments:
+            url (str) -- Full url to site.
+
+        Returns: BeautifulSoup object.
+        """
+        content = await self.fetch(url)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._parse, url, content)
+
+
+    def _parse(self, url, content):
+        with profiler.timer('scraper.parse', url):
+            return BeautifulSoup(content, 'html.parser')
+
+
+    async def write_html(self, url, path, *, overwrite=False):
+        """Write html source code from url to user-defined path as encoded byte string.
+        Behaves like Scraper.write_html without blocking the event loop.
+
+        Arguments:
+            url (str) -- Full url to site.
+            path (str) -- Full path to txt file.
+
+        Keyword arguments:
+            overwrite (bool) -- Whether to overwrite existing files. (default False)
+
+        Returns: Raw response bytes, or None if the page was already cached.
+        """
+        assert isinstance(url, str), TypeError('`url` must be a string')
+        assert isinstance(path, str), TypeError('`path` must be a string')
+        assert path.endswith('.txt'), AssertionError('path parameter does not lead to txt file.')
+        assert isinstance(overwrite, bool), TypeError('`overwrite` must be a bool')
+
+        if find_page(path) and (not overwrite or self._is_frozen(url, path)):
+            print('\t{} already exists. File was not overwritten.'\
+                    .format(path), end='\r')
+            return None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        content = await self.fetch(url)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._save_content, content, url, path)
+
+        return content
+
+
+    async def crawl(self, jobs, *, overwrite=False):
+        """Write every (url, path) pair in jobs, keeping at most
+        max_in_flight requests open at once.
+
+        Arguments:
+            jobs (iterable (tuple)) -- (url, path) pairs.
+
+        Keyword arguments:
+            overwrite (bool) -- Whether to overwrite existing files. (default False)
+
+        Returns: None
+        """
+        await asyncio.gather(*(self.write_html(url, path, overwrite=overwrite)
+                               for url, path in jobs))
+        return None
+
+
+    def close(self):
+        """Shut down the worker threads. Returns: None"""
+        self._executor.shutdown(wait=True)
+        return None
@@ -4,25 +4,29 @@ the /html directory. Data will be exported in tab-separated variable format
 to a .txt file named feb-boxscores.txt in the /data directory.
 """
 
+import argparse
+from html.parser import HTMLParser
 import os
+import re
 
 from bs4 import BeautifulSoup
 
-from Miner import Miner
+from Miner import Miner, list_html_files
+from Seasons import html_season_dir, list_seasons, mined_path
 
 class BoxscoreMiner(Miner):
     """BoxscoreMiner Class for mining boxscores.
 
     Attributes:
         COLNAMES -- Column names for the exported data.
+        DTYPES (dict) -- pandas dtype of each column for the Parquet copy.
 
     Methods:
         __init__ (None) -- Initialize class with path for exported data.
         mine_boxscore (List) -- Mine player data. Returns data in nested List.
+        mine_boxscore_fast (List) -- Same as mine_boxscore without building a full DOM.
+        mine (List) -- Alias of mine_boxscore_fast, used by Miner.mine_files.
         write (None) -- Write player data to txt file on disc.
-
-    Todo:
-        Pool multiprocessors to speed up the Miner.
     """
 
     """
@@ -58,15 +62,23 @@ class BoxscoreMiner(Miner):
                 "AST", "STL", "BLK", 
                 "TOV", "PF",  "PTS")
 
-    def __init__(self, data_path):
+    DTYPES = dict({"Date": "datetime64[ns]", "Team": "category",
+                   "Player": "category", "IsStarter": "category"},
+                  **{c: "float64" if c.endswith("pct") else "Int32" for c in COLNAMES[4:]})
+
+    def __init__(self, data_path, *, incremental=False):
         """Initialize BoxscoreMiner.
 
         Arguments:
             data_path (str) -- Relative or absolute path to exported data.
+
+        Keyword arguments:
+            incremental (bool) -- Append rows of new or changed files to existing data. (default False)
         """
-        Miner.__init__(self, data_path)
-        header = '\t'.join(self.COLNAMES) + '\n'
-        self.writer.write(header.encode('utf-8'))
+        Miner.__init__(self, data_path, incremental=incremental)
+        if self.writer is not None and self.writer.tell() == 0:
+            header = '\t'.join(self.COLNAMES) + '\n'
+            self.writer.write(header.encode('utf-8'))
 
 
     def mine_boxscore(self, path):
@@ -92,6 +104,38 @@ class BoxscoreMiner(Miner):
         return self.game_data
 
 
+    def mine_boxscore_fast(self, path):
+        """Mine boxscore specified at path without building a BeautifulSoup tree.
+        Only the h1 title and the last two player tables are parsed. Rows are
+        identical to those of mine_boxscore.
+
+        Arguments:
+            path -- Relative or absolute path to boxscore.
+
+        Returns: Nested list of data.
+        """
+        html = self.read_html(path)
+        date = os.path.split(path)[-1][:10]
+        h1, tables = extract_boxscore(html)
+        away_team, home_team = split_team_names(h1)
+        if len(tables) < 2:
+            raise ValueError('{} has fewer than two player tables.'.format(path))
+
+        home_players = [[date, home_team] + stats for stats in get_stats_from_html(tables[-1])]
+        away_players = [[date, away_team] + stats for stats in get_stats_from_html(tables[-2])]
+
+        self.game_data = home_players + away_players
+        return self.game_data
+
+
+    def mine(self, path):
+        """Mine the boxscore at path. Used by Miner.mine_files.
+
+        Returns: Nested list of data.
+        """
+        return self.mine_boxscore_fast(path)
+
+
     def write(self, sep='\t'):
         """Write collected data to tab.
 
@@ -111,9 +155,9 @@ def get_stats_from_table(table):
     Yields: Row of player data.
     """
     for i, row in enumerate(table.find_all('tr')):
-        player_stats = [col.text for col in row.find_all('td')]
+        player_stats = [col.text.strip() for col in row.find_all('td')]
         if player_stats:
-            player_name = row.find('th').text
+            player_name = row.find('th').text.strip()
             is_starter = "Starter" if i < 5 else "Reserve"
             player_stats.insert(0, player_name)
             player_stats.insert(1, is_starter)
@@ -130,7 +174,14 @@ def get_team_names(soup):
         > get_team_names(string)
         ("Sam Houston State", "Abilene Christian")
     """
-    h1 = soup.h1.text
+    return split_team_names(soup.h1.text)
+
+
+def split_team_names(h1):
+    """Split a boxscore title into team names.
+
+    Returns: Tuple with away team and home team names.
+    """
     teams, date = h1.split('Box Score,')
     away, home = teams.split(' vs. ')
     away = away.strip()
@@ -138,15 +189,138 @@ def get_team_names(soup):
     return (away, home)
 
 
+# Markup the fast path cares about. Comments and script/style bodies are
+# tracked so that commented-out tables are skipped, as html.parser does.
+_BOXSCORE_TOKENS = re.compile(r'<!--|-->|</?(?:script|style|h1|tbody)\b', re.IGNORECASE)
+
+def extract_boxscore(html):
+    """Locate the h1 title and every tbody of a boxscore without parsing it.
+
+    Arguments:
+        html (str) -- Boxscore html as returned by Miner.read_html.
+
+    Returns: Tuple with h1 text and a list of tbody html in document order.
+    """
+    raw_text = None
+    h1 = None
+    h1_start = None
+    tbody_starts = []
+    tbodies = []
+    for match in _BOXSCORE_TOKENS.finditer(html):
+        token = match.group().lower()
+        if raw_text is not None:
+            # Inside a comment or script/style body only its own end counts.
+            if token == raw_text:
+                raw_text = None
+            continue
+
+        if token == '<!--':
+            raw_text = '-->'
+        elif token in ('<script', '<style'):
+            raw_text = '</' + token[1:]
+        elif token == '<h1' and h1_start is None:
+            h1_start = match.start()
+        elif token == '</h1' and h1 is None and h1_start is not None:
+            h1 = html[h1_start:html.index('>', match.end()) + 1]
+        elif token == '<tbody':
+            tbody_starts.append(match.start())
+        elif token == '</tbody' and tbody_starts:
+            start = tbody_starts.pop()
+            tbodies.append((start, html[start:html.index('>', match.end()) + 1]))
+
+    if h1 is None:
+        raise ValueError('Boxscore has no h1 title.')
+    return get_text_from_html(h1), [tbody for start, tbody in sorted(tbodies)]
+
+
+class _TableParser(HTMLParser):
+    """Collects the th and td text of every tr in a fragment of html."""
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.rows = []
+        self._cell = None
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self.rows.append({'th': None, 'td': []})
+        elif self._cell is not None:
+            self._depth += 1 if tag == self._cell[0] else 0
+        elif tag in ('th', 'td') and self.rows:
+            self._cell = (tag, [])
+            self._depth = 1
+
+    def handle_endtag(self, tag):
+        if self._cell is None or tag != self._cell[0]:
+            return
+        self._depth -= 1
+        if self._depth:
+            return
+        tag, text = self._cell
+        row = self.rows[-1]
+        if tag == 'td':
+            row['td'].append(''.join(text).strip())
+        elif row['th'] is None:
+            row['th'] = ''.join(text).strip()
+        self._cell = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell[1].append(data)
+
+
+def get_stats_from_html(table):
+    """A generator which returns stats from tbody html.
+    Same rows as get_stats_from_table.
+
+    Yields: Row of player data.
+    """
+    parser = _TableParser()
+    parser.feed(table)
+    parser.close()
+    for i, row in enumerate(parser.rows):
+        player_stats = row['td']
+        if player_stats:
+            is_starter = "Starter" if i < 5 else "Reserve"
+            yield [row['th'], is_starter] + player_stats
+
+
+def get_text_from_html(fragment):
+    """Get the text of a fragment of html, like BeautifulSoup's .text.
+
+    Returns: str
+    """
+    text = []
+    parser = HTMLParser()
+    parser.handle_data = text.append
+    parser.feed(fragment)
+    parser.close()
+    return ''.join(text)
+
+
 if __name__ == '__main__':
-    miner = BoxscoreMiner("./../data-raw/boxscores-2017.txt")
-    boxscore_dir = "./../html/boxscores/"
-    for root, dirs, files in os.walk(boxscore_dir):
-        for f in files:
-            if f.endswith('txt'):
-                print("Mining", f)
-                try:
-                    miner.mine_boxscore(os.path.join(boxscore_dir, f))
-                    miner.write()
-                except ValueError as err:
-                    print(err)
+    parser = argparse.ArgumentParser(description='Mine boxscores into a tab-separated file.')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help='files handed to a worker at a time (default 16)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only mine files that are new or changed since the last run')
+    parser.add_argument('--parquet', action='store_true',
+                        help='also write a typed Parquet copy of the output')
+    parser.add_argument('--season', type=int, action='append',
+                        help='season to mine, by the year it ends in, may be repeated '
+                             '(default: every season in the html directory)')
+    parser.add_argument('--html-dir', default='./../html/')
+    parser.add_argument('--data-dir', default='./../data-raw/')
+    args = parser.parse_args()
+
+    for season in args.season or list_seasons(args.html_dir):
+        print("Season", season)
+        miner = BoxscoreMiner(mined_path('boxscores', season, args.data_dir), incremental=args.incremental)
+        boxscores_dir = os.path.join(html_season_dir(season, args.html_dir), 'boxscores')
+        miner.mine_files(list_html_files(boxscores_dir), processes=args.processes, chunksize=args.chunksize)
+        if args.parquet:
+            miner.write_columnar()
+        miner.writer.close()
@@ -0,0 +1,186 @@
+"""
+The tournament tree and pairwise win probabilities as integer arrays.
+
+Bracket.csv lists the teams of each first game and ADVANCEMENT_KEY where the
+winner of every game goes next. Bracket numbers teams 0..n-1 in the order
+they appear in Bracket.csv and lists the games so that every game comes
+after the games feeding it, which lets simulators and exact solvers walk
+the tree with array operations instead of merges.
+"""
+
+import numpy as np
+import pandas as pd
+
+from definitions import ADVANCEMENT_KEY, ROUNDS
+from PutIDFiles import parse_matchup_ids, put_team_ids, unpack_matchup_ids
+
+
+class Bracket:
+    """Tournament tree encoded as integer arrays.
+
+    Attributes:
+        teams (np.ndarray (str)) -- Team names. Team i is row i of a win matrix.
+        games (np.ndarray (int)) -- GameIDs of the played games, feeders first.
+        rounds (np.ndarray (int)) -- Round of each game. Its winner reaches ROUNDS[round].
+        slots (np.ndarray (int)) -- Both entrants of each game, shape (games, 2).
+            Values below len(teams) are teams, len(teams) + g is the winner of game g.
+        entry_rounds (np.ndarray (int)) -- Round of the first game of each team.
+
+    Methods:
+        __init__ (None) -- Build the tree from Bracket.csv and ADVANCEMENT_KEY.
+        team_index (np.ndarray) -- Positions of team names.
+        forced_winners (dict) -- Winner of every game decided by known results.
+        win_matrix (np.ndarray) -- Pairwise win probabilities from ScoredMatchups.csv.
+    """
+
+    def __init__(self, bracket='./../data/Bracket.csv', advancement_key=ADVANCEMENT_KEY):
+        """Initialize Bracket.
+
+        Arguments:
+            bracket (str, pd.DataFrame) -- Bracket.csv or its contents.
+            advancement_key (dict) -- Next GameID of each GameID. (default ADVANCEMENT_KEY)
+
+        Returns: None
+        """
+        if isinstance(bracket, str):
+            bracket = pd.read_csv(bracket, index_col=False)
+        self.teams = pd.unique(bracket['TeamName']).astype(object)
+        self._positions = pd.Series(np.arange(len(self.teams)), index=self.teams)
+
+        entrants = {}
+        for GameID, TeamName in zip(bracket['GameID'], bracket['TeamName']):
+            entrants.setdefault(int(GameID), []).append(int(self._positions[TeamName]))
+
+        # Walk up the tree in GameID order, which puts feeders before the
+        # games they feed. A game with one entrant, like the one after the
+        # final, passes its entrant straight on.
+        games, slots = [], []
+        pending = sorted(entrants)
+        while pending:
+            GameID = pending.pop(0)
+            entrant = entrants.pop(GameID)
+            if len(entrant) > 2:
+                raise ValueError('game {} has {} entrants'.format(GameID, len(entrant)))
+            if len(entrant) == 2:
+                games.append(GameID)
+                slots.append(entrant)
+                entrant = [len(self.teams) + len(games) - 1]
+            NextGameID = advancement_key.get(GameID)
+            if NextGameID is None:
+                continue
+            if NextGameID not in entrants:
+                entrants[NextGameID] = []
+                pending.append(NextGameID)
+                pending.sort()
+            entrants[NextGameID].extend(entrant)
+
+        if not games:
+            raise ValueError('bracket has no games')
+        self.games = np.array(games, dtype=np.int64)
+        self.rounds = self.games // 1000 - 20
+        self.slots = np.array(slots, dtype=np.int64)
+        if self.rounds.max() >= len(ROUNDS):
+            raise ValueError('bracket has more rounds than ROUNDS')
+
+        self.entry_rounds = np.full(len(self.teams), -1)
+        for g in range(len(self.games) - 1, -1, -1):
+            for slot in self.slots[g]:
+                if slot < len(self.teams):
+                    self.entry_rounds[slot] = self.rounds[g]
+        if (self.entry_rounds < 0).any():
+            raise ValueError('{} never play'.format(', '.join(self.teams[self.entry_rounds < 0])))
+
+        return None
+
+
+    def __len__(self):
+        return len(self.teams)
+
+
+    def team_index(self, TeamNames):
+        """Positions of team names. Returns: np.ndarray of int"""
+        return self._positions[np.atleast_1d(TeamNames)].to_numpy()
+
+
+    def forced_winners(self, results=None):
+        """Winner of every game decided by known results.
+
+        A team that won a game also won every earlier game on its path, so
+        those games are decided too and their other entrants are out.
+
+        Arguments:
+            results (dict) -- Known winners as {GameID: TeamName}. (default None)
+
+        Errors:
+            ValueError -- A GameID is not in the bracket, a team cannot reach
+                the game it won, or two results disagree on a game's winner.
+
+        Returns: dict mapping game position to team position.
+        """
+        n_teams = len(self.teams)
+        games = dict(zip(self.games.tolist(), range(len(self.games))))
+        # enters[g, i] is whether team i can play in game g
+        enters = np.zeros((len(self.games), n_teams), dtype=bool)
+        for g, slots in enumerate(self.slots):
+            for slot in slots:
+                if slot >= n_teams:
+                    enters[g] |= enters[slot - n_teams]
+                else:
+                    enters[g, slot] = True
+
+        forced = {}
+        for GameID, TeamName in (results or {}).items():
+            if GameID not in games:
+                raise ValueError('game {} is not in the bracket'.format(GameID))
+            g, team = games[GameID], int(self.team_index(TeamName)[0])
+            if not enters[g, team]:
+                raise ValueError('{} cannot win game {}'.format(TeamName, GameID))
+            # Walk down the team's path until its first game.
+            while g is not None:
+                if forced.setdefault(g, team) != team:
+                    raise ValueError('{} and {} cannot both win game {}'.format(
+                        self.teams[forced[g]], TeamName, self.games[g]))
+                g = next((slot - n_teams for slot in self.slots[g]
+                          if slot >= n_teams and enters[slot - n_teams, team]), None)
+        return forced
+
+
+    def win_matrix(self, scored_matchups='./../data/ScoredMatchups.csv', Teams=None):
+        """Matrix P with P[i, j] the probability that team i beats team j.
+
+        Pred is used when scored_matchups has it and PredWin otherwise. Pairs
+        that are missing or unscored are even. Pairs are matched by packed
+        MatchupKey, parsed from MatchupID when missing, and TeamIDs are
+        looked up by array index.
+
+        Arguments:
+            scored_matchups (str, pd.DataFrame) -- ScoredMatchups.csv or its contents.
+            Teams (pd.DataFrame) -- TeamName and TeamID of each team. (default put_team_ids())
+
+        Returns: np.ndarray of float, shape (teams, teams)
+        """
+        if isinstance(scored_matchups, str):
+            scored_matchups = pd.read_csv(scored_matchups, index_col=False)
+        if Teams is None:
+            Teams = put_team_ids(verbose=False)
+        column = 'Pred' if 'Pred' in scored_matchups.columns else 'PredWin'
+
+        # Position in this bracket of every TeamID, -1 for teams not in it
+        ids = Teams['TeamID'].to_numpy(dtype=np.int64)
+        positions = np.full(ids.max() + 2, -1)
+        positions[ids] = self._positions.reindex(Teams['TeamName']).fillna(-1).astype(int).to_numpy()
+        if 'MatchupKey' in scored_matchups.columns:
+            keys = scored_matchups['MatchupKey'].to_numpy(dtype=np.int64)
+        else:
+            keys = parse_matchup_ids(scored_matchups['MatchupID'])
+        # Unknown TeamIDs point at the -1 in the last position.
+        TeamID1, TeamID2 = (np.where((i >= 0) & (i <= ids.max()), i, -1) for i in unpack_matchup_ids(keys))
+        first, second = positions[TeamID1], positions[TeamID2]
+        probs = scored_matchups[column].to_numpy(dtype=float)
+        keep = (first >= 0) & (second >= 0) & ~np.isnan(probs)
+
+        P = np.full((len(self.teams), len(self.teams)), 0.5)
+        P[first[keep], second[keep]] = probs[keep]
+        P[second[keep], first[keep]] = 1 - probs[keep]
+        np.fill_diagonal(P, 0.5)
+        return P
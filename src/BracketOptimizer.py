@@ -0,0 +1,242 @@
+"""
+This script can be run from the command line to pick a bracket for a pool:
+
+    python BracketOptimizer.py --opponents 20 --ofile ./../data/Picks.csv
+
+Without --opponents the bracket with the most expected points is picked
+exactly. With --opponents, candidate brackets are played against simulated
+tournaments and simulated opponents, and the one most likely to finish first
+is picked.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from Bracket import Bracket
+from BracketSimulator import BracketSimulator
+from BracketSolver import BracketSolver
+
+# Points for a correct pick in round 0 (First Four), 1, 2, ... in the
+# usual 10-20-40-80-160-320 pool. The First Four is not scored.
+DEFAULT_POINTS = (0, 10, 20, 40, 80, 160, 320)
+
+
+class BracketOptimizer:
+    """Search for the bracket that scores best in a pool.
+
+    A bracket of picks is an array with the picked winner of every game in
+    bracket.games, as team positions.
+
+    Attributes:
+        bracket (Bracket) -- Tournament tree.
+        P (np.ndarray) -- P[i, j] is the probability that team i beats team j.
+        points (np.ndarray) -- Points for a correct pick in each game.
+
+    Methods:
+        __init__ (None) -- Initialize with a bracket, win matrix and scoring.
+        max_expected_picks (np.ndarray) -- Picks with the most expected points.
+        expected_scores (np.ndarray) -- Expected points of brackets.
+        scores (np.ndarray) -- Points of brackets in sampled tournaments.
+        win_probabilities (np.ndarray) -- Chances of brackets finishing first.
+        optimize (tuple) -- Picks most likely to finish first against opponents.
+        to_frame (pd.DataFrame) -- Picks as a table.
+    """
+
+    def __init__(self, bracket, P, points=DEFAULT_POINTS):
+        """Initialize BracketOptimizer.
+
+        Arguments:
+            bracket (Bracket) -- Tournament tree.
+            P (np.ndarray) -- Win matrix, e.g. bracket.win_matrix().
+            points (tuple (int)) -- Points for a correct pick in each round, First
+                Four first. (default DEFAULT_POINTS)
+
+        Errors:
+            ValueError -- points has fewer values than the bracket has rounds.
+
+        Returns: None
+        """
+        if len(points) <= bracket.rounds.max():
+            raise ValueError('points needs {} values, one per round from the First Four on, got {}'
+                             .format(bracket.rounds.max() + 1, len(points)))
+        self.bracket = bracket
+        self.P = np.asarray(P, dtype=float)
+        self.points = np.asarray(points, dtype=float)[bracket.rounds]
+        self._simulator = BracketSimulator(bracket, self.P)
+        # Probability of each team winning each game
+        self._winners = BracketSolver(bracket, self.P).game_winners()
+        return None
+
+
+    def max_expected_picks(self, champion=None):
+        """Picks with the most expected points, found exactly by keeping the
+        best value of every subtree for every team that could win it.
+
+        Arguments:
+            champion (str) -- Force the winner of the last game. (default None)
+
+        Returns: np.ndarray of team positions, one per game.
+        """
+        n_teams = len(self.bracket)
+        n_games = len(self.bracket.games)
+        # best[g, t] -- most expected points from game g and its feeders
+        # when t wins game g, -inf when t cannot.
+        best = np.full((n_games, n_teams), -np.inf)
+
+        def slot_values(slot):
+            if slot >= n_teams:
+                return best[slot - n_teams]
+            values = np.full(n_teams, -np.inf)
+            values[slot] = 0.0
+            return values
+
+        for g, (a, b) in enumerate(self.bracket.slots):
+            va, vb = slot_values(a), slot_values(b)
+            best[g] = self.points[g] * self._winners[g] + np.where(np.isfinite(va), va + vb.max(), vb + va.max())
+
+        picks = np.empty(n_games, dtype=np.int64)
+        last = best[-1]
+        if champion is not None:
+            team = self.bracket.team_index(champion)[0]
+            last = np.where(np.arange(n_teams) == team, last, -np.inf)
+        picks[-1] = np.argmax(last)
+        # Walk back down: the slot holding the pick keeps it, the other slot
+        # takes its own best team.
+        for g in range(n_games - 1, -1, -1):
+            for slot in self.bracket.slots[g]:
+                if slot < n_teams:
+                    continue
+                child = slot - n_teams
+                picks[child] = picks[g] if np.isfinite(best[child, picks[g]]) else np.argmax(best[child])
+        return picks
+
+
+    def expected_scores(self, picks):
+        """Expected points of brackets, exact under the win matrix.
+
+        Arguments:
+            picks (np.ndarray) -- One bracket, or many with shape (brackets, games).
+
+        Returns: np.ndarray of float, one per bracket.
+        """
+        picks = np.atleast_2d(picks)
+        return (self._winners[np.arange(picks.shape[1]), picks] * self.points).sum(axis=1)
+
+
+    def scores(self, picks, outcomes, batch_size=256):
+        """Points of brackets in sampled tournaments.
+
+        Arguments:
+            picks (np.ndarray) -- Brackets, shape (brackets, games).
+            outcomes (np.ndarray) -- Tournaments from BracketSimulator.sample.
+
+        Keyword arguments:
+            batch_size (int) -- Brackets scored at a time. (default 256)
+
+        Returns: np.ndarray, shape (brackets, tournaments)
+        """
+        picks = np.atleast_2d(picks)
+        scores = np.zeros((len(picks), len(outcomes)))
+        for start in range(0, len(picks), batch_size):
+            batch = picks[start:start + batch_size]
+            for g in range(picks.shape[1]):
+                if self.points[g]:
+                    scores[start:start + batch_size] += self.points[g] * (batch[:, g, None] == outcomes[None, :, g])
+        return scores
+
+
+    def win_probabilities(self, picks, outcomes, opponents):
+        """Chance of each bracket finishing first against the opponents.
+        Ties for first split the win.
+
+        Arguments:
+            picks (np.ndarray) -- Brackets, shape (brackets, games).
+            outcomes (np.ndarray) -- Tournaments from BracketSimulator.sample.
+            opponents (np.ndarray) -- Opponent brackets, shape (opponents, games).
+
+        Returns: np.ndarray of float, one per bracket.
+        """
+        scores = self.scores(picks, outcomes)
+        opponent_scores = self.scores(opponents, outcomes)
+        top = opponent_scores.max(axis=0)
+        ties = (opponent_scores == top).sum(axis=0)
+        return (np.where(scores > top, 1.0, 0.0) + np.where(scores == top, 1.0 / (ties + 1), 0.0)).mean(axis=1)
+
+
+    def optimize(self, n_opponents, *, candidates=500, outcomes=10000, public_P=None, seed=None):
+        """Picks most likely to finish first against n_opponents.
+
+        Candidates are the most-expected-points bracket for every team that
+        could be champion plus brackets sampled from the win matrix. Each is
+        scored against the same sampled tournaments and opponents.
+
+        Arguments:
+            n_opponents (int) -- Number of other brackets in the pool.
+
+        Keyword arguments:
+            candidates (int) -- Number of sampled candidate brackets. (default 500)
+            outcomes (int) -- Number of sampled tournaments. (default 10000)
+            public_P (np.ndarray) -- Win matrix opponents pick by. (default P)
+            seed (int) -- Seed for reproducible results. (default None)
+
+        Returns: Tuple of picks and their win probability.
+        """
+        assert isinstance(n_opponents, int) and n_opponents > 0, TypeError('n_opponents parameter must be a positive int')
+        rng = np.random.default_rng(seed)
+        public = self._simulator if public_P is None else BracketSimulator(self.bracket, public_P)
+
+        champions = np.flatnonzero(self._winners[-1] > 0)
+        picks = np.vstack([self.max_expected_picks(self.bracket.teams[t]) for t in champions]
+                          + [self._simulator.sample(candidates, rng)])
+        picks = np.unique(picks, axis=0)
+        chances = self.win_probabilities(picks, self._simulator.sample(outcomes, rng),
+                                         public.sample(n_opponents, rng))
+        best = np.argmax(chances)
+        return picks[best], chances[best]
+
+
+    def to_frame(self, picks):
+        """Picks as a table of GameID, Round and Winner. Returns: pd.DataFrame"""
+        return pd.DataFrame({'GameID': self.bracket.games, 'Round': self.bracket.rounds,
+                             'Winner': self.bracket.teams[picks]})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pick the bracket that scores best in a pool.')
+    parser.add_argument('--bracket', default='./../data/Bracket.csv')
+    parser.add_argument('--scored-matchups', default='./../data/ScoredMatchups.csv')
+    parser.add_argument('--points', type=int, nargs='+', default=list(DEFAULT_POINTS),
+                        help='points for a correct pick in each round, e.g. 10 20 40 80 160 320. '
+                             'Give one more value first to score the First Four')
+    parser.add_argument('--opponents', type=int, default=None,
+                        help='maximize the chance of beating this many opponents instead of expected points')
+    parser.add_argument('--candidates', type=int, default=500)
+    parser.add_argument('--outcomes', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--ofile', default=None,
+                        help='csv file to export the picks to')
+    args = parser.parse_args()
+
+    bracket = Bracket(args.bracket)
+    n_rounds = bracket.rounds.max() + 1
+    if len(args.points) == n_rounds - 1:
+        # The First Four is not scored.
+        args.points = [0] + args.points
+    elif len(args.points) != n_rounds:
+        parser.error('--points needs {} values, or {} with the First Four first, got {}'
+                     .format(n_rounds - 1, n_rounds, len(args.points)))
+    optimizer = BracketOptimizer(bracket, bracket.win_matrix(args.scored_matchups), args.points)
+    if args.opponents:
+        picks, chance = optimizer.optimize(args.opponents, candidates=args.candidates,
+                                           outcomes=args.outcomes, seed=args.seed)
+        print('Chance of finishing first: {:.4f}'.format(chance))
+    else:
+        picks = optimizer.max_expected_picks()
+    print('Expected points: {:.1f}'.format(optimizer.expected_scores(picks)[0]))
+    print('Champion:', bracket.teams[picks[-1]])
+
+    Picks = optimizer.to_frame(picks)
+    if args.ofile:
+        Picks.to_csv(args.ofile, index=False)
@@ -0,0 +1,483 @@
+"""
+This script can be run from the command line to answer bracket and matchup
+queries over HTTP from memory:
+
+    python BracketServer.py --port 8080
+
+    curl "http://127.0.0.1:8080/probability?team1=Villanova&team2=Duke"
+    curl "http://127.0.0.1:8080/advancement?team=Gonzaga"
+    curl "http://127.0.0.1:8080/simulate?n=10000&seed=1"
+    curl "http://127.0.0.1:8080/metrics"
+
+Run `python MatchupScorer.py` first to write ScoredMatchups.csv with full
+probabilities in Pred, or pass --params to score pairs with the saved logit.
+A ScoredMatchups.csv with only 0/1 PredWin picks is refused, since every
+game would be decided in advance.
+
+Teams, scored matchups and the tournament tree of Bracket.csv and
+ADVANCEMENT_KEY are loaded once at startup, and exact advancement odds are
+solved then too, so queries are lookups or a batch of simulated brackets.
+Every response is JSON. With --load-test the server is started in-process and
+hit with concurrent keep-alive clients:
+
+    python BracketServer.py --load-test 5000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+from time import perf_counter
+from urllib.parse import parse_qs, quote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from Bracket import Bracket
+from BracketSimulator import BracketSimulator
+from BracketSolver import BracketSolver
+from MatchupScorer import MatchupScorer
+from PutIDFiles import pack_matchup_ids, parse_matchup_ids, put_team_ids
+
+# Responses of each status code
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+# Paths with their own metrics. Requests for any other path are counted under UNKNOWN_ENDPOINT.
+ENDPOINTS = frozenset({'/probability', '/advancement', '/simulate', '/metrics', '/health'})
+UNKNOWN_ENDPOINT = '<unknown>'
+
+
+class HTTPError(Exception):
+    """Error answered with an HTTP status code and a JSON message."""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class RequestStats:
+    """Request counts and latencies by endpoint.
+
+    Methods:
+        __init__ (None) -- Initialize empty counters.
+        record (None) -- Record one answered request.
+        summary (dict) -- Requests, requests/sec, errors and latency percentiles per endpoint.
+    """
+
+    def __init__(self):
+        """Initialize RequestStats."""
+        self._latencies = {}
+        self._errors = {}
+        self._start = perf_counter()
+
+
+    def record(self, endpoint, latency, status):
+        """Record one answered request.
+
+        Arguments:
+            endpoint (str) -- Path of the request, e.g. '/probability'.
+            latency (float) -- Seconds from reading the request to writing the response.
+            status (int) -- HTTP status code of the response.
+
+        Returns: None
+        """
+        self._latencies.setdefault(endpoint, []).append(latency)
+        if status >= 400:
+            self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+        return None
+
+
+    def summary(self):
+        """Summarize requests so far.
+
+        Returns: dict with uptime and, for every endpoint, requests,
+            requests/sec, errors and p50/p95/p99/max latency in milliseconds.
+        """
+        elapsed = perf_counter() - self._start
+        endpoints = {}
+        for endpoint, latencies in sorted(self._latencies.items()):
+            endpoints[endpoint] = dict(latency_summary(latencies), requests=len(latencies),
+                                       requests_per_sec=len(latencies) / elapsed if elapsed else 0.0,
+                                       errors=self._errors.get(endpoint, 0))
+        return {'uptime': elapsed, 'endpoints': endpoints}
+
+
+def endpoint_of(target):
+    """Endpoint of a request target to record metrics under, so unknown
+    paths do not each get their own. Returns: str"""
+    path = urlsplit(target).path.rstrip('/') or '/'
+    return path if path in ENDPOINTS else UNKNOWN_ENDPOINT
+
+
+def latency_summary(latencies):
+    """p50/p95/p99/max of latencies in seconds, as milliseconds. Returns: dict"""
+    latencies = sorted(latencies)
+
+    def percentile(q):
+        if not latencies:
+            return 0.0
+        return 1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {'p50_ms': percentile(0.50), 'p95_ms': percentile(0.95), 'p99_ms': percentile(0.99),
+            'max_ms': 1000 * latencies[-1] if latencies else 0.0}
+
+
+class BracketServer:
+    """Asynchronous HTTP service for matchup and bracket queries.
+
+    Endpoints, all GET:
+        /probability?team1=A&team2=B -- Probability that A beats B. Teams are
+            names, or TeamIDs with id1 and id2. Unscored pairs of bracket
+            teams get the even odds of the win matrix with scored false.
+        /advancement?team=A -- Exact probability of A reaching each round.
+        /simulate?n=N&seed=S -- Share of N simulated brackets in which each
+            team reached each round, and the most frequent champions.
+        /metrics -- Request counts and latencies per endpoint.
+        /health -- Whether the server is up.
+
+    Attributes:
+        bracket (Bracket) -- Tournament tree.
+        P (np.ndarray) -- Win matrix of the bracket's teams.
+        advancement (pd.DataFrame) -- Exact advancement odds of every bracket team.
+        stats (RequestStats) -- Latency of every request.
+        url (str) -- Root url once started, ending in '/'.
+
+    Methods:
+        __init__ (None) -- Load teams, scores and the tree into memory.
+        probability (float) -- Probability that one team beats another.
+        simulate (dict) -- Advancement shares over simulated brackets.
+        handle (tuple) -- Answer one request path.
+        start (None) -- Listen for connections on the running event loop.
+        stop (None) -- Stop listening.
+    """
+
+    def __init__(self, bracket='./../data/Bracket.csv', scored_matchups='./../data/ScoredMatchups.csv',
+                 *, Teams=None, scorer=None, max_simulations=1000000):
+        """Initialize BracketServer.
+
+        Arguments:
+            bracket (str, pd.DataFrame) -- Bracket.csv or its contents.
+            scored_matchups (str, pd.DataFrame) -- ScoredMatchups.csv or its contents.
+
+        Keyword arguments:
+            Teams (pd.DataFrame) -- TeamName and TeamID of each team. (default put_team_ids())
+            scorer (MatchupScorer) -- Scorer with teams set, used instead of
+                scored_matchups for every pair. (default None)
+            max_simulations (int) -- Most brackets one /simulate request may ask for. (default 1000000)
+
+        Errors:
+            ValueError -- scored_matchups has no Pred column and no scorer is given.
+
+        Returns: None
+        """
+        assert isinstance(max_simulations, int) and max_simulations > 0, \
+            TypeError('max_simulations parameter must be a positive int')
+        if Teams is None:
+            Teams = put_team_ids(verbose=False)
+        if isinstance(scored_matchups, str):
+            scored_matchups = pd.read_csv(scored_matchups, index_col=False)
+        if scorer is None and 'Pred' not in scored_matchups.columns:
+            raise ValueError('scored matchups have no Pred column, only 0/1 PredWin picks. '
+                             'Run `python MatchupScorer.py` to score them, or pass --params.')
+        self._team_ids = dict(zip(Teams['TeamName'].astype(str), Teams['TeamID'].astype(int)))
+        self._team_names = {TeamID: TeamName for TeamName, TeamID in self._team_ids.items()}
+        self._scorer = scorer
+        self.max_simulations = max_simulations
+
+        # Probability that TeamID1 wins by packed MatchupKey
+        column = 'Pred' if 'Pred' in scored_matchups.columns else 'PredWin'
+        keys = parse_matchup_ids(scored_matchups['MatchupID'])
+        probs = scored_matchups[column].to_numpy(dtype=float)
+        self._scores = dict(zip(keys[~np.isnan(probs)].tolist(), probs[~np.isnan(probs)].tolist()))
+
+        self.bracket = Bracket(bracket)
+        if scorer is not None:
+            self.P = scorer.matrix([self._team_ids[t] for t in self.bracket.teams])
+            self.P = np.where(np.isnan(self.P), 0.5, self.P)
+        else:
+            self.P = self.bracket.win_matrix(scored_matchups, Teams)
+        self.advancement = BracketSolver(self.bracket, self.P).advancement()
+        self._advancement = {team: {r: float(p) for r, p in row.items()}
+                             for team, row in self.advancement.iterrows()}
+        self._simulator = BracketSimulator(self.bracket, self.P)
+
+        self.stats = RequestStats()
+        self.url = None
+        self._server = None
+        return None
+
+
+    def probability(self, TeamID1, TeamID2):
+        """Probability that TeamID1 beats TeamID2.
+
+        Returns: float, or None when the pair was never scored. A team
+        against itself is never scored.
+        """
+        if TeamID1 == TeamID2:
+            return None
+        if self._scorer is not None:
+            p = self._scorer.probability(TeamID1, TeamID2)
+            return None if p != p else p
+        # Scored pairs are stored once, with the smaller TeamID first.
+        p = self._scores.get(int(pack_matchup_ids(min(TeamID1, TeamID2), max(TeamID1, TeamID2))))
+        if p is None or TeamID1 < TeamID2:
+            return p
+        return 1 - p
+
+
+    def simulate(self, n, seed=None):
+        """Share of n simulated brackets in which each team reached each round.
+
+        Returns: dict with n, the ten most frequent champions and advancement by team.
+        """
+        Advancement = self._simulator.simulate(n, seed=seed, batch_size=min(n, 100000))
+        last = Advancement.columns[-1]
+        champions = Advancement[last].sort_values(ascending=False).head(10)
+        return {'n': n, 'seed': seed,
+                'champions': {team: float(p) for team, p in champions.items()},
+                'advancement': {team: {r: float(p) for r, p in row.items()}
+                                for team, row in Advancement.iterrows()}}
+
+
+    def _team_id(self, query, name_key, id_key):
+        """TeamID given by name or ID in query parameters."""
+        if id_key in query:
+            try:
+                TeamID = int(query[id_key])
+            except ValueError:
+                raise HTTPError(400, '{} must be an int'.format(id_key))
+            if TeamID not in self._team_names:
+                raise HTTPError(404, 'unknown TeamID {}'.format(TeamID))
+            return TeamID
+        if name_key not in query:
+            raise HTTPError(400, 'missing {} or {}'.format(name_key, id_key))
+        if query[name_key] not in self._team_ids:
+            raise HTTPError(404, 'unknown team {}'.format(query[name_key]))
+        return self._team_ids[query[name_key]]
+
+
+    async def handle(self, target):
+        """Answer one request.
+
+        Arguments:
+            target (str) -- Path and query of the request.
+
+        Returns: Tuple of HTTP status and JSON-serializable body.
+        """
+        parts = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        path = parts.path.rstrip('/') or '/'
+
+        if path == '/probability':
+            TeamID1 = self._team_id(query, 'team1', 'id1')
+            TeamID2 = self._team_id(query, 'team2', 'id2')
+            if TeamID1 == TeamID2:
+                raise HTTPError(400, 'team1 and team2 must be different teams')
+            p = self.probability(TeamID1, TeamID2)
+            team1, team2 = self._team_names[TeamID1], self._team_names[TeamID2]
+            scored = p is not None
+            if not scored:
+                # Bracket teams play unscored pairs at the odds the bracket uses.
+                if team1 not in self._advancement or team2 not in self._advancement:
+                    raise HTTPError(404, 'matchup was not scored')
+                i, j = self.bracket.team_index([team1, team2])
+                p = float(self.P[i, j])
+            return 200, {'team1': team1, 'team2': team2, 'probability': p, 'scored': scored}
+        if path == '/advancement':
+            team = query.get('team')
+            if team is None and 'id' in query:
+                team = self._team_names.get(self._team_id(query, 'team', 'id'))
+            if team not in self._advancement:
+                raise HTTPError(404, 'team {} is not in the bracket'.format(team))
+            return 200, {'team': team, 'rounds': self._advancement[team]}
+        if path == '/simulate':
+            try:
+                n = int(query.get('n', 10000))
+                seed = int(query['seed']) if 'seed' in query else None
+            except ValueError:
+                raise HTTPError(400, 'n and seed must be ints')
+            if not 0 < n <= self.max_simulations:
+                raise HTTPError(400, 'n must be between 1 and {}'.format(self.max_simulations))
+            # Simulating takes a while, so keep the loop free for other requests.
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(None, self.simulate, n, seed)
+        if path == '/metrics':
+            return 200, self.stats.summary()
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        raise HTTPError(404, 'unknown path {}'.format(parts.path))
+
+
+    async def _serve_connection(self, reader, writer):
+        """Answer requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = perf_counter()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    method, target, version = '', '/', 'HTTP/1.0'
+                if headers.get('content-length'):
+                    await reader.readexactly(int(headers['content-length']))
+
+                try:
+                    if method != 'GET':
+                        raise HTTPError(405, 'only GET is supported')
+                    status, body = await self.handle(target)
+                except HTTPError as err:
+                    status, body = err.status, {'error': str(err)}
+                except Exception as err:
+                    status, body = 500, {'error': repr(err)}
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                content = json.dumps(body).encode()
+                writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                             'Connection: {}\r\n\r\n'.format(status, REASONS.get(status, ''), len(content),
+                                                             'keep-alive' if keep_alive else 'close').encode()
+                             + content)
+                await writer.drain()
+                self.stats.record(endpoint_of(target), perf_counter() - start, status)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Listen for connections on the running event loop. Port 0 picks a
+        free port, see url.
+
+        Returns: None
+        """
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        self.url = 'http://{}:{}/'.format(host, port)
+        return None
+
+
+    async def stop(self):
+        """Stop listening. Returns: None"""
+        self._server.close()
+        await self._server.wait_closed()
+        return None
+
+
+async def load_test(url, targets, *, requests=1000, concurrency=8):
+    """Send requests to a running server from concurrent keep-alive clients,
+    cycling through targets.
+
+    Arguments:
+        url (str) -- Root url of the server, e.g. BracketServer.url.
+        targets (List (str)) -- Request paths with queries, e.g. '/health'.
+
+    Keyword arguments:
+        requests (int) -- Total number of requests. (default 1000)
+        concurrency (int) -- Number of clients. (default 8)
+
+    Returns: dict with requests, errors, seconds, requests/sec and latency percentiles.
+    """
+    assert isinstance(concurrency, int) and concurrency > 0, TypeError('concurrency parameter must be a positive int')
+    parts = urlsplit(url)
+    latencies, errors = [], 0
+
+    async def client(k, n):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        try:
+            for i in range(n):
+                target = targets[(k + i * concurrency) % len(targets)]
+                start = perf_counter()
+                writer.write('GET {} HTTP/1.1\r\nHost: {}\r\n\r\n'.format(target, parts.netloc).encode())
+                await writer.drain()
+                status = int((await reader.readline()).split()[1])
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line == b'\r\n':
+                        break
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':')[1])
+                await reader.readexactly(length)
+                latencies.append(perf_counter() - start)
+                errors += status >= 400
+        finally:
+            writer.close()
+
+    start = perf_counter()
+    shares = [len(part) for part in np.array_split(np.arange(requests), concurrency)]
+    await asyncio.gather(*(client(k, n) for k, n in enumerate(shares) if n))
+    elapsed = perf_counter() - start
+    return dict(latency_summary(latencies), requests=len(latencies), errors=errors, seconds=elapsed,
+                requests_per_sec=len(latencies) / elapsed if elapsed else 0.0)
+
+
+def default_targets(server, n_simulations=1000):
+    """Mixed queries over the bracket's teams for load tests. Returns: List of str"""
+    teams = server.bracket.teams
+    rng = np.random.default_rng(0)
+    targets = []
+    for i in range(100):
+        a, b = rng.choice(len(teams), 2, replace=False)
+        targets.append('/probability?team1={}&team2={}'.format(quote(teams[a]), quote(teams[b])))
+        if i % 2 == 0:
+            targets.append('/advancement?team={}'.format(quote(teams[a])))
+        if i % 20 == 0:
+            targets.append('/simulate?n={}&seed={}'.format(n_simulations, i))
+    return targets
+
+
+async def _main(args):
+    scorer = None
+    if args.params:
+        # Any pair of teams with stats, not just the scored ones
+        from FeatureEngine import FeatureEngine
+        from PutModelData import get_model_data
+        scorer = MatchupScorer.load(args.params)
+        engine = FeatureEngine(['FG', 'FGA', 'FT', 'FTA', 'PF', 'ScoreDiff', 'Win'], windows=(3,), cumulative=False)
+        engine.fit_transform(get_model_data().season_game_stats())
+        scorer.set_teams(engine.latest())
+    server = BracketServer(args.bracket, args.scored_matchups, scorer=scorer)
+    await server.start(args.host, 0 if args.load_test else args.port)
+    print('Serving on', server.url)
+    try:
+        if args.load_test:
+            result = await load_test(server.url, default_targets(server), requests=args.load_test,
+                                     concurrency=args.concurrency)
+            print(json.dumps({'client': result, 'server': server.stats.summary()}, indent=2))
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve matchup and bracket queries over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--bracket', default='./../data/Bracket.csv')
+    parser.add_argument('--scored-matchups', default='./../data/ScoredMatchups.csv')
+    parser.add_argument('--params', default=None,
+                        help='saved MatchupScorer coefficients to score any pair with')
+    parser.add_argument('--load-test', type=int, default=0, metavar='REQUESTS',
+                        help='serve on a free port, send this many requests and print latencies')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+    except ValueError as err:
+        parser.error(str(err))
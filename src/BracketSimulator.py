@@ -0,0 +1,174 @@
+"""
+This script can be run from the command line to simulate the tournament many
+times and print how often each team reaches each round:
+
+    python BracketSimulator.py --sims 1000000 --processes 4
+
+Every game of a batch of brackets is decided at once with NumPy, so a
+million brackets take seconds. Batches can be spread across processes.
+"""
+
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from Bracket import Bracket
+from definitions import ROUNDS
+
+
+class BracketSimulator:
+    """Monte Carlo simulator of a Bracket.
+
+    Attributes:
+        bracket (Bracket) -- Tournament tree.
+        P (np.ndarray) -- P[i, j] is the probability that team i beats team j.
+
+    Methods:
+        __init__ (None) -- Initialize with a bracket and win matrix.
+        sample (np.ndarray) -- Winners of every game in a batch of brackets.
+        advancement_counts (np.ndarray) -- Times each team reached each round.
+        simulate (pd.DataFrame) -- Probability of each team reaching each round.
+    """
+
+    def __init__(self, bracket, P):
+        """Initialize BracketSimulator.
+
+        Arguments:
+            bracket (Bracket) -- Tournament tree.
+            P (np.ndarray) -- Win matrix, e.g. bracket.win_matrix().
+
+        Returns: None
+        """
+        assert isinstance(bracket, Bracket), TypeError('bracket parameter must be a Bracket')
+        P = np.asarray(P, dtype=float)
+        assert P.shape == (len(bracket), len(bracket)), ValueError('P must be square with one row per team')
+
+        self.bracket = bracket
+        self.P = P
+        return None
+
+
+    def sample(self, n, rng, forced=None):
+        """Play n brackets.
+
+        Arguments:
+            n (int) -- Number of brackets.
+            rng (np.random.Generator) -- Source of randomness.
+            forced (dict) -- Known winners by game position, from
+                Bracket.forced_winners. (default None)
+
+        Returns: np.ndarray of team positions, shape (n, games). Column g
+            holds the winners of bracket.games[g].
+        """
+        n_teams = len(self.bracket)
+        winners = np.empty((n, len(self.bracket.games)), dtype=np.int16)
+        for g, (a, b) in enumerate(self.bracket.slots):
+            a = np.full(n, a, dtype=np.int16) if a < n_teams else winners[:, a - n_teams]
+            b = np.full(n, b, dtype=np.int16) if b < n_teams else winners[:, b - n_teams]
+            # Draw for decided games too, so other games see the same stream.
+            winners[:, g] = np.where(rng.random(n) < self.P[a, b], a, b)
+            if forced and g in forced:
+                winners[:, g] = forced[g]
+        return winners
+
+
+    def advancement_counts(self, winners):
+        """Count how often each team reached each round in sampled brackets.
+
+        Arguments:
+            winners (np.ndarray) -- Output of sample.
+
+        Returns: np.ndarray of int, shape (teams, len(ROUNDS))
+        """
+        n_teams = len(self.bracket)
+        counts = np.zeros((n_teams, len(ROUNDS)), dtype=np.int64)
+        for r in np.unique(self.bracket.rounds):
+            counts[:, r] = np.bincount(winners[:, self.bracket.rounds == r].ravel(), minlength=n_teams)
+        # Teams that skip round 0 reach ROUNDS[0] without playing, and so on.
+        byes = self.bracket.entry_rounds > 0
+        counts[byes, self.bracket.entry_rounds[byes] - 1] += len(winners)
+        return counts
+
+
+    def simulate(self, n=1000000, *, processes=1, batch_size=100000, seed=None, results=None):
+        """Probability of each team reaching each round over n brackets.
+
+        Batches are split into one shard per process, each with its own
+        random stream, so results for a seed depend on processes.
+
+        Arguments:
+            n (int) -- Number of brackets. (default 1000000)
+
+        Keyword arguments:
+            processes (int) -- Number of worker processes. (default 1)
+            batch_size (int) -- Brackets held in memory at a time per process. (default 100000)
+            seed (int) -- Seed for reproducible results. (default None)
+            results (dict) -- Known winners as {GameID: TeamName}. A known winner
+                also wins every earlier game on its path. (default None)
+
+        Returns: pd.DataFrame indexed by TeamName with one column per round.
+        """
+        assert isinstance(n, int) and n > 0, TypeError('n parameter must be a positive int')
+        assert isinstance(processes, int) and processes > 0, TypeError('processes parameter must be a positive int')
+        assert isinstance(batch_size, int) and batch_size > 0, TypeError('batch_size parameter must be a positive int')
+
+        forced = self.bracket.forced_winners(results)
+        shards = [(len(part), batch_size, seed_seq, forced)
+                  for part, seed_seq in zip(np.array_split(np.arange(n), processes),
+                                            np.random.SeedSequence(seed).spawn(processes))
+                  if len(part)]
+        if processes == 1:
+            counts = [self._simulate_shard(*shard) for shard in shards]
+        else:
+            with Pool(processes, initializer=_init_worker, initargs=(self,)) as pool:
+                counts = pool.starmap(_simulate_in_worker, shards)
+
+        Advancement = pd.DataFrame(sum(counts) / n, index=pd.Index(self.bracket.teams, name='TeamName'),
+                                   columns=ROUNDS)
+        # Drop rounds beyond the last game, e.g. in a bracket without a final.
+        return Advancement.iloc[:, :self.bracket.rounds.max() + 1]
+
+
+    def _simulate_shard(self, n, batch_size, seed_seq, forced=None):
+        """Advancement counts of n brackets played batch_size at a time."""
+        rng = np.random.default_rng(seed_seq)
+        counts = np.zeros((len(self.bracket), len(ROUNDS)), dtype=np.int64)
+        for start in range(0, n, batch_size):
+            counts += self.advancement_counts(self.sample(min(batch_size, n - start), rng, forced))
+        return counts
+
+
+# Each worker process keeps the simulator it was started with.
+_worker_simulator = None
+
+def _init_worker(simulator):
+    global _worker_simulator
+    _worker_simulator = simulator
+
+
+def _simulate_in_worker(n, batch_size, seed_seq, forced=None):
+    return _worker_simulator._simulate_shard(n, batch_size, seed_seq, forced)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate the tournament and print round advancement probabilities.')
+    parser.add_argument('--bracket', default='./../data/Bracket.csv')
+    parser.add_argument('--scored-matchups', default='./../data/ScoredMatchups.csv')
+    parser.add_argument('--sims', type=int, default=1000000)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--ofile', default=None,
+                        help='csv file to export the probabilities to')
+    args = parser.parse_args()
+
+    bracket = Bracket(args.bracket)
+    simulator = BracketSimulator(bracket, bracket.win_matrix(args.scored_matchups))
+    Advancement = simulator.simulate(args.sims, processes=args.processes,
+                                     batch_size=args.batch_size, seed=args.seed)
+    Advancement = Advancement.sort_values(list(Advancement.columns[::-1]), ascending=False)
+    if args.ofile:
+        Advancement.to_csv(args.ofile)
+    print(Advancement.to_string(float_format='{:.4f}'.format))
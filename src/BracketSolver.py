@@ -0,0 +1,124 @@
+"""
+This script can be run from the command line to print the exact probability
+of each team reaching each round:
+
+    python BracketSolver.py --result "20000=Wake Forest"
+
+Winner probabilities are passed up the tree one game at a time, so solving
+the whole bracket takes one matrix-vector product per game. Known results
+can be fixed to see how they change everyone's chances.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from Bracket import Bracket
+from definitions import ROUNDS
+
+
+class BracketSolver:
+    """Exact round advancement probabilities of a Bracket.
+
+    Attributes:
+        bracket (Bracket) -- Tournament tree.
+        P (np.ndarray) -- P[i, j] is the probability that team i beats team j.
+
+    Methods:
+        __init__ (None) -- Initialize with a bracket and win matrix.
+        game_winners (np.ndarray) -- Probability of each team winning each game.
+        advancement (pd.DataFrame) -- Probability of each team reaching each round.
+    """
+
+    def __init__(self, bracket, P):
+        """Initialize BracketSolver.
+
+        Arguments:
+            bracket (Bracket) -- Tournament tree.
+            P (np.ndarray) -- Win matrix, e.g. bracket.win_matrix().
+
+        Returns: None
+        """
+        assert isinstance(bracket, Bracket), TypeError('bracket parameter must be a Bracket')
+        P = np.asarray(P, dtype=float)
+        assert P.shape == (len(bracket), len(bracket)), ValueError('P must be square with one row per team')
+
+        self.bracket = bracket
+        self.P = P
+        return None
+
+
+    def game_winners(self, results=None):
+        """Probability of each team winning each game.
+
+        The entrants of a game come from disjoint parts of the tree, so team i
+        wins game g with probability P(i enters g) * sum_j P(j enters g) * P[i, j],
+        where j runs over the entrants of the other slot.
+
+        A known winner also wins every earlier game on its path, see
+        Bracket.forced_winners.
+
+        Arguments:
+            results (dict) -- Known winners as {GameID: TeamName}. (default None)
+
+        Returns: np.ndarray, shape (games, teams). Row g is bracket.games[g].
+        """
+        n_teams = len(self.bracket)
+        forced = self.bracket.forced_winners(results)
+
+        winners = np.zeros((len(self.bracket.games), n_teams))
+        for g, slots in enumerate(self.bracket.slots):
+            if g in forced:
+                winners[g, forced[g]] = 1.0
+                continue
+            a, b = (winners[slot - n_teams] if slot >= n_teams else np.eye(1, n_teams, slot)[0]
+                    for slot in slots)
+            winners[g] = a * (self.P @ b) + b * (self.P @ a)
+        return winners
+
+
+    def advancement(self, results=None):
+        """Probability of each team reaching each round.
+
+        Arguments:
+            results (dict) -- Known winners as {GameID: TeamName}. (default None)
+
+        Returns: pd.DataFrame indexed by TeamName with one column per round,
+            like BracketSimulator.simulate.
+        """
+        winners = self.game_winners(results)
+        reach = np.zeros((len(self.bracket), len(ROUNDS)))
+        for r in np.unique(self.bracket.rounds):
+            reach[:, r] = winners[self.bracket.rounds == r].sum(axis=0)
+        byes = self.bracket.entry_rounds > 0
+        reach[byes, self.bracket.entry_rounds[byes] - 1] = 1.0
+
+        Advancement = pd.DataFrame(reach, index=pd.Index(self.bracket.teams, name='TeamName'),
+                                   columns=ROUNDS)
+        return Advancement.iloc[:, :self.bracket.rounds.max() + 1]
+
+
+def parse_result(result):
+    """Parse a "GameID=TeamName" command line result. Returns: (int, str)"""
+    GameID, TeamName = result.split('=', 1)
+    return int(GameID), TeamName
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print exact round advancement probabilities.')
+    parser.add_argument('--bracket', default='./../data/Bracket.csv')
+    parser.add_argument('--scored-matchups', default='./../data/ScoredMatchups.csv')
+    parser.add_argument('--result', type=parse_result, action='append', default=[],
+                        help='known winner as GameID=TeamName, may be repeated')
+    parser.add_argument('--ofile', default=None,
+                        help='csv file to export the probabilities to')
+    args = parser.parse_args()
+
+    bracket = Bracket(args.bracket)
+    solver = BracketSolver(bracket, bracket.win_matrix(args.scored_matchups))
+    Advancement = solver.advancement(dict(args.result))
+    Advancement = Advancement.sort_values(list(Advancement.columns[::-1]), ascending=False)
+    if args.ofile:
+        Advancement.to_csv(args.ofile)
+    print(Advancement.to_string(float_format='{:.4f}'.format))
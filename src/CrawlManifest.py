@@ -0,0 +1,231 @@
+"""
+Persistent record of every page the scraper has fetched.
+
+The manifest is a tab-separated log in the html directory with one line per
+fetch attempt. Later lines win, so a page's current state is its last line.
+Reruns use it to skip finished dates and to retry failed or missing pages.
+Lines are flushed as they are written, so it doubles as the checkpoint a
+crashed crawl resumes from. Pages that still failed after every retry are
+also listed in a dead-letter file with their last error.
+"""
+
+import csv
+import datetime
+import hashlib
+import os
+
+from HtmlCache import find_page
+
+
+class CrawlManifest:
+    """Crawl manifest backed by an append-only tsv file.
+
+    Attributes:
+        COLNAMES (tuple (str)) -- Column names of the manifest file.
+        entries (dict) -- Latest entry for each url.
+        errors (dict) -- Last error of each url that failed in this run.
+
+    Methods:
+        __init__ (None) -- Load the manifest, creating it if necessary.
+        record (None) -- Record a fetch attempt.
+        get (dict) -- Latest entry for a url.
+        is_fetched (bool) -- Whether a url was fetched and is still on disk.
+        is_complete (bool) -- Whether a gamesheet and all its boxscores are done.
+        fetched_after (bool) -- Whether a url was last fetched after a given day.
+        children (List (dict)) -- Entries whose parent is the given url.
+        failed (List (dict)) -- Entries whose last fetch failed.
+        write_dead_letters (int) -- Write the failed urls and their errors to a tsv file.
+        compact (None) -- Rewrite the file with one line per url.
+        close (None) -- Close the file.
+    """
+
+    COLNAMES = ('URL', 'Path', 'Parent', 'Status', 'SHA1', 'Fetched')
+    DEAD_LETTER_COLNAMES = ('URL', 'Path', 'Parent', 'Error')
+
+    # Status values
+    OK = 'ok'
+    FAILED = 'failed'
+    COMPLETE = 'complete'
+
+    def __init__(self, path):
+        """Initialize CrawlManifest.
+
+        Arguments:
+            path (str) -- Path to the manifest tsv file.
+
+        Returns: None
+        """
+        self._path = path
+        self.entries = {}
+        self.errors = {}
+        self._children = {}
+        if os.path.exists(path):
+            with open(path, newline='', encoding='utf-8') as f:
+                for entry in csv.DictReader(f, delimiter='\t'):
+                    self._add(entry)
+        else:
+            parent = os.path.dirname(path)
+            if parent and not os.path.exists(parent):
+                os.makedirs(parent)
+
+        self._open()
+        return None
+
+
+    def _add(self, entry):
+        self.entries[entry['URL']] = entry
+        if entry['Parent']:
+            self._children.setdefault(entry['Parent'], {})[entry['URL']] = None
+
+
+    def _open(self):
+        is_new = not os.path.exists(self._path) or os.path.getsize(self._path) == 0
+        self._file = open(self._path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, self.COLNAMES, delimiter='\t')
+        if is_new:
+            self._writer.writeheader()
+            self._file.flush()
+
+
+    def record(self, url, path, status, *, parent='', content=None, error=None):
+        """Record a fetch attempt. The line is flushed immediately so a crash
+        loses nothing.
+
+        Arguments:
+            url (str) -- Full url to site.
+            path (str) -- Path the page was written to.
+            status (str) -- One of OK, FAILED or COMPLETE.
+
+        Keyword arguments:
+            parent (str) -- Url of the gamesheet linking to this page. (default '')
+            content (bytes) -- Fetched body, used for the content hash. (default None)
+            error (Exception) -- Why a FAILED fetch failed. (default None)
+
+        Returns: None
+        """
+        assert status in (self.OK, self.FAILED, self.COMPLETE), ValueError('unknown status {}'.format(status))
+        previous = self.entries.get(url, {})
+        if content is not None:
+            sha1 = hashlib.sha1(content).hexdigest()
+            fetched = datetime.datetime.now().isoformat(timespec='seconds')
+        else:
+            # Keep what is known about the copy already on disk. Pages cached
+            # before the manifest existed are dated by their mtime.
+            sha1 = previous.get('SHA1', '')
+            fetched = previous.get('Fetched', '')
+            cached = find_page(path)
+            if not fetched and cached is not None:
+                mtime = datetime.datetime.fromtimestamp(os.path.getmtime(cached))
+                fetched = mtime.isoformat(timespec='seconds')
+
+        entry = {'URL': url, 'Path': path, 'Parent': parent or previous.get('Parent', ''),
+                 'Status': status, 'SHA1': sha1, 'Fetched': fetched}
+        self._add(entry)
+        if status == self.FAILED:
+            self.errors[url] = '' if error is None else '{}: {}'.format(type(error).__name__, error)
+        else:
+            self.errors.pop(url, None)
+        self._writer.writerow(entry)
+        self._file.flush()
+
+        return None
+
+
+    def get(self, url):
+        """Latest entry for url. Returns: dict, or None if never recorded."""
+        return self.entries.get(url)
+
+
+    def is_fetched(self, url):
+        """Whether url was fetched successfully and is still on disk.
+
+        Returns: bool
+        """
+        entry = self.entries.get(url)
+        return (entry is not None
+                and entry['Status'] in (self.OK, self.COMPLETE)
+                and find_page(entry['Path']) is not None)
+
+
+    def is_complete(self, url):
+        """Whether a gamesheet was marked complete and is still on disk.
+
+        Returns: bool
+        """
+        entry = self.entries.get(url)
+        return (entry is not None
+                and entry['Status'] == self.COMPLETE
+                and find_page(entry['Path']) is not None)
+
+
+    def fetched_after(self, url, date):
+        """Whether url was last fetched on a day after date.
+
+        Arguments:
+            url (str) -- Full url to site.
+            date (datetime) -- Day in question.
+
+        Returns: bool
+        """
+        entry = self.entries.get(url)
+        if entry is None or not entry['Fetched']:
+            return False
+        fetched = datetime.datetime.strptime(entry['Fetched'], '%Y-%m-%dT%H:%M:%S')
+        return fetched.date() > date.date()
+
+
+    def children(self, url):
+        """Entries whose parent is url, e.g. the boxscores of a gamesheet.
+
+        Returns: List of dict
+        """
+        return [self.entries[child] for child in self._children.get(url, ())]
+
+
+    def failed(self):
+        """Entries whose last fetch failed, from this run or earlier ones.
+
+        Returns: List of dict
+        """
+        return [entry for entry in self.entries.values() if entry['Status'] == self.FAILED]
+
+
+    def write_dead_letters(self, path):
+        """Write every url whose last fetch failed to a tsv file, with its
+        last error when it failed in this run. Reruns retry these urls.
+
+        Arguments:
+            path (str) -- Path to the dead-letter tsv file.
+
+        Returns: int number of failed urls.
+        """
+        failed = self.failed()
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, self.DEAD_LETTER_COLNAMES, delimiter='\t', extrasaction='ignore')
+            writer.writeheader()
+            for entry in failed:
+                writer.writerow(dict(entry, Error=self.errors.get(entry['URL'], '')))
+        return len(failed)
+
+
+    def compact(self):
+        """Rewrite the manifest with only the latest line for each url.
+
+        Returns: None
+        """
+        self._file.close()
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, self.COLNAMES, delimiter='\t')
+            writer.writeheader()
+            writer.writerows(self.entries.values())
+        os.replace(tmp_path, self._path)
+        self._open()
+
+        return None
+
+
+    def close(self):
+        """Close the manifest file. Returns: None"""
+        self._file.close()
+        return None
@@ -5,3 +5,7 @@ class Error(Exception):
 class OverwriteError(Error):
    """Raised when the user tries to overwrite an existing file."""
    pass
+
+class InvalidPageError(Error):
+   """Raised when a response is not a complete html page, e.g. it was cut off."""
+   pass
@@ -0,0 +1,205 @@
+"""
+Rolling, exponentially weighted and cumulative team features.
+
+Like the lag and 3-game-average features in the notebook, every feature of
+a game only uses the team's earlier games, so it can be used to predict that
+game. Rows are sorted by team and date once and then walked one game number
+at a time, with all teams' n-th games handled together, so a season takes
+about as many array operations as the most games any team played. The state
+after the last game of each team is kept, so a new day of games can be
+appended without recomputing earlier rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class FeatureEngine:
+    """Team features computed from each team's previous games.
+
+    For each variable v the features are:
+        vLag1 -- v in the previous game.
+        v{w}GameAvg -- Mean of v over the previous w games, for each window w.
+            Like the notebook's rolling_mean(window=w, min_periods=1), it is the
+            mean of however many of those games there are, unless min_periods
+            asks for more.
+        vEWM{h} -- Exponentially weighted mean of v over previous games with
+            halflife h games, for each halflife h.
+        Cumv -- Sum of v over all previous games, if cumulative.
+    Missing values are skipped. Features of a team's first game are missing.
+
+    Attributes:
+        variables (List (str)) -- Columns to build features from.
+        windows (tuple (int)) -- Rolling window lengths in games.
+        min_periods (int or None) -- Fewest observed games a window mean needs,
+            or None for the full window.
+        halflifes (tuple (float)) -- Halflifes of exponentially weighted means in games.
+        cumulative (bool) -- Whether to include cumulative sums.
+
+    Methods:
+        __init__ (None) -- Choose the variables and features.
+        fit_transform (pd.DataFrame) -- Features of every game, starting from scratch.
+        append (pd.DataFrame) -- Features of new games, continuing from the last call.
+        latest (pd.DataFrame) -- Features of every team's next game.
+        feature_names (List (str)) -- Names of the feature columns.
+    """
+
+    def __init__(self, variables, *, windows=(3,), min_periods=1, halflifes=(), cumulative=True):
+        """Initialize FeatureEngine.
+
+        Arguments:
+            variables (List (str)) -- Columns to build features from.
+
+        Keyword arguments:
+            windows (tuple (int)) -- Rolling window lengths in games. (default (3,))
+            min_periods (int or None) -- Fewest observed games a window mean
+                needs, capped at the window length, or None for the full
+                window. (default 1, as in the notebook)
+            halflifes (tuple (float)) -- Halflifes of exponentially weighted means. (default ())
+            cumulative (bool) -- Whether to include cumulative sums. (default True)
+
+        Returns: None
+        """
+        assert all(isinstance(w, int) and w > 0 for w in windows), TypeError('windows must be positive ints')
+        assert min_periods is None or (isinstance(min_periods, int) and min_periods > 0), \
+            TypeError('min_periods must be a positive int or None')
+        assert all(h > 0 for h in halflifes), TypeError('halflifes must be positive')
+        self.variables = list(variables)
+        self.windows = tuple(windows)
+        self.min_periods = min_periods
+        self.halflifes = tuple(halflifes)
+        self.cumulative = cumulative
+        self._decays = np.array([0.5 ** (1 / h) for h in self.halflifes])
+        self._reset()
+        return None
+
+
+    def _reset(self):
+        """Forget every team's previous games."""
+        k = len(self.variables)
+        self._codes = {}
+        self._last = np.empty((0, k))
+        self._window = np.empty((0, max(self.windows, default=0), k))
+        self._sum = np.empty((0, k))
+        self._ewm_num = np.empty((0, len(self.halflifes), k))
+        self._ewm_den = np.empty((0, len(self.halflifes), k))
+        self._games = np.empty(0, dtype=np.int64)
+        self._last_date = np.empty(0, dtype='datetime64[ns]')
+
+
+    def feature_names(self):
+        """Names of the feature columns. Returns: List of str"""
+        names = [v + 'Lag1' for v in self.variables]
+        for w in self.windows:
+            names += ['{}{}GameAvg'.format(v, w) for v in self.variables]
+        for h in self.halflifes:
+            names += ['{}EWM{:g}'.format(v, h) for v in self.variables]
+        if self.cumulative:
+            names += ['Cum' + v for v in self.variables]
+        return names
+
+
+    def fit_transform(self, GameStats):
+        """Features of every game in GameStats, forgetting earlier calls.
+
+        Arguments:
+            GameStats (pd.DataFrame) -- One row per team and game with Date,
+                TeamName and the variables, e.g. get_season_game_stats().
+
+        Returns: pd.DataFrame with Date, TeamName and the features, sorted by
+            Date and TeamName and indexed like GameStats.
+        """
+        self._reset()
+        return self.append(GameStats)
+
+
+    def append(self, GameStats):
+        """Features of new games, using the games of earlier calls as history.
+        Each team's new games must come after the games it already has.
+
+        Arguments:
+            GameStats (pd.DataFrame) -- New rows with Date, TeamName and the variables.
+
+        Returns: pd.DataFrame like fit_transform, for the new rows only.
+        """
+        GameStats = GameStats.sort_values(['TeamName', 'Date'], kind='mergesort')
+        teams = self._team_codes(GameStats['TeamName'])
+        dates = GameStats['Date'].to_numpy(dtype='datetime64[ns]')
+        values = GameStats[self.variables].to_numpy(dtype=float, na_value=np.nan)
+        if (dates < self._last_date[teams]).any():
+            raise ValueError('new games must come after the games already appended')
+
+        # Game number of each row within its team in this batch
+        starts = np.flatnonzero(np.r_[True, teams[1:] != teams[:-1]])
+        numbers = np.arange(len(teams)) - np.repeat(starts, np.diff(np.r_[starts, len(teams)]))
+
+        features = np.empty((len(teams), len(self.feature_names())))
+        for n in range(numbers.max() + 1 if len(numbers) else 0):
+            rows = np.flatnonzero(numbers == n)
+            features[rows] = self._features(teams[rows])
+            self._update(teams[rows], values[rows], dates[rows])
+
+        Features = pd.DataFrame(features, index=GameStats.index, columns=self.feature_names())
+        Features.insert(0, 'TeamName', GameStats['TeamName'])
+        Features.insert(0, 'Date', GameStats['Date'])
+        return Features.sort_values(['Date', 'TeamName'], kind='mergesort')
+
+
+    def latest(self):
+        """Features of every team's next game, from all games appended so
+        far, e.g. end of season stats to score tournament matchups with.
+
+        Returns: pd.DataFrame with TeamName and the features, one row per team.
+        """
+        Features = pd.DataFrame(self._features(np.arange(len(self._codes))), columns=self.feature_names())
+        Features.insert(0, 'TeamName', list(self._codes))
+        return Features
+
+
+    def _team_codes(self, TeamNames):
+        """Code of each team, adding state for teams not seen before."""
+        new = [t for t in pd.unique(TeamNames) if t not in self._codes]
+        if new:
+            self._codes.update(zip(new, range(len(self._codes), len(self._codes) + len(new))))
+            grow = lambda a, fill: np.concatenate([a, np.full((len(new),) + a.shape[1:], fill, dtype=a.dtype)])
+            self._last = grow(self._last, np.nan)
+            self._window = grow(self._window, np.nan)
+            self._sum = grow(self._sum, 0.0)
+            self._ewm_num = grow(self._ewm_num, 0.0)
+            self._ewm_den = grow(self._ewm_den, 0.0)
+            self._games = grow(self._games, 0)
+            self._last_date = grow(self._last_date, np.datetime64('NaT'))
+        return np.array([self._codes[t] for t in TeamNames], dtype=np.int64)
+
+
+    def _features(self, teams):
+        """Features of the next game of each of teams, which are distinct."""
+        columns = [self._last[teams]]
+        for w in self.windows:
+            recent = self._window[teams, -w:]
+            counts = (~np.isnan(recent)).sum(axis=1)
+            enough = counts >= min(w if self.min_periods is None else self.min_periods, w)
+            with np.errstate(invalid='ignore'):
+                columns.append(np.nansum(recent, axis=1) / np.where(enough & (counts > 0), counts, np.nan))
+        if self.halflifes:
+            with np.errstate(invalid='ignore'):
+                ewm = self._ewm_num[teams] / np.where(self._ewm_den[teams] > 0, self._ewm_den[teams], np.nan)
+            columns += list(ewm.transpose(1, 0, 2))
+        if self.cumulative:
+            columns.append(np.where(self._games[teams, None] > 0, self._sum[teams], np.nan))
+        return np.hstack(columns)
+
+
+    def _update(self, teams, values, dates):
+        """Add one game to the history of each of teams."""
+        observed = ~np.isnan(values)
+        self._last[teams] = values
+        if self._window.shape[1]:
+            self._window[teams, :-1] = self._window[teams, 1:]
+            self._window[teams, -1] = values
+        self._sum[teams] += np.where(observed, values, 0.0)
+        decays = self._decays[None, :, None]
+        self._ewm_num[teams] = decays * self._ewm_num[teams] + np.where(observed, values, 0.0)[:, None]
+        self._ewm_den[teams] = decays * self._ewm_den[teams] + observed[:, None]
+        self._games[teams] += 1
+        self._last_date[teams] = dates
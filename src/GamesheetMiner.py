@@ -4,11 +4,14 @@ the /html directory. Data will be exported in tab-separated variable format
 to a .txt file named feb-gamesheets.txt in the /data directory.
 """
 
+import argparse
 import os
 
 from bs4 import BeautifulSoup
 
-from Miner import Miner
+from HtmlCache import page_name
+from Miner import Miner, list_html_files
+from Seasons import html_season_dir, list_seasons, mined_path
 
 class GamesheetMiner(Miner):
     """Mines data from daily gamesheets on 
@@ -16,27 +19,34 @@ class GamesheetMiner(Miner):
 
     Attributes:
         COLNAMES (tuple (str)) -- Column names to be exported with data.
+        DTYPES (dict) -- pandas dtype of each column for the Parquet copy.
 
     Methods:
         __init__ (None) -- Initialize class with path for exported data.
         mine_gamesheet (List) -- Mine game data. Returns data in nested List.
+        mine (List) -- Alias of the method above, used by Miner.mine_files.
         write (None) -- Write game data to txt file on disc.
-
-    Todo:
-        Pool multiprocessors to speed up the Miner.
     """
 
     COLNAMES = ("Date", "WinningTeam", "WinningScore", "LosingTeam", "LosingScore")
 
-    def __init__(self, data_path):
+    DTYPES = {"Date": "datetime64[ns]",
+              "WinningTeam": "category", "WinningScore": "Int32",
+              "LosingTeam": "category", "LosingScore": "Int32"}
+
+    def __init__(self, data_path, *, incremental=False):
         """Initialize GamesheetMiner.
 
         Arguments:
             data_path (str) -- Relative or absolute path to exported data.
+
+        Keyword arguments:
+            incremental (bool) -- Append rows of new or changed files to existing data. (default False)
         """
-        Miner.__init__(self, data_path)
-        header = '\t'.join(self.COLNAMES) + '\n'
-        self.writer.write(header.encode('utf-8'))
+        Miner.__init__(self, data_path, incremental=incremental)
+        if self.writer is not None and self.writer.tell() == 0:
+            header = '\t'.join(self.COLNAMES) + '\n'
+            self.writer.write(header.encode('utf-8'))
 
 
     def mine_gamesheet(self, path):
@@ -48,7 +58,7 @@ class GamesheetMiner(Miner):
         Returns: Nested list of data.
         """
         self.soup = self.make_soup(path)
-        date = os.path.split(path)[-1].replace('.txt', '')
+        date = page_name(path)
 
         self.game_data = []
 
@@ -72,6 +82,14 @@ class GamesheetMiner(Miner):
         return self.game_data
 
 
+    def mine(self, path):
+        """Mine the gamesheet at path. Used by Miner.mine_files.
+
+        Returns: Nested list of data.
+        """
+        return self.mine_gamesheet(path)
+
+
     def write(self, sep='\t'):
         """Write collected data to tab.
 
@@ -86,11 +104,27 @@ class GamesheetMiner(Miner):
 
 
 if __name__ == '__main__':
-    miner = GamesheetMiner(data_path="./../data-raw/gamesheets-2017.txt")
-    gamesheet_dir = "./../html/gamesheets/"
-    for root, dirs, files in os.walk(gamesheet_dir):
-        for f in files:
-            if f.endswith('txt'):
-                print("Mining", f)
-                miner.mine_gamesheet(os.path.join(gamesheet_dir, f))
-                miner.write()
+    parser = argparse.ArgumentParser(description='Mine gamesheets into a tab-separated file.')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help='files handed to a worker at a time (default 16)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only mine files that are new or changed since the last run')
+    parser.add_argument('--parquet', action='store_true',
+                        help='also write a typed Parquet copy of the output')
+    parser.add_argument('--season', type=int, action='append',
+                        help='season to mine, by the year it ends in, may be repeated '
+                             '(default: every season in the html directory)')
+    parser.add_argument('--html-dir', default='./../html/')
+    parser.add_argument('--data-dir', default='./../data-raw/')
+    args = parser.parse_args()
+
+    for season in args.season or list_seasons(args.html_dir):
+        print("Season", season)
+        miner = GamesheetMiner(mined_path('gamesheets', season, args.data_dir), incremental=args.incremental)
+        gamesheets_dir = os.path.join(html_season_dir(season, args.html_dir), 'gamesheets')
+        miner.mine_files(list_html_files(gamesheets_dir), processes=args.processes, chunksize=args.chunksize)
+        if args.parquet:
+            miner.write_columnar()
+        miner.writer.close()
@@ -0,0 +1,127 @@
+"""
+Reading and writing of scraped html on disk.
+
+Two formats live side by side in the html directory:
+
+    *.txt     -- prettified html headed by a `<!--ID: 0x...-->` line, written
+                 by Scraper.write_html by default.
+    *.txt.gz  -- the raw response bytes, gzip-compressed and headed by a
+                 `<!--ID: 0x... URL: ... FETCHED: ...-->` line. Written when
+                 the Scraper is created with compress=True.
+
+Readers go through read_page, which accepts either format.
+"""
+
+import contextlib
+import datetime
+import gzip
+import os
+import re
+from uuid import uuid4
+
+# Suffix added to a .txt path for the compressed format.
+GZIP_SUFFIX = '.gz'
+
+_HEADER = re.compile(rb'^<!--ID: (?P<ID>\S+)(?: URL: (?P<url>\S+) FETCHED: (?P<fetched>\S+))?\s*-->\n?')
+
+
+def write_page(path, content, url, ID, *, fetched=None):
+    """Write raw response bytes to path in the compressed format.
+
+    Arguments:
+        path (str) -- Full path to txt.gz file.
+        content (bytes) -- Raw response body.
+        url (str) -- Url the body was fetched from.
+        ID (str) -- Hexadecimal ID of the page.
+
+    Keyword arguments:
+        fetched (datetime) -- Fetch time. (default now)
+
+    Returns: None
+    """
+    assert path.endswith(GZIP_SUFFIX), AssertionError('path parameter does not lead to a gz file.')
+    if fetched is None:
+        fetched = datetime.datetime.now()
+    header = '<!--ID: {} URL: {} FETCHED: {}-->\n'.format(ID, url, fetched.isoformat(timespec='seconds'))
+    with replace_file(path) as f, gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6) as html_gz:
+        html_gz.write(header.encode('utf-8'))
+        html_gz.write(content)
+
+    return None
+
+
+@contextlib.contextmanager
+def replace_file(path):
+    """Open a temporary file beside path for writing bytes and move it onto
+    path when the block ends without error. A crash mid-write leaves path as
+    it was instead of a partial page that looks cached.
+
+    Arguments:
+        path (str) -- Full path of the file to write.
+
+    Yields: Binary file object.
+    """
+    tmp_path = '{}.{}.tmp'.format(path, uuid4().hex[:8])
+    try:
+        with open(tmp_path, 'xb') as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_page(path):
+    """Read a cached page in either format.
+
+    Arguments:
+        path (str) -- Path to a txt or txt.gz file.
+
+    Returns: Tuple with header dict (ID, url, fetched; missing fields are
+        None) and the html bytes without the header line.
+    """
+    opener = gzip.open if path.endswith(GZIP_SUFFIX) else open
+    with opener(path, 'rb') as f:
+        html = f.read()
+
+    header = {'ID': None, 'url': None, 'fetched': None}
+    match = _HEADER.match(html)
+    if match:
+        header = {k: v.decode('utf-8') if v is not None else None
+                  for k, v in match.groupdict().items()}
+        html = html[match.end():]
+    return header, html
+
+
+def find_page(path):
+    """Find the cached copy of a .txt path in either format.
+
+    Arguments:
+        path (str) -- Path to a txt file.
+
+    Returns: str path of the existing file, or None if neither exists.
+    """
+    for candidate in (path, path + GZIP_SUFFIX):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def page_name(path):
+    """Name of a cached page without directory or suffixes.
+
+    Example:
+        > page_name("./../html/gamesheets/2017-2-5.txt.gz")
+        "2017-2-5"
+    """
+    name = os.path.basename(path)
+    if name.endswith(GZIP_SUFFIX):
+        name = name[:-len(GZIP_SUFFIX)]
+    if name.endswith('.txt'):
+        name = name[:-len('.txt')]
+    return name
+
+
+def is_page(filename):
+    """Whether filename is a cached page in either format."""
+    return filename.endswith(('txt', '.txt' + GZIP_SUFFIX))
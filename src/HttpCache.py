@@ -0,0 +1,259 @@
+"""
+HTTP cache of response validators and bodies, keyed by url.
+
+Scraper sends the ETag and Last-Modified of a cached response back as
+If-None-Match and If-Modified-Since. When the site answers 304 Not Modified,
+the body is read from disk instead of downloaded again. Bodies are stored
+raw and gzip-compressed in the HtmlCache format, one file per url, and the
+validators in an append-only tsv index where later lines win, like the
+crawl manifest.
+
+A FrozenDates policy goes further and never sends a request for a page of a
+day that was over when the cached copy was fetched, since it can no longer
+change.
+"""
+
+import csv
+import datetime
+import hashlib
+import os
+import threading
+
+from HtmlCache import GZIP_SUFFIX, read_page, write_page
+
+
+class FrozenDates:
+    """Policy that freezes pages of days that were over when fetched.
+
+    Methods:
+        __init__ (None) -- Initialize the policy.
+        is_frozen (bool) -- Whether a cached page may be served without asking the site.
+    """
+
+    def __init__(self, date_of, settle_days=0):
+        """Initialize FrozenDates.
+
+        Arguments:
+            date_of (function) -- Date of the games on a url's page, or None
+                for pages without one.
+            settle_days (int) -- Days after a date on which a fetched page can
+                still change, e.g. to late corrections. (default 0)
+
+        Returns: None
+        """
+        assert callable(date_of), TypeError('date_of parameter must be a function')
+        assert isinstance(settle_days, int), TypeError('settle_days parameter must be a positive int')
+        assert settle_days >= 0, TypeError('settle_days parameter must be a positive int')
+        self._date_of = date_of
+        self._settle = datetime.timedelta(days=settle_days)
+        return None
+
+
+    def is_frozen(self, url, fetched):
+        """Whether the copy of url fetched at fetched is final.
+
+        Arguments:
+            url (str) -- Full url to site.
+            fetched (datetime) -- When the cached copy was fetched.
+
+        Returns: bool
+        """
+        date = self._date_of(url)
+        if date is None:
+            return False
+        if isinstance(date, datetime.datetime):
+            date = date.date()
+        return fetched.date() > date + self._settle
+
+
+class HttpCache:
+    """Validators and bodies of responses, stored on disk by url.
+
+    Attributes:
+        COLNAMES (tuple (str)) -- Column names of the index file.
+        entries (dict) -- Latest index entry for each url.
+        frozen (FrozenDates) -- Policy for pages that are never fetched again, or None.
+
+    Methods:
+        __init__ (None) -- Load the index, creating it if necessary.
+        headers (dict) -- Conditional request headers for a url.
+        body (bytes) -- Cached body of a url.
+        is_frozen (bool) -- Whether a url's cached body may be served without a request.
+        store (None) -- Cache a response with its validators.
+        refresh (None) -- Record that the site confirmed a cached body is current.
+        forget (None) -- Drop a url from the cache.
+        compact (None) -- Rewrite the index with one line per url.
+        close (None) -- Close the index file.
+    """
+
+    COLNAMES = ('URL', 'ETag', 'LastModified', 'Path', 'Fetched')
+
+    def __init__(self, cache_dir='./../html/http-cache/', *, frozen=None):
+        """Initialize HttpCache.
+
+        Arguments:
+            cache_dir (str) -- Directory of the index and bodies. (default './../html/http-cache/')
+
+        Keyword arguments:
+            frozen (FrozenDates) -- Policy for pages that are never fetched again. (default None)
+
+        Returns: None
+        """
+        assert frozen is None or hasattr(frozen, 'is_frozen'), TypeError('frozen parameter must be a FrozenDates')
+        self._dir = cache_dir
+        self._path = os.path.join(cache_dir, 'index.tsv')
+        self.frozen = frozen
+        self.entries = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(self._path):
+            with open(self._path, newline='', encoding='utf-8') as f:
+                for entry in csv.DictReader(f, delimiter='\t'):
+                    if entry['Path']:
+                        self.entries[entry['URL']] = entry
+                    else:
+                        self.entries.pop(entry['URL'], None)
+
+        self._open()
+        return None
+
+
+    def _open(self):
+        is_new = not os.path.exists(self._path) or os.path.getsize(self._path) == 0
+        self._file = open(self._path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, self.COLNAMES, delimiter='\t')
+        if is_new:
+            self._writer.writeheader()
+            self._file.flush()
+
+
+    def _write(self, entry):
+        """Append an index line and flush it. Call with the lock held."""
+        self._writer.writerow(entry)
+        self._file.flush()
+
+
+    def _body_path(self, url):
+        """Path of the cached body of url, named by its hash."""
+        return os.path.join(self._dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.txt' + GZIP_SUFFIX)
+
+
+    def headers(self, url):
+        """Conditional request headers for url from its cached validators.
+
+        Returns: dict, empty if url is not cached.
+        """
+        entry = self.entries.get(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry['ETag']:
+            headers['If-None-Match'] = entry['ETag']
+        if entry['LastModified']:
+            headers['If-Modified-Since'] = entry['LastModified']
+        return headers
+
+
+    def body(self, url):
+        """Cached body of url.
+
+        Returns: bytes, or None if url is not cached or its body is gone.
+        """
+        entry = self.entries.get(url)
+        if entry is None or not os.path.exists(entry['Path']):
+            return None
+        header, body = read_page(entry['Path'])
+        return body
+
+
+    def is_frozen(self, url):
+        """Whether url has a cached body that the frozen policy says is final.
+
+        Returns: bool
+        """
+        entry = self.entries.get(url)
+        if self.frozen is None or entry is None or not entry['Fetched']:
+            return False
+        fetched = datetime.datetime.strptime(entry['Fetched'], '%Y-%m-%dT%H:%M:%S')
+        return self.frozen.is_frozen(url, fetched) and os.path.exists(entry['Path'])
+
+
+    def store(self, url, response):
+        """Cache a successful response with its ETag and Last-Modified.
+        Responses without either are cached too when a frozen policy is
+        set, since it can serve them without validators.
+
+        Arguments:
+            url (str) -- Url the response came from.
+            response (requests.Response) -- Response with the full body.
+
+        Returns: None
+        """
+        etag = response.headers.get('ETag', '')
+        last_modified = response.headers.get('Last-Modified', '')
+        if not (etag or last_modified or self.frozen is not None):
+            return None
+        fetched = datetime.datetime.now().replace(microsecond=0)
+        path = self._body_path(url)
+        write_page(path, response.content, url, hashlib.sha1(response.content).hexdigest()[:30], fetched=fetched)
+        entry = {'URL': url, 'ETag': etag, 'LastModified': last_modified, 'Path': path,
+                 'Fetched': fetched.isoformat(timespec='seconds')}
+        with self._lock:
+            self.entries[url] = entry
+            self._write(entry)
+        return None
+
+
+    def refresh(self, url, response=None):
+        """Record that the site answered 304 for url, so its cached body is
+        current as of now. New validators in the response replace the old.
+
+        Returns: None
+        """
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            entry = dict(entry, Fetched=datetime.datetime.now().isoformat(timespec='seconds'))
+            if response is not None:
+                entry['ETag'] = response.headers.get('ETag', entry['ETag'])
+                entry['LastModified'] = response.headers.get('Last-Modified', entry['LastModified'])
+            self.entries[url] = entry
+            self._write(entry)
+        return None
+
+
+    def forget(self, url):
+        """Drop url from the cache, e.g. when its body went missing. Returns: None"""
+        with self._lock:
+            entry = self.entries.pop(url, None)
+            if entry is None:
+                return None
+            self._write({'URL': url, 'ETag': '', 'LastModified': '', 'Path': '', 'Fetched': ''})
+        if os.path.exists(entry['Path']):
+            os.remove(entry['Path'])
+        return None
+
+
+    def compact(self):
+        """Rewrite the index with only the latest line for each url.
+
+        Returns: None
+        """
+        with self._lock:
+            self._file.close()
+            tmp_path = self._path + '.tmp'
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, self.COLNAMES, delimiter='\t')
+                writer.writeheader()
+                writer.writerows(self.entries.values())
+            os.replace(tmp_path, self._path)
+            self._open()
+
+        return None
+
+
+    def close(self):
+        """Close the index file. Returns: None"""
+        self._file.close()
+        return None
@@ -0,0 +1,259 @@
+"""
+This script can be run from the command line to serve the bundled
+html/sample-* pages as a local stand-in for sports-reference.com. Point the
+scraper at it with `--root-url http://127.0.0.1:8000/` to test crawling
+without touching the real site.
+
+Gamesheet urls (cbb/boxscores/index.cgi?year=...&month=...&day=...) are
+served from html/sample-gamesheets and boxscore urls
+(cbb/boxscores/<name>.html) from html/sample-boxscores. Pages missing from
+the samples are stood in for by a sample page, unless strict is set.
+
+Pages carry an ETag and a Last-Modified date, and conditional requests for
+unchanged pages get 304 Not Modified.
+
+With a failure rate, that share of requests fail the way a busy site does:
+a 503, a 429, a page cut off before its end or a dropped connection.
+"""
+
+import argparse
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import random
+import threading
+from time import sleep, time
+from urllib.parse import parse_qs, urlsplit
+from zlib import crc32
+
+from HtmlCache import is_page, page_name, read_page
+
+# Ways a request fails when the server is flaky
+FAILURES = ('unavailable', 'throttled', 'truncated', 'dropped')
+
+
+class LocalServer:
+    """Threaded HTTP stand-in for sports-reference.com.
+
+    Attributes:
+        url (str) -- Root url of the running server, ending in '/'.
+
+    Methods:
+        __init__ (None) -- Load sample pages into memory.
+        start (None) -- Serve on a background thread.
+        stop (None) -- Shut down the server.
+        serve_forever (None) -- Serve on the current thread.
+        failure (str) -- Draw how the next request fails, if it does.
+    """
+
+    def __init__(self, html_dir='./../html/', *, host='127.0.0.1', port=0,
+                 latency=0, strict=False, failure_rate=0, seed=None):
+        """Initialize LocalServer.
+
+        Arguments:
+            html_dir (str) -- Directory holding sample-gamesheets and sample-boxscores.
+
+        Keyword arguments:
+            host (str) -- Interface to bind. (default '127.0.0.1')
+            port (int) -- Port to bind. 0 picks a free port. (default 0)
+            latency (int, float) -- Seconds to wait before each response. (default 0)
+            strict (bool) -- Return 404 for pages missing from the samples. (default False)
+            failure_rate (float) -- Share of requests that fail, one of FAILURES each. (default 0)
+            seed (int) -- Seed of the failures. (default None)
+
+        Returns: None
+        """
+        assert isinstance(latency, (int, float)), TypeError('latency parameter must be a positive int or float')
+        assert latency >= 0, TypeError('latency parameter must be a positive int or float')
+        assert isinstance(failure_rate, (int, float)), TypeError('failure_rate parameter must be a float')
+        assert 0 <= failure_rate <= 1, ValueError('failure_rate parameter must be between 0 and 1')
+
+        self.gamesheets = load_pages(os.path.join(html_dir, 'sample-gamesheets'))
+        self.boxscores = load_pages(os.path.join(html_dir, 'sample-boxscores'))
+        self.latency = latency
+        self.strict = strict
+        self.failure_rate = failure_rate
+        # Pages are loaded once, so none changes while the server runs.
+        self.last_modified = formatdate(time(), usegmt=True)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+        host, port = self._server.server_address[:2]
+        self.url = 'http://{}:{}/'.format(host, port)
+
+        return None
+
+
+    def page(self, path, query):
+        """Find the page to serve for a request.
+
+        Arguments:
+            path (str) -- Url path without the leading '/'.
+            query (str) -- Url query string.
+
+        Returns: bytes, or None if there is no page to serve.
+        """
+        if path == 'cbb/boxscores/index.cgi':
+            params = parse_qs(query)
+            try:
+                name = '{}-{}-{}'.format(*(int(params[k][0]) for k in ('year', 'month', 'day')))
+            except (KeyError, ValueError):
+                return None
+            pages = self.gamesheets
+        elif path.startswith('cbb/boxscores/') and path.endswith('.html'):
+            name = path[len('cbb/boxscores/'):-len('.html')]
+            pages = self.boxscores
+        else:
+            return None
+
+        if name in pages:
+            return pages[name]
+        if self.strict or not pages:
+            return None
+        # Stand in with a sample page picked deterministically from the name.
+        names = sorted(pages)
+        return pages[names[crc32(name.encode()) % len(names)]]
+
+
+    def failure(self):
+        """Draw whether the next request fails and how.
+
+        Returns: str from FAILURES, or None to serve the request.
+        """
+        if not self.failure_rate:
+            return None
+        with self._lock:
+            if self._random.random() >= self.failure_rate:
+                return None
+            return self._random.choice(FAILURES)
+
+
+    def start(self):
+        """Serve on a background thread. Returns: None"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return None
+
+
+    def stop(self):
+        """Shut down the server. Returns: None"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        return None
+
+
+    def serve_forever(self):
+        """Serve on the current thread until interrupted. Returns: None"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+        return None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def load_pages(directory):
+    """Read every cached page in directory, dropping the scraper's ID line.
+
+    Returns: dict mapping page name to html bytes.
+    """
+    pages = {}
+    if not os.path.isdir(directory):
+        return pages
+    for f in os.listdir(directory):
+        if is_page(f):
+            header, pages[page_name(f)] = read_page(os.path.join(directory, f))
+    return pages
+
+
+def make_handler(server):
+    """Make a request handler class bound to a LocalServer."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            body = server.page(parts.path.lstrip('/'), parts.query)
+            if server.latency:
+                sleep(server.latency)
+            failure = server.failure()
+            if failure == 'dropped':
+                self.close_connection = True
+                return
+            if failure == 'unavailable':
+                self.send_error(503)
+                return
+            if failure == 'throttled':
+                self.send_response(429)
+                self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"{:08x}"'.format(crc32(body))
+            if self.not_modified(etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', server.last_modified)
+                self.end_headers()
+                return
+            if failure == 'truncated':
+                body = body[:len(body) // 2]
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', server.last_modified)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def not_modified(self, etag):
+            # If-None-Match takes precedence over If-Modified-Since.
+            if self.headers.get('If-None-Match'):
+                return etag in [tag.strip() for tag in self.headers['If-None-Match'].split(',')]
+            if self.headers.get('If-Modified-Since'):
+                try:
+                    return parsedate_to_datetime(self.headers['If-Modified-Since']) \
+                        >= parsedate_to_datetime(server.last_modified)
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve sample pages as a stand-in for sports-reference.com.')
+    parser.add_argument('--html-dir', default='./../html/')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--strict', action='store_true')
+    parser.add_argument('--failure-rate', type=float, default=0,
+                        help='share of requests that fail like a busy site')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = LocalServer(args.html_dir, port=args.port, latency=args.latency, strict=args.strict,
+                         failure_rate=args.failure_rate, seed=args.seed)
+    print('Serving', args.html_dir, 'at', server.url)
+    server.serve_forever()
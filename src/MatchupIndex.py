@@ -0,0 +1,210 @@
+"""
+Matchups between teams computed on demand from TeamIDs.
+
+Matchups.csv pairs every team with every other, about 70k rows, though only
+the few thousand pairs of tournament teams are ever scored. A MatchupIndex
+numbers the same pairs arithmetically, in the order of Matchups.csv, and
+builds and scores rows for just the pairs asked for.
+"""
+
+import numpy as np
+import pandas as pd
+
+from PutIDFiles import matchup_id_strings, pack_matchup_ids, put_team_ids, unpack_matchup_ids
+
+
+class MatchupIndex:
+    """Index of every pair of teams.
+
+    Pair IDs count pairs of teams sorted by TeamID, ordered by the later
+    team first: (0, 1), (0, 2), (1, 2), (0, 3), ... That is the row order
+    of Matchups.csv and make_matchups, so pair ID k is row k of both. They
+    are computed from TeamIDs without building the table.
+
+    Attributes:
+        Teams (pd.DataFrame) -- TeamName and TeamID of each team, sorted by TeamID.
+        scores (dict) -- Win probability of TeamID1 by pair ID for scored pairs.
+            None when caching is off.
+
+    Methods:
+        __init__ (None) -- Initialize with the team table.
+        pair_ids (np.ndarray) -- Pair IDs of pairs of TeamIDs.
+        team_ids (tuple (np.ndarray)) -- TeamID1 and TeamID2 of pair IDs.
+        name_pair_ids (np.ndarray) -- Pair IDs of pairs of team names.
+        key_pair_ids (np.ndarray) -- Pair IDs of packed MatchupKeys.
+        matchup_keys (np.ndarray) -- Packed MatchupKeys of pair IDs.
+        bracket_pair_ids (np.ndarray) -- Pair IDs of every pair that can meet in a bracket.
+        matchups (pd.DataFrame) -- Matchups.csv rows of pair IDs.
+        exog (pd.DataFrame) -- Model inputs of pair IDs.
+        score (np.ndarray) -- Win probabilities of pair IDs.
+        write_scores (None) -- Export cached scores.
+    """
+
+    def __init__(self, Teams=None, *, cache=True):
+        """Initialize MatchupIndex.
+
+        Arguments:
+            Teams (pd.DataFrame) -- TeamName and consecutive TeamIDs. (default put_team_ids())
+
+        Keyword arguments:
+            cache (bool) -- Keep scores of scored pairs. (default True)
+
+        Returns: None
+        """
+        if Teams is None:
+            Teams = put_team_ids(verbose=False)
+        self.Teams = Teams.sort_values('TeamID').reset_index(drop=True)
+        ids = self.Teams['TeamID'].to_numpy()
+        assert (np.diff(ids) == 1).all(), ValueError('TeamIDs must be consecutive')
+
+        self._base = int(ids[0]) if len(ids) else 0
+        self._n = len(ids)
+        self._names = self.Teams['TeamName'].to_numpy()
+        self._positions = pd.Series(np.arange(self._n), index=self._names)
+        # Pair ID of the first pair of each team with an earlier team
+        j = np.arange(self._n)
+        self._starts = j * (j - 1) // 2
+        self.scores = {} if cache else None
+
+        return None
+
+
+    def __len__(self):
+        return self._n * (self._n - 1) // 2
+
+
+    def pair_ids(self, TeamID1, TeamID2):
+        """Pair IDs of pairs of TeamIDs, in either order.
+
+        Arguments:
+            TeamID1 (int, array-like) -- TeamIDs of one side.
+            TeamID2 (int, array-like) -- TeamIDs of the other side.
+
+        Returns: np.ndarray of int64
+        """
+        a = np.asarray(TeamID1, dtype=np.int64) - self._base
+        b = np.asarray(TeamID2, dtype=np.int64) - self._base
+        i, j = np.minimum(a, b), np.maximum(a, b)
+        assert ((i >= 0) & (j < self._n)).all(), ValueError('unknown TeamID')
+        assert (i != j).all(), ValueError('a team cannot play itself')
+        return self._starts[j] + i
+
+
+    def team_ids(self, pair_ids):
+        """TeamIDs of pair IDs. TeamID1 is always the smaller.
+
+        Returns: Tuple of np.ndarray (TeamID1, TeamID2)
+        """
+        k = np.asarray(pair_ids, dtype=np.int64)
+        assert ((k >= 0) & (k < len(self))).all(), ValueError('unknown pair ID')
+        j = np.searchsorted(self._starts, k, side='right') - 1
+        i = k - self._starts[j]
+        return i + self._base, j + self._base
+
+
+    def name_pair_ids(self, TeamName1, TeamName2):
+        """Pair IDs of pairs of team names. Returns: np.ndarray of int64"""
+        return self.pair_ids(self._positions[np.atleast_1d(TeamName1)].to_numpy() + self._base,
+                             self._positions[np.atleast_1d(TeamName2)].to_numpy() + self._base)
+
+
+    def key_pair_ids(self, MatchupKey):
+        """Pair IDs of packed MatchupKeys. Returns: np.ndarray of int64"""
+        return self.pair_ids(*unpack_matchup_ids(MatchupKey))
+
+
+    def matchup_keys(self, pair_ids):
+        """Packed MatchupKeys of pair IDs. Returns: np.ndarray of int64"""
+        return pack_matchup_ids(*self.team_ids(pair_ids))
+
+
+    def bracket_pair_ids(self, bracket='./../data/Bracket.csv'):
+        """Pair IDs of every pair of teams that can meet in a bracket. In a
+        single elimination tournament that is every pair of its teams.
+
+        Arguments:
+            bracket (str, pd.DataFrame) -- Bracket.csv or its contents.
+
+        Returns: Sorted np.ndarray of int64
+        """
+        if isinstance(bracket, str):
+            bracket = pd.read_csv(bracket, index_col=False)
+        positions = np.sort(self._positions[pd.unique(bracket['TeamName'])].to_numpy())
+        first, second = np.triu_indices(len(positions), k=1)
+        return np.sort(self.pair_ids(positions[first] + self._base, positions[second] + self._base))
+
+
+    def matchups(self, pair_ids):
+        """Rows of Matchups.csv for pair IDs, plus the packed MatchupKey and
+        the PairID itself. Team names are categories in TeamID order.
+
+        Returns: pd.DataFrame
+        """
+        pair_ids = np.asarray(pair_ids, dtype=np.int64)
+        TeamID1, TeamID2 = self.team_ids(pair_ids)
+        names = pd.Categorical.from_codes(np.r_[TeamID1, TeamID2] - self._base, categories=self._names)
+        Matchups = pd.DataFrame({'Team1': names[:len(pair_ids)], 'Team2': names[len(pair_ids):],
+                                 'TeamID1': TeamID1.astype(np.int32), 'TeamID2': TeamID2.astype(np.int32)})
+        Matchups['MatchupKey'] = pack_matchup_ids(TeamID1, TeamID2)
+        Matchups['MatchupID'] = matchup_id_strings(Matchups['MatchupKey'])
+        Matchups['PairID'] = pair_ids
+        return Matchups
+
+
+    def exog(self, pair_ids, TeamStats, X_vars):
+        """Model inputs of pair IDs with a leading constant, like
+        sm.add_constant(Matchups[X_vars]) in the notebook. Variables starting
+        with 'Opp' are stats of TeamID2, the rest are stats of TeamID1.
+
+        Arguments:
+            pair_ids (array-like) -- Pair IDs to build.
+            TeamStats (pd.DataFrame) -- One row of stats per TeamName.
+            X_vars (List (str)) -- Model variables.
+
+        Returns: pd.DataFrame
+        """
+        TeamID1, TeamID2 = self.team_ids(pair_ids)
+        Stats = TeamStats.set_index('TeamName').reindex(self._names)
+        exog = {'const': np.ones(len(TeamID1))}
+        for v in X_vars:
+            if v.startswith('Opp'):
+                exog[v] = Stats[v[len('Opp'):]].to_numpy()[TeamID2 - self._base]
+            else:
+                exog[v] = Stats[v].to_numpy()[TeamID1 - self._base]
+        return pd.DataFrame(exog)
+
+
+    def score(self, pair_ids, predict, TeamStats, X_vars):
+        """Probability that TeamID1 wins for each pair ID. Only pairs not
+        yet cached are built and passed to predict.
+
+        Arguments:
+            pair_ids (array-like) -- Pair IDs to score.
+            predict (callable) -- Maps exog to probabilities, e.g. logit.fit().predict.
+            TeamStats (pd.DataFrame) -- One row of stats per TeamName.
+            X_vars (List (str)) -- Model variables.
+
+        Returns: np.ndarray of float
+        """
+        pair_ids = np.asarray(pair_ids, dtype=np.int64)
+        scores = self.scores if self.scores is not None else {}
+        missing = np.unique([k for k in pair_ids.tolist() if k not in scores])
+        if len(missing):
+            probs = np.asarray(predict(self.exog(missing, TeamStats, X_vars)), dtype=float)
+            scores.update(zip(missing.tolist(), probs.tolist()))
+        return np.array([scores[k] for k in pair_ids.tolist()], dtype=float)
+
+
+    def write_scores(self, ofile='./../data/ScoredMatchups.csv'):
+        """Export cached scores in the format of ScoredMatchups.csv with the
+        full probability in Pred.
+
+        Returns: pd.DataFrame
+        """
+        assert self.scores is not None, ValueError('scores are not cached')
+        pair_ids = np.array(sorted(self.scores), dtype=np.int64)
+        ScoredMatchups = pd.DataFrame({'MatchupID': matchup_id_strings(self.matchup_keys(pair_ids)),
+                                       'Pred': [self.scores[k] for k in pair_ids.tolist()]})
+        ScoredMatchups['PredWin'] = np.round(ScoredMatchups['Pred'])
+        ScoredMatchups.to_csv(ofile, index=False)
+        return ScoredMatchups
@@ -0,0 +1,266 @@
+"""
+This script can be run from the command line to fit the logit model once
+and score matchups with it:
+
+    python MatchupScorer.py --fit --ofile ./../data/ScoredMatchups.csv
+
+The notebook fits sm.Logit again every time it predicts and scores all ~70k
+rows of Matchups.csv through a pandas frame. A logit is linear in the stats
+of both teams, so MatchupScorer folds the coefficients into each team's stats
+with one matrix multiply. A pair is then scored with two lookups, an add and
+a sigmoid, and the fitted coefficients are saved so later runs skip fitting.
+"""
+
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from FeatureEngine import FeatureEngine
+from MatchupIndex import MatchupIndex
+from PutIDFiles import matchup_id_strings, put_team_ids, unpack_matchup_ids
+from PutModelData import get_model_data
+
+# Variables of the notebook's logit model. Opp variables are stats of the opponent.
+X_VARS = ['FG3GameAvg', 'FGA3GameAvg', 'FT3GameAvg', 'FTA3GameAvg', 'PF3GameAvg',
+          'ScoreDiff3GameAvg', 'Win3GameAvg',
+          'OppFG3GameAvg', 'OppFGA3GameAvg', 'OppFT3GameAvg', 'OppFTA3GameAvg',
+          'OppPF3GameAvg', 'OppScoreDiff3GameAvg', 'OppWin3GameAvg']
+
+PARAMS_FILE = './../data/LogitParams.json'
+
+
+class MatchupScorer:
+    """Logit win probabilities of pairs of teams by TeamID.
+
+    With stats f of each team, the probability that team i beats team j is
+    sigmoid(const + f[i] . b_own + f[j] . b_opp), where b_own are the
+    coefficients of the team's variables and b_opp of the Opp variables.
+    set_teams computes both dot products for every team at once.
+
+    Attributes:
+        X_vars (List (str)) -- Model variables, Opp variables belong to TeamID2.
+        y_var (str) -- Outcome of the fitted model.
+        params (pd.Series) -- Coefficients by variable, with const. None until fit or load.
+        Teams (pd.DataFrame) -- TeamName and TeamID of the teams that can be scored.
+
+    Methods:
+        __init__ (None) -- Choose the model variables.
+        fit (MatchupScorer) -- Fit the logit once.
+        save (None) -- Export the coefficients to json.
+        load (MatchupScorer) -- Scorer with saved coefficients.
+        set_teams (None) -- Fold the coefficients into every team's stats.
+        score (np.ndarray) -- Win probabilities of many pairs of TeamIDs.
+        score_keys (np.ndarray) -- Win probabilities of packed MatchupKeys.
+        probability (float) -- Win probability of one pair, without numpy overhead.
+        matrix (np.ndarray) -- Win probabilities of every pair of some teams.
+        scored_matchups (pd.DataFrame) -- Scores in the format of ScoredMatchups.csv.
+    """
+
+    def __init__(self, X_vars=X_VARS, y_var='Win'):
+        """Initialize MatchupScorer.
+
+        Arguments:
+            X_vars (List (str)) -- Model variables. (default X_VARS)
+            y_var (str) -- Outcome of the model. (default 'Win')
+
+        Returns: None
+        """
+        self.X_vars = list(X_vars)
+        self.y_var = y_var
+        self.params = None
+        self.Teams = None
+        # Stats of a team without the Opp prefix
+        self._stats = list(dict.fromkeys(v[len('Opp'):] if v.startswith('Opp') else v for v in self.X_vars))
+        return None
+
+
+    def fit(self, Data):
+        """Fit the logit to games with no missing values, once.
+
+        Arguments:
+            Data (pd.DataFrame) -- y_var and X_vars of each game, e.g. from make_training_data.
+
+        Returns: self
+        """
+        import statsmodels.api as sm
+
+        Data = Data[[self.y_var] + self.X_vars].dropna()
+        if not len(Data):
+            raise ValueError('no games without missing values to fit')
+        result = sm.Logit(Data[self.y_var].astype(float), sm.add_constant(Data[self.X_vars].astype(float))).fit(disp=0)
+        self.params = result.params
+        return self
+
+
+    def save(self, ofile=PARAMS_FILE):
+        """Export the fitted coefficients to json. Returns: None"""
+        assert self.params is not None, ValueError('fit or load coefficients first')
+        os.makedirs(os.path.dirname(ofile) or '.', exist_ok=True)
+        with open(ofile, 'w') as f:
+            json.dump({'y_var': self.y_var, 'X_vars': self.X_vars,
+                       'params': {k: float(v) for k, v in self.params.items()}}, f, indent=2)
+        return None
+
+
+    @classmethod
+    def load(cls, path=PARAMS_FILE):
+        """MatchupScorer with the coefficients saved at path.
+
+        Returns: MatchupScorer
+        """
+        with open(path) as f:
+            saved = json.load(f)
+        scorer = cls(saved['X_vars'], saved['y_var'])
+        scorer.params = pd.Series(saved['params'])
+        return scorer
+
+
+    def set_teams(self, TeamStats, Teams=None):
+        """Fold the coefficients into the stats of every team with one
+        matrix multiply. Teams without stats score NaN.
+
+        Arguments:
+            TeamStats (pd.DataFrame) -- TeamName and the stats of X_vars, one row
+                per team, e.g. FeatureEngine.latest().
+            Teams (pd.DataFrame) -- TeamName and TeamID of each team. (default put_team_ids())
+
+        Returns: None
+        """
+        assert self.params is not None, ValueError('fit or load coefficients first')
+        if Teams is None:
+            Teams = put_team_ids(verbose=False)
+        self.Teams = Teams[['TeamName', 'TeamID']].reset_index(drop=True)
+        Stats = TeamStats.assign(TeamName=TeamStats['TeamName'].astype(str)).set_index('TeamName')
+        F = Stats.reindex(self.Teams['TeamName'].astype(str))[self._stats].to_numpy(dtype=float)
+
+        # Column 0 holds each stat's coefficient for the team, column 1 for its opponent.
+        B = np.zeros((len(self._stats), 2))
+        for v in self.X_vars:
+            opp = v.startswith('Opp')
+            B[self._stats.index(v[len('Opp'):] if opp else v), int(opp)] = self.params[v]
+        S = F @ B
+        self._own, self._opp = S[:, 0], S[:, 1]
+        self._const = float(self.params.get('const', 0.0))
+
+        # Row of every TeamID, -1 for unknown TeamIDs
+        ids = self.Teams['TeamID'].to_numpy(dtype=np.int64)
+        self._rows = np.full(ids.max() + 2, -1)
+        self._rows[ids] = np.arange(len(ids))
+        self._own = np.r_[self._own, np.nan]
+        self._opp = np.r_[self._opp, np.nan]
+        self._row_of = dict(zip(ids.tolist(), range(len(ids))))
+        self._own_list, self._opp_list = self._own.tolist(), self._opp.tolist()
+        return None
+
+
+    def _lookup(self, TeamIDs):
+        """Rows of TeamIDs, pointing at the NaN row for unknown TeamIDs."""
+        TeamIDs = np.asarray(TeamIDs, dtype=np.int64)
+        rows = self._rows[np.where((TeamIDs >= 0) & (TeamIDs < len(self._rows)), TeamIDs, -1)]
+        return np.where(rows >= 0, rows, len(self._own) - 1)
+
+
+    def score(self, TeamID1, TeamID2):
+        """Probability that TeamID1 beats TeamID2 for many pairs at once.
+
+        Arguments:
+            TeamID1 (array-like) -- TeamIDs of one side.
+            TeamID2 (array-like) -- TeamIDs of the other side.
+
+        Returns: np.ndarray of float
+        """
+        assert self.Teams is not None, ValueError('set_teams first')
+        x = self._const + self._own[self._lookup(TeamID1)] + self._opp[self._lookup(TeamID2)]
+        return 1 / (1 + np.exp(-x))
+
+
+    def score_keys(self, MatchupKey):
+        """Probability that TeamID1 wins for packed MatchupKeys. Returns: np.ndarray of float"""
+        return self.score(*unpack_matchup_ids(MatchupKey))
+
+
+    def probability(self, TeamID1, TeamID2):
+        """Probability that TeamID1 beats TeamID2, using plain Python for
+        single queries. Unknown TeamIDs raise KeyError.
+
+        Returns: float
+        """
+        x = self._const + self._own_list[self._row_of[TeamID1]] + self._opp_list[self._row_of[TeamID2]]
+        return 1 / (1 + math.exp(-x)) if x == x else float('nan')
+
+
+    def matrix(self, TeamIDs=None):
+        """Matrix P with P[i, j] the probability that TeamIDs[i] beats TeamIDs[j].
+
+        Arguments:
+            TeamIDs (array-like) -- Teams to score. (default every team)
+
+        Returns: np.ndarray of float
+        """
+        rows = np.arange(len(self.Teams)) if TeamIDs is None else self._lookup(TeamIDs)
+        P = 1 / (1 + np.exp(-(self._const + self._own[rows][:, None] + self._opp[rows][None, :])))
+        np.fill_diagonal(P, 0.5)
+        return P
+
+
+    def scored_matchups(self, MatchupKey):
+        """Scores of packed MatchupKeys as MatchupID, Pred and PredWin, the
+        format of ScoredMatchups.csv with the full probability in Pred.
+
+        Returns: pd.DataFrame
+        """
+        Pred = self.score_keys(MatchupKey)
+        return pd.DataFrame({'MatchupID': matchup_id_strings(MatchupKey), 'Pred': Pred,
+                             'PredWin': np.round(Pred)})
+
+
+def make_training_data(GameStats, SeasonMatchups, engine):
+    """Features of both teams before each game and the outcome, like the
+    notebook's Data. Each game appears once from each side.
+
+    Arguments:
+        GameStats (pd.DataFrame) -- Team totals of every game, e.g. ModelData.season_game_stats().
+        SeasonMatchups (pd.DataFrame) -- Opponent of each team in each game.
+        engine (FeatureEngine) -- Features to build.
+
+    Returns: pd.DataFrame with Date, TeamName, Opponent, Win, the features and Opp features.
+    """
+    Features = engine.fit_transform(GameStats)
+    Features['Win'] = GameStats.loc[Features.index, 'Win']
+    Data = pd.merge(SeasonMatchups, Features, on=['Date', 'TeamName'])
+    Opp = Features.drop(columns='Win').rename(columns={'TeamName': 'Opponent'})
+    Opp.columns = ['Opp' + c if c not in ('Date', 'Opponent') else c for c in Opp.columns]
+    return pd.merge(Data, Opp, on=['Date', 'Opponent'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fit the logit model once and score matchups.')
+    parser.add_argument('--fit', action='store_true',
+                        help='fit again even if saved coefficients exist')
+    parser.add_argument('--params', default=PARAMS_FILE)
+    parser.add_argument('--bracket', default=None,
+                        help='only score pairs of teams in this Bracket.csv')
+    parser.add_argument('--ofile', default='./../data/ScoredMatchups.csv')
+    args = parser.parse_args()
+
+    data = get_model_data()
+    scorer = MatchupScorer()
+    engine = FeatureEngine(['FG', 'FGA', 'FT', 'FTA', 'PF', 'ScoreDiff', 'Win'], windows=(3,), cumulative=False)
+    if args.fit or not os.path.exists(args.params):
+        scorer.fit(make_training_data(data.season_game_stats(), data.season_matchups(), engine))
+        scorer.save(args.params)
+        print('Coefficients saved to', args.params)
+    else:
+        scorer = MatchupScorer.load(args.params)
+        engine.fit_transform(data.season_game_stats())
+
+    Teams = put_team_ids(verbose=False)
+    scorer.set_teams(engine.latest(), Teams)
+    index = MatchupIndex(Teams)
+    pair_ids = index.bracket_pair_ids(args.bracket) if args.bracket else np.arange(len(index))
+    scorer.scored_matchups(index.matchup_keys(pair_ids)).to_csv(args.ofile, index=False)
+    print(len(pair_ids), 'matchups scored to', args.ofile)
@@ -1,8 +1,14 @@
+from multiprocessing import Pool
+import csv
 import os
+from time import perf_counter
 
 from bs4 import BeautifulSoup
+import pandas as pd
 
 from Exceptions import OverwriteError
+from HtmlCache import GZIP_SUFFIX, is_page, read_page
+from Profiler import profiler
 
 class Miner:
     """Base class for other Miners.
@@ -15,23 +21,51 @@ class Miner:
     Methods:
         __init__ (None) -- initialize Miner with a writer object.
         make_soup (BeautifulSoup) -- Makes BeautifulSoup from html.
+        read_html (str) -- Reads html from disk without prettify() indentation.
+        mine (List) -- Mine one html file. Implemented by subclasses.
+        mine_files (None) -- Mine and write many html files, optionally in parallel.
+        drop_sources (None) -- Remove the rows of given source files from the exported data.
+        write_columnar (None) -- Write the exported data to a typed Parquet file.
+
+    Todo:
 
-    Todo: 
-        
     """
 
     days = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
 
-    def __init__(self, data_path):
+    # Columns of the index of mined source files kept beside the exported data.
+    INDEX_COLNAMES = ('Source', 'MTime', 'Size', 'Offset', 'Length')
+
+    # pandas dtype of each exported column, used by write_columnar. Set by subclasses.
+    DTYPES = {}
+
+    def __init__(self, data_path, *, incremental=False):
         """Initialize Miner.
 
+        Every mined source file is recorded in an index at data_path + '.index'
+        with its mtime, size and the byte range of its rows in the export.
+
         Arguments:
             data_path (str) -- Relative or absolute path to exported data.
+                None opens no writer, e.g. for miners in worker processes.
+
+        Keyword arguments:
+            incremental (bool) -- Append to existing data instead of raising
+                OverwriteError. mine_files then skips source files whose
+                mtime and size are unchanged. (default False)
         """
         self._data_path = data_path
-        if os.path.exists(data_path):
+        self._incremental = incremental
+        self.writer = None
+        self.index = {}
+        if data_path is None:
+            return
+        if os.path.exists(data_path) and not incremental:
             raise OverwriteError("A file at {} already exists!".format(data_path))
-        self.writer = open(data_path, 'wb')
+        if os.path.exists(data_path):
+            self.index = read_index(self.index_path)
+        os.makedirs(os.path.dirname(data_path) or '.', exist_ok=True)
+        self.writer = open(data_path, 'ab')
 
 
     def make_soup(self, path):
@@ -41,12 +75,252 @@ class Miner:
         :param path: path to tsv document.
         :return: BeautifulSoup object
         '''
+        html = self.read_html(path)
+        with profiler.timer('miner.parse', path):
+            self.soup = BeautifulSoup(html, 'html.parser')
+        return self.soup
+
+
+    def read_html(self, path):
+        """Read html from disk in either cache format (see HtmlCache).
+        The indentation of prettify() is removed from txt files.
+
+        Arguments:
+            path (str) -- Path to html txt or txt.gz file.
+
+        Returns: str
+        """
         if not os.path.exists(path):
             raise AttributeError('path parameter must point to an existing directory.')
-        with open(path, 'rb') as f:
-            html = f.read().decode('UTF-8')
-        html = ''.join(line.strip() for line in html.split('\n'))
+        with profiler.timer('miner.read', path):
+            header, html = read_page(path)
+        profiler.count('miner.bytes_read', len(html))
+        html = html.decode('UTF-8')
+        if path.endswith(GZIP_SUFFIX):
+            # Raw responses have no indentation to undo, but still spell
+            # non-breaking spaces as entities.
+            html = html.replace('&nbsp;', ' ').replace('&#160;', ' ')
+        else:
+            html = ''.join(line.strip() for line in html.split('\n'))
         html = html.replace(u'\xa0', ' ')  # A troublesome UTF-8 character
+        return html
 
-        self.soup = BeautifulSoup(html, 'html.parser')
-        return self.soup
+
+    def mine(self, path):
+        """Mine the html file at path. Implemented by subclasses.
+
+        Returns: Nested list of data.
+        """
+        raise NotImplementedError
+
+
+    def write(self, sep='\t'):
+        """Write collected data to the exported file. Implemented by subclasses."""
+        raise NotImplementedError
+
+
+    def mine_files(self, paths, *, processes=1, chunksize=16):
+        """Mine every file in paths and write the rows in sorted path order.
+
+        With more than one process, files are spread across a process pool.
+        Results are collected in submission order, so the exported file is
+        identical no matter how many processes are used.
+
+        Arguments:
+            paths (iterable (str)) -- Paths to html files.
+
+        Keyword arguments:
+            processes (int) -- Number of worker processes. (default 1)
+            chunksize (int) -- Files handed to a worker at a time. (default 16)
+
+        Returns: None
+        """
+        assert isinstance(processes, int) and processes > 0, TypeError('processes parameter must be a positive int')
+        assert isinstance(chunksize, int) and chunksize > 0, TypeError('chunksize parameter must be a positive int')
+        paths = sorted(paths)
+        if self._incremental:
+            changed = [path for path in paths if path in self.index and self._is_changed(path)]
+            self.drop_sources(changed)
+            paths = [path for path in paths if path not in self.index]
+            print(len(paths), "new or changed files to mine.")
+
+        if processes == 1:
+            results = (_mine_path(self, path) for path in paths)
+            self._write_results(paths, results)
+            return None
+
+        with Pool(processes, initializer=_init_worker, initargs=(type(self),)) as pool:
+            results = pool.imap(_mine_in_worker, paths, chunksize)
+            self._write_results(paths, results)
+
+        return None
+
+
+    def _write_results(self, paths, results):
+        """Write (game_data, error, seconds) results that line up with paths
+        and index the rows of each path. Returns: None"""
+        try:
+            for path, (game_data, err, seconds) in zip(paths, results):
+                print("Mining", os.path.basename(path))
+                # Timed where it was mined, which may be a worker process.
+                profiler.add_time('miner.mine', seconds, path)
+                profiler.count('miner.files')
+                offset = self.writer.tell()
+                if err is not None:
+                    print(err)
+                    profiler.count('miner.errors')
+                else:
+                    self.game_data = game_data
+                    self.write()
+                    profiler.count('miner.rows', len(game_data))
+                stat = os.stat(path)
+                self.index[path] = {'Source': path, 'MTime': str(stat.st_mtime_ns),
+                                    'Size': str(stat.st_size), 'Offset': str(offset),
+                                    'Length': str(self.writer.tell() - offset)}
+        finally:
+            # Index whatever was written, even if mining was interrupted.
+            self.writer.flush()
+            write_index(self.index_path, self.index)
+        return None
+
+
+    def write_columnar(self, path=None):
+        """Write the exported data to a Parquet file with the column types in
+        DTYPES. Dates are stored as dates, stats as numbers and names as
+        dictionary-encoded categories. Requires pyarrow or fastparquet.
+
+        Arguments:
+            path (str) -- Path to the Parquet file. (default data_path with a .parquet extension)
+
+        Returns: None
+        """
+        self.writer.flush()
+        data = read_typed_tsv(self._data_path, self.DTYPES)
+        data.to_parquet(path or columnar_path(self._data_path), index=False)
+        return None
+
+
+    @property
+    def index_path(self):
+        """Path to the index of mined source files."""
+        return self._data_path + '.index'
+
+
+    def _is_changed(self, path):
+        """Whether a mined source file changed since it was indexed."""
+        stat = os.stat(path)
+        entry = self.index[path]
+        return (str(stat.st_mtime_ns), str(stat.st_size)) != (entry['MTime'], entry['Size'])
+
+
+    def drop_sources(self, paths):
+        """Remove the rows of the given source files from the exported data
+        and from the index. The export is rewritten once, sequentially.
+
+        Arguments:
+            paths (iterable (str)) -- Indexed source files.
+
+        Returns: None
+        """
+        dropped = [self.index.pop(path) for path in paths if path in self.index]
+        if not dropped:
+            return None
+
+        self.writer.close()
+        tmp_path = self._data_path + '.tmp'
+        entries = list(self.index.values()) + dropped
+        with open(self._data_path, 'rb') as old, open(tmp_path, 'wb') as new:
+            # Header and anything else not owned by a source file is kept.
+            kept_until = 0
+            for entry in sorted(entries, key=lambda entry: int(entry['Offset'])):
+                offset, length = int(entry['Offset']), int(entry['Length'])
+                new.write(old.read(offset - kept_until))
+                rows = old.read(length)
+                if entry['Source'] in self.index:
+                    entry['Offset'] = str(new.tell())
+                    new.write(rows)
+                kept_until = offset + length
+            new.write(old.read())
+        os.replace(tmp_path, self._data_path)
+        self.writer = open(self._data_path, 'ab')
+        write_index(self.index_path, self.index)
+
+        return None
+
+
+def columnar_path(data_path):
+    """Path of the Parquet copy of exported tsv data.
+
+    Example:
+        > columnar_path("./../data-raw/2017/boxscores.txt")
+        "./../data-raw/2017/boxscores.parquet"
+    """
+    return os.path.splitext(data_path)[0] + '.parquet'
+
+
+def read_typed_tsv(path, dtypes):
+    """Read exported tsv data with the given pandas dtypes.
+    'datetime64[ns]' columns are parsed as dates.
+
+    Returns: pd.DataFrame
+    """
+    dates = [c for c, dtype in dtypes.items() if dtype == 'datetime64[ns]']
+    data = pd.read_csv(path, sep='\t', index_col=False,
+                       dtype={c: dtype for c, dtype in dtypes.items() if c not in dates})
+    for c in dates:
+        data[c] = pd.to_datetime(data[c])
+    return data
+
+
+def read_index(path):
+    """Read an index of mined source files.
+
+    Returns: dict mapping source path to its index entry.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8') as f:
+        return {entry['Source']: entry for entry in csv.DictReader(f, delimiter='\t')}
+
+
+def write_index(path, index):
+    """Write an index of mined source files. Returns: None"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, Miner.INDEX_COLNAMES, delimiter='\t')
+        writer.writeheader()
+        writer.writerows(sorted(index.values(), key=lambda entry: int(entry['Offset'])))
+    os.replace(tmp_path, path)
+    return None
+
+
+def list_html_files(directory):
+    """List every txt or txt.gz file under directory in sorted order.
+
+    Returns: List of paths.
+    """
+    return sorted(os.path.join(root, f)
+                  for root, dirs, files in os.walk(directory)
+                  for f in files if is_page(f))
+
+
+def _mine_path(miner, path):
+    """Mine one file. Returns: (game_data, None, seconds), or (None, error,
+    seconds) on a ValueError."""
+    start = perf_counter()
+    try:
+        return miner.mine(path), None, perf_counter() - start
+    except ValueError as err:
+        return None, err, perf_counter() - start
+
+
+# Each worker process builds one miner without a writer and reuses it.
+_worker_miner = None
+
+def _init_worker(miner_class):
+    global _worker_miner
+    _worker_miner = miner_class(None)
+
+
+def _mine_in_worker(path):
+    return _mine_path(_worker_miner, path)
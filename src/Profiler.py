@@ -0,0 +1,218 @@
+"""
+Opt-in timers and counters around the slow parts of a run.
+
+Instrumented code asks the shared profiler for a timer or adds to a counter.
+Both do nothing until the profiler is enabled, so the hooks stay in place at
+no real cost. Set MM_PROFILE to a file name to enable it for any script and
+write a JSON summary there when the script exits:
+
+    MM_PROFILE=./../profile.json python BoxscoreMiner.py
+
+Timers are named by stage, e.g. 'scraper.fetch', 'miner.parse' or
+'model_data.merge.season_game_stats'. Set MM_CPROFILE to a comma separated
+list of timer names to also run those stages under cProfile. Each stage's
+stats add up over all of its calls and are written next to the summary,
+e.g. profile.json.scraper.fetch.prof.
+"""
+
+import atexit
+import contextlib
+import cProfile
+import json
+import os
+import threading
+from time import perf_counter
+
+# Environment variables read when this module is imported
+PROFILE_ENV = 'MM_PROFILE'
+CPROFILE_ENV = 'MM_CPROFILE'
+
+
+class Profiler:
+    """Timers and counters collected while enabled.
+
+    Attributes:
+        enabled (bool) -- Whether timers and counters record anything.
+        timers (dict) -- Calls, total, max and slowest item of each timer.
+        counters (dict) -- Value of each counter.
+        cprofile (set (str)) -- Timer names that run under cProfile.
+        ofile (str) -- Path of the JSON summary written by dump.
+
+    Methods:
+        __init__ (None) -- Initialize a disabled profiler.
+        enable (None) -- Start recording.
+        disable (None) -- Stop recording.
+        reset (None) -- Forget everything recorded.
+        timer (context manager) -- Time a block under a name.
+        add_time (None) -- Record a duration measured elsewhere.
+        count (None) -- Add to a counter.
+        profile (object) -- Run a function under cProfile.
+        summary (dict) -- Everything recorded, with means.
+        dump (dict) -- Write the summary as JSON.
+    """
+
+    def __init__(self):
+        """Initialize a disabled Profiler. Returns: None"""
+        self.enabled = False
+        self.cprofile = set()
+        self.ofile = None
+        self._lock = threading.Lock()
+        self._cprofile_active = False
+        self.reset()
+        return None
+
+
+    def enable(self, ofile=None, *, cprofile=()):
+        """Start recording.
+
+        Arguments:
+            ofile (str) -- Path of the JSON summary. (default None)
+
+        Keyword arguments:
+            cprofile (iterable (str)) -- Timer names to run under cProfile. (default ())
+
+        Returns: None
+        """
+        self.enabled = True
+        self.ofile = ofile
+        self.cprofile = set(cprofile)
+        return None
+
+
+    def disable(self):
+        """Stop recording. Returns: None"""
+        self.enabled = False
+        return None
+
+
+    def reset(self):
+        """Forget every timer and counter. Returns: None"""
+        self.timers = {}
+        self.counters = {}
+        # One cProfile per timer name, enabled around each of its calls
+        self._profiles = {}
+        self._started = perf_counter()
+        return None
+
+
+    def timer(self, name, item=None):
+        """Context manager timing its block under name.
+
+        Arguments:
+            name (str) -- Timer name, e.g. 'miner.parse'.
+            item (str) -- What was timed, e.g. a file, kept for the slowest call. (default None)
+
+        Returns: Context manager
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timed(name, item)
+
+
+    @contextlib.contextmanager
+    def _timed(self, name, item):
+        profile = None
+        if name in self.cprofile:
+            with self._lock:
+                # Only one cProfile can run at a time.
+                if not self._cprofile_active:
+                    self._cprofile_active = True
+                    profile = self._profiles.get(name)
+                    if profile is None:
+                        profile = self._profiles[name] = cProfile.Profile()
+            if profile is not None:
+                profile.enable()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start, item)
+            if profile is not None:
+                profile.disable()
+                with self._lock:
+                    self._cprofile_active = False
+
+
+    def _cprofile_path(self, name, ofile=None):
+        return '{}.{}.prof'.format(ofile or self.ofile or 'profile', name)
+
+
+    def add_time(self, name, seconds, item=None):
+        """Record seconds under timer name, e.g. a duration measured in a
+        worker process. Returns: None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            timer = self.timers.setdefault(name, {'Calls': 0, 'Seconds': 0.0, 'Max': 0.0, 'Slowest': None})
+            timer['Calls'] += 1
+            timer['Seconds'] += seconds
+            if seconds >= timer['Max']:
+                timer['Max'] = seconds
+                timer['Slowest'] = item
+        return None
+
+
+    def count(self, name, n=1):
+        """Add n to counter name, e.g. 'scraper.bytes'. Returns: None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        return None
+
+
+    def profile(self, func, *args, ofile='profile.prof', **kwargs):
+        """Run func(*args, **kwargs) under cProfile, whether or not the
+        profiler is enabled, and write its stats to ofile. Read them with
+        pstats, e.g. `python -m pstats profile.prof`.
+
+        Returns: Whatever func returns.
+        """
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            profile.dump_stats(ofile)
+
+
+    def summary(self):
+        """Everything recorded so far.
+
+        Returns: dict with the wall time, every timer with its mean and every counter.
+        """
+        with self._lock:
+            timers = {name: dict(timer, Mean=timer['Seconds'] / timer['Calls'])
+                      for name, timer in sorted(self.timers.items())}
+            counters = dict(sorted(self.counters.items()))
+        return {'WallSeconds': perf_counter() - self._started, 'Timers': timers, 'Counters': counters}
+
+
+    def dump(self, ofile=None):
+        """Write the summary as JSON, and the cProfile stats of each timer
+        in cprofile next to it.
+
+        Arguments:
+            ofile (str) -- Path of the JSON file. (default the path given to enable)
+
+        Returns: dict summary
+        """
+        summary = self.summary()
+        ofile = ofile or self.ofile
+        if ofile:
+            os.makedirs(os.path.dirname(ofile) or '.', exist_ok=True)
+            with open(ofile, 'w') as f:
+                json.dump(summary, f, indent=2)
+        with self._lock:
+            profiles = dict(self._profiles)
+        for name, profile in profiles.items():
+            profile.dump_stats(self._cprofile_path(name, ofile))
+        return summary
+
+
+# Profiler shared by every instrumented module
+profiler = Profiler()
+
+if os.environ.get(PROFILE_ENV):
+    profiler.enable(os.environ[PROFILE_ENV],
+                    cprofile=[name for name in os.environ.get(CPROFILE_ENV, '').split(',') if name])
+    atexit.register(profiler.dump)
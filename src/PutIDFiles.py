@@ -1,42 +1,63 @@
 
 import os
-from itertools import combinations
-
 import pandas as pd 
 import numpy as np
 
-from PutModelData import get_gamesheets, get_game_results
+from PutModelData import get_season_data
+from Seasons import CURRENT_SEASON, id_path
+
+# Column types of Games.csv and Matchups.csv
+GAME_DTYPES = {'GameID': 'int32', 'TeamID': 'int32'}
+MATCHUP_DTYPES = {'Team1': str, 'Team2': str, 'TeamID1': 'int32', 'TeamID2': 'int32', 'MatchupID': str}
 
 
-def put_team_ids(ofile='./../data/Teams.csv', verbose=True):
+def put_team_ids(ofile='./../data/Teams.csv', verbose=True, *, seasons=None):
     """Create Teams.csv file with one unique ID per team.
 
+    Teams.csv is shared by every season. Teams first seen in a later season
+    get the next free IDs, so a team keeps its TeamID across seasons.
+
     Parameters:
         ofile (str) -- out file to export DataFrame. 
         verbose (bool) -- Whether to include file overwrite warning.
+        seasons (iterable (int)) -- Seasons whose teams need IDs. (default
+            None: read an existing file as is, or create it for CURRENT_SEASON)
 
     Returns: pd.DataFrame
     """
     if os.path.exists(ofile):
-        if verbose:
-            print(ofile, "exists. File was not overwritten.")
         Teams = pd.read_csv(ofile, index_col=False)
+        if seasons is None:
+            if verbose:
+                print(ofile, "exists. File was not overwritten.")
+            return Teams
     else:
-        Teams = pd.DataFrame(pd.unique(get_game_results()['TeamName']), 
-                             columns=['TeamName'])
-        Teams = Teams.sort_values('TeamName')
-        Teams['TeamID'] = np.arange(1000, 1000 + len(Teams['TeamName']))
+        Teams = pd.DataFrame({'TeamName': [], 'TeamID': []}).astype({'TeamID': int})
+
+    names = get_season_data(seasons or (CURRENT_SEASON,)).game_results()['TeamName']
+    new = sorted(set(names.astype(str)) - set(Teams['TeamName']))
+    if new:
+        first_id = Teams['TeamID'].max() + 1 if len(Teams) else 1000
+        Teams = pd.concat([Teams, pd.DataFrame({'TeamName': new,
+                                                'TeamID': np.arange(first_id, first_id + len(new))})],
+                          ignore_index=True)
+        os.makedirs(os.path.dirname(ofile) or '.', exist_ok=True)
         Teams.to_csv(ofile, index=False)
+        if verbose:
+            print(len(new), "teams added to", ofile)
 
     return Teams
 
 
-def put_all_matchups(ofile='./../data/Matchups.csv', verbose=True):
+def put_all_matchups(ofile='./../data/Matchups.csv', verbose=True, *, string_ids=True):
     """Create Matchups.csv file with one unique ID per team.
+    MatchupIndex builds the same rows on demand for just the pairs needed.
 
     Parameters:
         ofile (str) -- out file to export DataFrame. 
         verbose (bool) -- Whether to include file overwrite warning.
+        string_ids (bool) -- Keep the MatchupID strings of the file next to
+            MatchupKey. (default True)
 
     Returns: pd.DataFrame
     """
@@ -44,45 +65,125 @@ def put_all_matchups(ofile='./../data/Matchups.csv', verbose=True):
     if os.path.exists(ofile):
         if verbose: 
             print(ofile, "exists. File was not overwritten.")
-        Matchups = pd.read_csv(ofile, index_col=False)
+        Matchups = pd.read_csv(ofile, index_col=False, dtype=MATCHUP_DTYPES)
+        Matchups = Matchups.astype({'Team1': team_dtype(Teams), 'Team2': team_dtype(Teams)})
+        Matchups['MatchupKey'] = pack_matchup_ids(Matchups['TeamID1'], Matchups['TeamID2'])
     else:
-        Matchups = pd.DataFrame((c for c in combinations(Teams['TeamName'], 2)),
-                                columns=['Team1', 'Team2'])
-        Matchups = pd.merge(Matchups, Teams, left_on='Team1', right_on='TeamName').rename(columns={'TeamID': 'TeamID1'})
-        del Matchups['TeamName']
-        Matchups = pd.merge(Matchups, Teams, left_on='Team2', right_on='TeamName').rename(columns={'TeamID': 'TeamID2'})
-        del Matchups['TeamName']
-
-        Matchups['MatchupID'] = Matchups.apply(lambda x: '_'.join([str(x['TeamID1']), str(x['TeamID2'])]), axis=1)
-        Matchups.to_csv(ofile, index=False)
+        Matchups = make_matchups(Teams)
+        Matchups['MatchupID'] = matchup_id_strings(Matchups['MatchupKey'])
+        Matchups.drop(columns='MatchupKey').to_csv(ofile, index=False)
+    if not string_ids:
+        del Matchups['MatchupID']
     return Matchups
 
 
-def put_game_ids(ofile='./../data/Games.csv', verbose=True):
-    """Create Games.csv file with one unique ID per team.
+def team_dtype(Teams):
+    """Categorical dtype of team names in TeamID order, shared by every
+    table so that joins on team names compare integer codes.
 
     Parameters:
-        ofile (str) -- out file to export DataFrame. 
+        Teams (pd.DataFrame) -- TeamName and TeamID of each team.
+
+    Returns: pd.CategoricalDtype
+    """
+    return pd.CategoricalDtype(Teams.sort_values('TeamID')['TeamName'].to_numpy())
+
+
+def pack_matchup_ids(TeamID1, TeamID2):
+    """Pack pairs of TeamIDs into one int64 MatchupKey, TeamID1 in the high
+    32 bits. MatchupKey identifies the same pair as MatchupID "TeamID1_TeamID2".
+
+    Parameters:
+        TeamID1 (int, array-like) -- TeamIDs of the first team.
+        TeamID2 (int, array-like) -- TeamIDs of the second team.
+
+    Returns: np.ndarray of int64
+    """
+    return (np.asarray(TeamID1, dtype=np.int64) << 32) | np.asarray(TeamID2, dtype=np.int64)
+
+
+def unpack_matchup_ids(MatchupKey):
+    """TeamID1 and TeamID2 of packed MatchupKeys.
+
+    Returns: Tuple of np.ndarray of int64
+    """
+    MatchupKey = np.asarray(MatchupKey, dtype=np.int64)
+    return MatchupKey >> 32, MatchupKey & 0xFFFFFFFF
+
+
+def parse_matchup_ids(MatchupID):
+    """MatchupKeys of MatchupID strings like "1000_1001".
+
+    Returns: np.ndarray of int64
+    """
+    ids = pd.Series(MatchupID, dtype=str).str.split('_', n=1, expand=True).astype(np.int64)
+    return pack_matchup_ids(ids[0], ids[1])
+
+
+def matchup_id_strings(MatchupKey):
+    """MatchupID strings of packed MatchupKeys, for csv files.
+
+    Returns: pd.Series of str
+    """
+    TeamID1, TeamID2 = unpack_matchup_ids(MatchupKey)
+    return pd.Series(TeamID1).astype(str) + '_' + pd.Series(TeamID2).astype(str)
+
+
+def make_matchups(Teams):
+    """Pair every team with every team before it in Teams, ordered by the
+    later team first, like the committed Matchups.csv: (0, 1), (0, 2),
+    (1, 2), (0, 3), ... Pairs are built from integer positions, so no names
+    are merged. Team names share team_dtype(Teams) and each pair has a
+    packed int64 MatchupKey.
+
+    Parameters:
+        Teams (pd.DataFrame) -- TeamName and TeamID of each team.
+
+    Returns: pd.DataFrame
+    """
+    second, first = np.tril_indices(len(Teams), k=-1)
+    names = pd.Categorical(Teams['TeamName'], dtype=team_dtype(Teams))
+    ids = Teams['TeamID'].to_numpy(dtype=np.int32)
+    Matchups = pd.DataFrame({'Team1': names[first], 'Team2': names[second],
+                             'TeamID1': ids[first], 'TeamID2': ids[second]})
+    Matchups['MatchupKey'] = pack_matchup_ids(Matchups['TeamID1'], Matchups['TeamID2'])
+    return Matchups
+
+
+def put_game_ids(ofile=None, verbose=True, *, season=CURRENT_SEASON):
+    """Create Games.csv file of a season with one unique ID per game.
+    GameIDs are unique within their season.
+
+    Parameters:
+        ofile (str) -- out file to export DataFrame. (default data/<season>/Games.csv)
         verbose (bool) -- Whether to include file overwrite warning.
+        season (int) -- Season, by the year it ends in. (default CURRENT_SEASON)
 
     Returns: pd.DataFrame
     """
+    if ofile is None:
+        ofile = id_path('Games.csv', season)
     if os.path.exists(ofile):
         if verbose: 
             print(ofile, "exists. File was not overwritten.")
-        Games = pd.read_csv(ofile, index_col=False)
-        Games['Date'] = pd.to_datetime(Games['Date'])
+        Games = pd.read_csv(ofile, index_col=False, dtype=GAME_DTYPES, parse_dates=['Date'])
     else:
-        Games = get_gamesheets()[['Date', 'WinningTeam', 'LosingTeam']]
+        Games = get_season_data((season,)).gamesheets()[['Date', 'WinningTeam', 'LosingTeam']]
         Games = Games.rename(columns={'WinningTeam': 'Team1', 'LosingTeam': 'Team2'})
-        Games['GameID'] = np.arange(10000, len(Games['Date'])+10000)
+        Games['GameID'] = np.arange(10000, len(Games['Date'])+10000, dtype=np.int32)
         Team1 = Games[['Date', 'Team1', 'GameID']].rename(columns={'Team1': 'TeamName'})
         Team2 = Games[['Date', 'Team2', 'GameID']].rename(columns={'Team2': 'TeamName'})
         Games = pd.concat([Team1, Team2], axis=0)
         Games['Date'] = pd.to_datetime(Games['Date'])
-        Teams = put_team_ids()
-        Games = pd.merge(Games, Teams, on='TeamName')
+        # Look TeamIDs up by category code instead of merging names.
+        Teams = put_team_ids(verbose=False, seasons=(season,))
+        codes = team_dtype(Teams).categories.get_indexer(Games['TeamName'].astype(str))
+        if (codes < 0).any():
+            unknown = sorted(Games['TeamName'].astype(str)[codes < 0].unique())
+            raise ValueError('teams without a TeamID: {}'.format(', '.join(unknown)))
+        Games['TeamID'] = Teams.sort_values('TeamID')['TeamID'].to_numpy(dtype=np.int32)[codes]
         del Games['TeamName']
+        os.makedirs(os.path.dirname(ofile) or '.', exist_ok=True)
         Games.to_csv(ofile, index=False)
 
     return Games
@@ -1,65 +1,332 @@
+import os
+
 import pandas as pd
 
-# from PutMatchups import put_season_matchups
+from BoxscoreMiner import BoxscoreMiner
+from GamesheetMiner import GamesheetMiner
+from Miner import columnar_path, read_typed_tsv
+from Profiler import profiler
+from Seasons import CURRENT_SEASON, mined_path, seasons_of
+from TeamRatings import EloRatings, MarginRatings
+
+# Mined data of the season being modeled. The repo does not ship these, so
+# run the miners first. See read_mined.
+BOXSCORES_CSV = mined_path('boxscores', CURRENT_SEASON)
+GAMESHEETS_CSV = mined_path('gamesheets', CURRENT_SEASON)
+
+# TeamIDs, which order the team categories. See PutIDFiles.put_team_ids.
+TEAMS_CSV = './../data/Teams.csv'
+
+def read_mined(csv, dtypes):
+    """Import data exported by a Miner. The typed Parquet copy written by
+    Miner.write_columnar is read instead of csv when it is at least as new.
+
+    Parameters:
+        csv (str) -- Path to exported tsv data.
+        dtypes (dict) -- pandas dtype of each column, e.g. BoxscoreMiner.DTYPES.
+
+    Errors:
+        FileNotFoundError -- Neither csv nor its Parquet copy exists.
+
+    Returns: pandas.DataFrame
+    """
+    parquet = columnar_path(csv)
+    if not os.path.exists(csv) and not os.path.exists(parquet):
+        raise FileNotFoundError('{} not found. Mine it from the scraped html with '
+                                '`python GamesheetMiner.py` and `python BoxscoreMiner.py`, or pass '
+                                'the path of other mined data, e.g. ./../data-raw/!gamesheets-2017.txt '
+                                'or ./../data-raw/sample-boxscores.txt.'.format(csv))
+    if os.path.exists(parquet) and (not os.path.exists(csv)
+                                    or os.path.getmtime(parquet) >= os.path.getmtime(csv)):
+        return pd.read_parquet(parquet)
+    return read_typed_tsv(csv, dtypes)
+
+# Raw sources loaded in this process: abspath -> (source_stamp, DataFrame)
+_sources = {}
+
+def source_stamp(csv):
+    """Modification times of exported tsv data and its Parquet copy.
+    Missing files are None.
+
+    Returns: tuple
+    """
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None
+                 for p in (csv, columnar_path(csv)))
+
+def load_mined(csv, dtypes):
+    """Memoized read_mined. Each file is read once per process and read
+    again only after it or its Parquet copy changes on disk.
+
+    The returned frame is shared. Copy it before modifying it in place.
+
+    Returns: pandas.DataFrame
+    """
+    key = os.path.abspath(csv)
+    stamp = source_stamp(csv)
+    cached = _sources.get(key)
+    if cached is None or cached[0] != stamp:
+        with profiler.timer('model_data.read', csv):
+            cached = _sources[key] = (stamp, read_mined(csv, dtypes))
+        profiler.count('model_data.rows_read', len(cached[1]))
+    return cached[1]
+
+def load_partitions(csvs, dtypes):
+    """load_mined for one path or a list of season partitions, which are
+    stacked in order. Only the listed partitions are read.
+
+    Returns: pandas.DataFrame
+    """
+    if isinstance(csvs, str):
+        return load_mined(csvs, dtypes)
+    data = pd.concat([load_mined(csv, dtypes) for csv in csvs], ignore_index=True)
+    # Partitions have their own categories, which concat drops.
+    for c, dtype in dtypes.items():
+        if dtype == 'category':
+            data[c] = data[c].astype('category')
+    return data
+
+def _path_list(csvs):
+    return [csvs] if isinstance(csvs, str) else list(csvs)
+
+
+class ModelData:
+    """Model data built from boxscores and gamesheets files, either single
+    files or lists of season partitions (see get_season_data).
+
+    Raw sources are read through load_mined and every derived frame is built
+    once, so frames built from other frames share them instead of reading
+    from disk again. Everything is rebuilt when a source file changes.
+
+    Team names in every frame share the categorical dtype of team_dtype, so
+    joins on Date and TeamName compare integer codes instead of strings. Its
+    categories are in TeamID order, like PutIDFiles.team_dtype, so codes are
+    the same in frames from either module.
+
+    Attributes:
+        boxscores_csv (str, List (str)) -- Paths to exported boxscore data.
+        gamesheets_csv (str, List (str)) -- Paths to exported gamesheet data.
+
+    Methods:
+        __init__ (None) -- Initialize with paths to the raw sources.
+        team_dtype (pd.CategoricalDtype) -- Categories of every team name.
+        gamesheets (pandas.DataFrame) -- Gamesheets with ScoreDiff.
+        game_results (pandas.DataFrame) -- One row per team and game.
+        season_matchups (pandas.DataFrame) -- Opponent of each team in each game.
+        boxscores (pandas.DataFrame) -- One row per player and game.
+        season_game_stats (pandas.DataFrame) -- Team totals of every game.
+        season_cum_stats (pandas.DataFrame) -- Cumulative team totals.
+        season_stats (pandas.DataFrame) -- Team totals of the season.
+        ratings (pandas.DataFrame) -- Elo and margin ratings of teams before each game.
+        clear (None) -- Drop every derived frame.
+    """
+
+    def __init__(self, boxscores_csv=BOXSCORES_CSV, gamesheets_csv=GAMESHEETS_CSV):
+        """Initialize ModelData.
+
+        Parameters:
+            boxscores_csv (str, List (str)) -- Paths to exported boxscore data.
+            gamesheets_csv (str, List (str)) -- Paths to exported gamesheet data.
+
+        Returns: None
+        """
+        self.boxscores_csv = boxscores_csv
+        self.gamesheets_csv = gamesheets_csv
+        self._frames = {}
+        return None
+
+    def _frame(self, name, build):
+        """Derived frame by name, built with build() when missing or stale."""
+        stamp = tuple(source_stamp(csv) for csv in _path_list(self.boxscores_csv) + _path_list(self.gamesheets_csv))
+        cached = self._frames.get(name)
+        if cached is None or cached[0] != stamp:
+            with profiler.timer('model_data.build.' + name):
+                cached = self._frames[name] = (stamp, build())
+        return cached[1]
+
+    def clear(self):
+        """Drop every derived frame. Returns: None"""
+        self._frames.clear()
+        return None
+
+    def team_dtype(self):
+        return self._frame('team_dtype', self._build_team_dtype)
+
+    def gamesheets(self):
+        return self._frame('gamesheets', self._build_gamesheets)
+
+    def game_results(self):
+        return self._frame('game_results', self._build_game_results)
 
-def get_gamesheets(csv='./../data-raw/gamesheets-2017.txt'):
+    def season_matchups(self):
+        return self._frame('season_matchups', self._build_season_matchups)
+
+    def boxscores(self):
+        return self._frame('boxscores', self._build_boxscores)
+
+    def season_game_stats(self):
+        return self._frame('season_game_stats', self._build_season_game_stats)
+
+    def season_cum_stats(self):
+        return self._frame('season_cum_stats', self._build_season_cum_stats)
+
+    def season_stats(self):
+        return self._frame('season_stats', self._build_season_stats)
+
+    def ratings(self):
+        return self._frame('ratings', self._build_ratings)
+
+    def _build_team_dtype(self):
+        # PutIDFiles builds Teams.csv from this module's frames.
+        from PutIDFiles import put_team_ids, team_dtype
+
+        Gamesheets = load_partitions(self.gamesheets_csv, GamesheetMiner.DTYPES)
+        names = [Gamesheets['WinningTeam'], Gamesheets['LosingTeam']]
+        # Boxscores are optional for frames built from gamesheets only.
+        if all(os.path.exists(csv) or os.path.exists(columnar_path(csv)) for csv in _path_list(self.boxscores_csv)):
+            names.append(load_partitions(self.boxscores_csv, BoxscoreMiner.DTYPES)['Team'])
+        categories = []
+        if os.path.exists(TEAMS_CSV):
+            categories = team_dtype(put_team_ids(TEAMS_CSV, verbose=False)).categories.tolist()
+        # Teams without a TeamID yet come last in name order, the order
+        # put_team_ids gives them their TeamIDs in.
+        new = sorted(set(pd.concat(names).astype(str).unique()) - set(categories))
+        return pd.CategoricalDtype(categories + new)
+
+    def _teams(self, TeamNames):
+        """TeamNames as team_dtype categories. Returns: pandas.Series"""
+        return TeamNames.astype(str).astype(self.team_dtype())
+
+    def _build_gamesheets(self):
+        Gamesheets = load_partitions(self.gamesheets_csv, GamesheetMiner.DTYPES)
+        return Gamesheets.assign(WinningTeam=self._teams(Gamesheets['WinningTeam']),
+                                 LosingTeam=self._teams(Gamesheets['LosingTeam']),
+                                 ScoreDiff=Gamesheets['WinningScore'] - Gamesheets['LosingScore'])
+
+    def _build_game_results(self):
+        Gamesheets = self.gamesheets()
+        Winners = Gamesheets[['Date', 'WinningTeam', 'WinningScore', 'ScoreDiff']]
+        Winners.columns = ('Date', 'TeamName', 'Score', 'ScoreDiff')
+        Losers = Gamesheets[['Date', 'LosingTeam', 'LosingScore', 'ScoreDiff']]
+        Losers.columns = ('Date', 'TeamName', 'Score', 'ScoreDiff')
+        Losers['ScoreDiff'] = -Losers['ScoreDiff']
+        GameResults = pd.concat([Winners, Losers], axis=0)
+
+        GameResults = GameResults[['Date', 'TeamName', 'Score', 'ScoreDiff']]
+        GameResults['Win'] = GameResults['ScoreDiff'] > 0
+        GameResults['Win'] = GameResults['Win'].astype(int)
+
+        return GameResults.sort_values(by=['Date', 'TeamName'])
+
+    def _build_season_matchups(self):
+        Gamesheets = self.gamesheets()
+        Winners = Gamesheets[['Date', 'WinningTeam', 'LosingTeam']]
+        Winners.columns = ('Date', 'TeamName', 'Opponent')
+        Losers = Gamesheets[['Date', 'LosingTeam', 'WinningTeam']]
+        Losers.columns = ('Date', 'TeamName', 'Opponent')
+        SeasonMatchups = pd.concat([Winners, Losers], axis=0, ignore_index=True)
+        return SeasonMatchups.sort_values(by=['Date', 'TeamName']).reset_index(drop=True)
+
+    def _build_boxscores(self):
+        Boxscores = load_partitions(self.boxscores_csv, BoxscoreMiner.DTYPES)
+        Boxscores = Boxscores.rename(columns={'Team': 'TeamName'})
+        Boxscores['TeamName'] = self._teams(Boxscores['TeamName'])
+
+        return Boxscores.sort_values(['Date', 'TeamName'])
+
+    def _build_season_game_stats(self):
+        Boxscores = self.boxscores()
+        GameResults = self.game_results()
+
+        # Calculate Individual Game Stats
+        variables = [c for c in Boxscores.columns if c not in ('Player', 'IsStarter', 'TeamID')]
+        SeasonGameStats = Boxscores[variables].groupby(by=['Date','TeamName'], observed=True).sum()
+        SeasonGameStats.reset_index(inplace=True)  # Removes multi-index from previous operation
+        SeasonGameStats['NumOT'] = (SeasonGameStats['MP'] - 200) // 25
+        with profiler.timer('model_data.merge.season_game_stats'):
+            SeasonGameStats = pd.merge(SeasonGameStats, GameResults, on=['Date', 'TeamName'])
+        return SeasonGameStats
+
+    def _build_season_cum_stats(self):
+        SeasonGameStats = self.season_game_stats()
+        Stats = SeasonGameStats.set_index(['Date', 'TeamName'])
+        # Totals start over every season.
+        seasons = seasons_of(SeasonGameStats['Date']).to_numpy()
+        SeasonCumStats = Stats.groupby([seasons, Stats.index.get_level_values(1)], observed=True).cumsum().reset_index()
+        SeasonCumStats.columns = ['Cum'+c if c not in ('Date', 'TeamName') else c for c in SeasonCumStats.columns]
+        SeasonCumStats['Cum2Ppct'] = SeasonCumStats['Cum2P'] / SeasonCumStats['Cum2PA']
+        SeasonCumStats['Cum3Ppct'] = SeasonCumStats['Cum3P'] / SeasonCumStats['Cum3PA']
+        SeasonCumStats['CumFTpct'] = SeasonCumStats['CumFT'] / SeasonCumStats['CumFTA']
+        return SeasonCumStats.drop(columns='CumTeamID', errors='ignore')
+
+    def _build_season_stats(self):
+        SeasonStats = self.season_game_stats()
+        return SeasonStats.set_index(['Date', 'TeamName']).groupby(level=1, observed=True).sum()
+
+    def _build_ratings(self):
+        Gamesheets = self.gamesheets()
+        with profiler.timer('model_data.fit.elo'):
+            Elo = EloRatings().fit(Gamesheets)
+        with profiler.timer('model_data.fit.margin'):
+            Margin = MarginRatings().fit(Gamesheets)
+        with profiler.timer('model_data.merge.ratings'):
+            Ratings = pd.merge(Elo, Margin, on=['Date', 'TeamName'])
+        Ratings['TeamName'] = self._teams(Ratings['TeamName'])
+        return Ratings
+
+
+# ModelData for each (boxscores_csv, gamesheets_csv) pair used in this process.
+_datasets = {}
+
+def get_model_data(boxscores_csv=BOXSCORES_CSV, gamesheets_csv=GAMESHEETS_CSV):
+    """Shared ModelData for a pair of raw sources.
+
+    Returns: ModelData
+    """
+    key = (tuple(os.path.abspath(csv) for csv in _path_list(boxscores_csv)),
+           tuple(os.path.abspath(csv) for csv in _path_list(gamesheets_csv)))
+    if key not in _datasets:
+        _datasets[key] = ModelData(boxscores_csv, gamesheets_csv)
+    return _datasets[key]
+
+def get_season_data(seasons=(CURRENT_SEASON,), data_dir='./../data-raw/'):
+    """Shared ModelData of the given seasons. Other seasons are not read.
+
+    Parameters:
+        seasons (iterable (int)) -- Seasons, by the year they end in.
+        data_dir (str) -- Directory holding mined data. (default './../data-raw/')
+
+    Returns: ModelData
+    """
+    return get_model_data([mined_path('boxscores', season, data_dir) for season in seasons],
+                          [mined_path('gamesheets', season, data_dir) for season in seasons])
+
+def get_gamesheets(csv=GAMESHEETS_CSV):
     """Import gamesheet data.
     """    
-    Gamesheets = pd.read_csv(csv, sep='\t', index_col=False)
-    Gamesheets['Date'] = pd.to_datetime(Gamesheets['Date'])
-    Gamesheets['ScoreDiff'] = Gamesheets['WinningScore'] - Gamesheets['LosingScore']
-    return Gamesheets
+    return get_model_data(gamesheets_csv=csv).gamesheets().copy()
 
-def get_game_results(csv='./../data-raw/gamesheets-2017.txt'):
+def get_game_results(csv=GAMESHEETS_CSV):
     """Get Gamesheet Data
     """
-    Gamesheets = get_gamesheets()
-    Winners = Gamesheets[['Date', 'WinningTeam', 'WinningScore', 'ScoreDiff']]
-    Winners.columns = ('Date', 'TeamName', 'Score', 'ScoreDiff')
-    Losers = Gamesheets[['Date', 'LosingTeam', 'LosingScore', 'ScoreDiff']]
-    Losers.columns = ('Date', 'TeamName', 'Score', 'ScoreDiff')
-    Losers['ScoreDiff'] = Losers.apply(lambda x: -x['ScoreDiff'], axis=1)
-    GameResults = pd.concat([Winners, Losers], axis=0)
-    
-    GameResults = GameResults[['Date', 'TeamName', 'Score', 'ScoreDiff']]
-    GameResults['Win'] = GameResults['ScoreDiff'] > 0
-    GameResults['Win'] = GameResults['Win'].astype(int)
-    
-    return GameResults.sort_values(by=['Date', 'TeamName'])
+    return get_model_data(gamesheets_csv=csv).game_results().copy()
 
-def get_boxscores(csv='./../data-raw/boxscores-2017.txt'):
-    Boxscores = pd.read_csv(csv, sep='\t', index_col=False)
-    Boxscores['Date'] = pd.to_datetime(Boxscores['Date'])
-    Boxscores = Boxscores.rename(columns={'Team': 'TeamName'})
-    
-    return Boxscores.sort_values(['Date', 'TeamName'])
+def get_boxscores(csv=BOXSCORES_CSV):
+    return get_model_data(boxscores_csv=csv).boxscores().copy()
 
 def get_season_game_stats():
-    Boxscores = get_boxscores().sort_values(['Date', 'TeamName'])
-    GameResults = get_game_results().sort_values(['Date', 'TeamName'])
-
-    # Calculate Individual Game Stats
-    variables = [c for c in Boxscores.columns if c not in ('Player', 'IsStarter', 'TeamID')]
-    SeasonGameStats = Boxscores[variables].groupby(by=['Date','TeamName']).sum()
-    SeasonGameStats.reset_index(inplace=True)  # Removes multi-index from previous operation
-    SeasonGameStats['NumOT'] = SeasonGameStats.apply(lambda x: (x['MP'] - 200) // 25, axis=1)
-    SeasonGameStats = pd.merge(SeasonGameStats, GameResults, on=['Date', 'TeamName'])
-    return SeasonGameStats
+    return get_model_data().season_game_stats().copy()
 
 def get_season_cum_stats():
-    SeasonGameStats = get_season_game_stats()
-    SeasonCumStats = SeasonGameStats.set_index(['Date', 'TeamName']).groupby(level=1).cumsum().reset_index()
-    SeasonCumStats.columns = ['Cum'+c if c not in ('Date', 'TeamName') else c for c in SeasonCumStats.columns]
-    SeasonCumStats['Cum2Ppct'] = SeasonCumStats['Cum2P'] / SeasonCumStats['Cum2PA']
-    SeasonCumStats['Cum3Ppct'] = SeasonCumStats['Cum3P'] / SeasonCumStats['Cum3PA']
-    SeasonCumStats['CumFTpct'] = SeasonCumStats['CumFT'] / SeasonCumStats['CumFTA']
-    del SeasonCumStats['CumTeamID']
-    return SeasonCumStats
+    return get_model_data().season_cum_stats().copy()
 
 def get_season_stats():
-    SeasonStats = get_season_game_stats()
-    SeasonStats.set_index(['Date', 'TeamName']).groupby(level=1).sum()
-    return SeasonStats
+    return get_model_data().season_stats().copy()
+
+def get_season_matchups():
+    return get_model_data().season_matchups().copy()
+
+def get_ratings():
+    return get_model_data().ratings().copy()
 
 def put_logit_data(ofile='./../data/model-data-logit.csv'):
     """Create logit data csv file.
@@ -69,20 +336,26 @@ def put_logit_data(ofile='./../data/model-data-logit.csv'):
     
     Returns: pandas.DataFrame
     """
-    SeasonGameStats = get_season_game_stats()
-    SeasonCumStats = get_season_cum_stats()
-    LogitData = pd.merge(SeasonGameStats, SeasonCumStats, on=['Date', 'TeamName'])
+    # Every frame shares data.team_dtype(), so these merge on integer codes.
+    data = get_model_data()
+    SeasonGameStats = data.season_game_stats()
+    SeasonCumStats = data.season_cum_stats()
+    Ratings = data.ratings()
+    SeasonMatchups = data.season_matchups()
+    with profiler.timer('model_data.merge.logit_data'):
+        LogitData = pd.merge(SeasonGameStats, SeasonCumStats, on=['Date', 'TeamName'])
+        LogitData = pd.merge(LogitData, Ratings, on=['Date', 'TeamName'], how='left')
 
-    LogitData = LogitData[[c for c in LogitData.columns if c !='CumTeamID']]
-    SeasonMatchups = put_season_matchups()
-    df = pd.merge(SeasonMatchups, LogitData, on=['Date', 'TeamName'], copy=True)
-    
-    LogitData.columns = ['Opp'+c if c not in ('Date', 'TeamName') else c for c in LogitData.columns]
-    df = pd.merge(df, LogitData, left_on=['Date','Opponent'], right_on=['Date','TeamName'])
-    del df['TeamName_y']
-    df = df.rename(columns={'TeamName_x': 'TeamName'})
-    df = df.sort_values(['Date', 'TeamName'])
-    df.to_csv('./../data/model-data-logit.csv', index=False)
+        LogitData = LogitData[[c for c in LogitData.columns if c !='CumTeamID']]
+        df = pd.merge(SeasonMatchups, LogitData, on=['Date', 'TeamName'])
+
+        LogitData.columns = ['Opp'+c if c not in ('Date', 'TeamName') else 'Opponent' if c == 'TeamName' else c
+                             for c in LogitData.columns]
+        df = pd.merge(df, LogitData, on=['Date', 'Opponent'])
+        df = df.sort_values(['Date', 'TeamName'])
+    with profiler.timer('model_data.write', ofile):
+        df.to_csv(ofile, index=False)
+    profiler.count('model_data.rows_written', len(df))
 
     return df
     
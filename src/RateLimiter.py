@@ -0,0 +1,252 @@
+"""
+Rate limiting shared by every request a scraper sends to the same host.
+
+The limiter is a token bucket per host, kept as the time the next token is
+free. Callers reserve a token before each request and only wait if it is not
+free yet, so time spent parsing or serving pages from the cache counts
+towards the delay instead of adding to it.
+
+The limiter also adapts to the host. Every response is reported back with
+its status and latency. A 429, a 5xx, a failed request or latency climbing
+above its long-run average doubles the interval between requests, and each
+healthy response shrinks it again until it is back at its floor. Requests
+already in flight when the host struggled report back late, so for one
+interval after a slowdown, further bad responses do not slow it again.
+"""
+
+import asyncio
+import random
+import threading
+from time import monotonic, sleep
+from urllib.parse import urlsplit
+
+from Profiler import profiler
+
+# Statuses that mean the host wants fewer requests
+THROTTLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Least interval after a slowdown, so a limiter starting at 0 still slows down.
+MIN_SLOWDOWN = 0.1
+
+# Responses before latency can slow the limiter down, and the least rise in
+# seconds that counts, so jitter on a fast host is not taken for trouble.
+LATENCY_WARMUP = 10
+MIN_LATENCY_RISE = 0.25
+
+
+class HostRateLimiter:
+    """Adaptive per-host token bucket, shared by threads and coroutines.
+
+    Request starts to the same host are spaced at least `interval` seconds
+    apart on average, with up to `burst` requests let through at once after
+    a quiet spell. With jitter, each gap is stretched by a random share of
+    the interval so requests do not arrive like clockwork.
+
+    Attributes:
+        min_interval (float) -- Shortest interval the limiter speeds back up to.
+        max_interval (float) -- Longest interval the limiter slows down to.
+        burst (int) -- Requests let through back to back after a quiet spell.
+        jitter (float) -- Largest random stretch of a gap, as a share of the interval.
+        adaptive (bool) -- Whether responses change the interval.
+
+    Methods:
+        __init__ (None) -- Initialize limiter with a starting interval.
+        set_interval (None) -- Set the interval and its floor.
+        interval (float) -- Current interval of the url's host.
+        acquire (None) -- Wait asynchronously for a token on the url's host.
+        wait (None) -- Block until a token on the url's host is free.
+        record (None) -- Adapt the interval to a response.
+        summary (dict) -- Interval and slowdowns of each host.
+    """
+
+    def __init__(self, interval=5, *, min_interval=None, max_interval=60, burst=1, jitter=0,
+                 adaptive=True, slowdown=2, speedup=0.9, latency_factor=2, seed=None):
+        """Initialize HostRateLimiter.
+
+        Arguments:
+            interval (int, float) -- Starting seconds between request starts on one host. (default 5)
+
+        Keyword arguments:
+            min_interval (int, float) -- Floor of the interval. (default interval)
+            max_interval (int, float) -- Ceiling of the interval. (default 60)
+            burst (int) -- Size of the bucket. 1 spaces every request. (default 1)
+            jitter (int, float) -- Largest random stretch of a gap, e.g. 0.5 waits
+                between 1 and 1.5 intervals. (default 0)
+            adaptive (bool) -- Slow down and speed up with the host's responses. (default True)
+            slowdown (int, float) -- Factor the interval grows by when the host struggles. (default 2)
+            speedup (float) -- Factor the interval shrinks by on each healthy response. (default 0.9)
+            latency_factor (int, float) -- Latency above this multiple of its long-run
+                average counts as struggling. (default 2)
+            seed (int) -- Seed of the jitter. (default None)
+
+        Returns: None
+        """
+        assert isinstance(interval, (int, float)), TypeError('interval parameter must be a positive int or float')
+        assert interval >= 0, TypeError('interval parameter must be a positive int or float')
+        assert isinstance(burst, int), TypeError('burst parameter must be a positive int')
+        assert burst >= 1, TypeError('burst parameter must be a positive int')
+        assert isinstance(jitter, (int, float)), TypeError('jitter parameter must be a positive int or float')
+        assert jitter >= 0, TypeError('jitter parameter must be a positive int or float')
+        assert slowdown >= 1, ValueError('slowdown parameter must be at least 1')
+        assert 0 < speedup <= 1, ValueError('speedup parameter must be between 0 and 1')
+
+        self.max_interval = max_interval
+        self.burst = burst
+        self.jitter = jitter
+        self.adaptive = adaptive
+        self._slowdown = slowdown
+        self._speedup = speedup
+        self._latency_factor = latency_factor
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self.set_interval(interval, min_interval)
+
+        return None
+
+
+    def set_interval(self, interval, min_interval=None):
+        """Set the interval of every host and its floor.
+
+        Arguments:
+            interval (int, float) -- Seconds between request starts on one host.
+            min_interval (int, float) -- Floor of the interval. (default interval)
+
+        Returns: None
+        """
+        assert isinstance(interval, (int, float)), TypeError('interval parameter must be a positive int or float')
+        assert interval >= 0, TypeError('interval parameter must be a positive int or float')
+        min_interval = interval if min_interval is None else min_interval
+        assert 0 <= min_interval <= interval, ValueError('min_interval parameter must be between 0 and interval')
+
+        with self._lock:
+            self.max_interval = max(self.max_interval, interval)
+            self._interval = interval
+            self.min_interval = min_interval
+            for state in self._hosts.values():
+                state['Interval'] = interval
+        return None
+
+
+    def _host(self, url):
+        """State of the url's host, created on first use. Call with the lock held."""
+        host = urlsplit(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {'Interval': self._interval, 'Next': 0.0, 'Latency': None,
+                                         'Baseline': None, 'Slowdowns': 0, 'Requests': 0,
+                                         'Cooldown': 0.0, 'Samples': 0}
+        return state
+
+
+    def interval(self, url):
+        """Current interval of the url's host in seconds. Returns: float"""
+        with self._lock:
+            return self._host(url)['Interval']
+
+
+    def _reserve(self, url):
+        """Take the next token of the url's host.
+
+        Returns: float seconds to wait before the request may start.
+        """
+        with self._lock:
+            state = self._host(url)
+            now = monotonic()
+            interval = state['Interval']
+            # A bucket that refilled while idle lets burst requests through at once.
+            slot = max(state['Next'], now - (self.burst - 1) * interval)
+            gap = interval * (1 + self._random.uniform(0, self.jitter)) if self.jitter else interval
+            state['Next'] = slot + gap
+            state['Requests'] += 1
+        return max(0.0, slot - now)
+
+
+    async def acquire(self, url):
+        """Wait until a request to the url's host may start, without blocking
+        the event loop.
+
+        Arguments:
+            url (str) -- Full url to site.
+
+        Returns: None
+        """
+        delay = self._reserve(url)
+        if delay:
+            await asyncio.sleep(delay)
+        return None
+
+
+    def wait(self, url):
+        """Block until a request to the url's host may start.
+
+        Arguments:
+            url (str) -- Full url to site.
+
+        Returns: None
+        """
+        delay = self._reserve(url)
+        if delay:
+            sleep(delay)
+        return None
+
+
+    def record(self, url, status=None, latency=None, *, retry_after=None):
+        """Adapt the interval of the url's host to a response.
+
+        Arguments:
+            url (str) -- Full url to site.
+            status (int) -- HTTP status, or None if no response came back, e.g. a
+                timeout or a dropped connection, which slows down like a 503. (default None)
+            latency (float) -- Seconds until the response headers came back. (default None)
+
+        Keyword arguments:
+            retry_after (float) -- Seconds the host asked to wait. (default None)
+
+        Returns: None
+        """
+        if not self.adaptive:
+            return None
+        with self._lock:
+            state = self._host(url)
+            now = monotonic()
+            rising = False
+            if latency is not None:
+                # A fast and a slow moving average. The fast one running well
+                # above the slow one, once the slow one has settled, means
+                # the host is slowing down.
+                if state['Latency'] is None:
+                    state['Latency'] = state['Baseline'] = latency
+                else:
+                    state['Latency'] += 0.3 * (latency - state['Latency'])
+                    state['Baseline'] += 0.02 * (latency - state['Baseline'])
+                    rising = (state['Samples'] >= LATENCY_WARMUP
+                              and state['Latency'] > self._latency_factor * state['Baseline']
+                              and state['Latency'] - state['Baseline'] > MIN_LATENCY_RISE)
+                state['Samples'] += 1
+
+            if status is None or status in THROTTLE_STATUSES or rising:
+                if now >= state['Cooldown']:
+                    state['Interval'] = min(self.max_interval,
+                                            max(state['Interval'], self.min_interval, MIN_SLOWDOWN) * self._slowdown)
+                    state['Cooldown'] = now + state['Interval']
+                    state['Slowdowns'] += 1
+                    profiler.count('rate_limiter.slowdowns')
+            elif state['Interval'] > self.min_interval:
+                interval = state['Interval'] * self._speedup
+                # Snap to the floor instead of creeping towards a floor of 0.
+                state['Interval'] = interval if interval - self.min_interval > MIN_SLOWDOWN / 100 else self.min_interval
+
+            if retry_after:
+                state['Next'] = max(state['Next'], now + retry_after)
+        return None
+
+
+    def summary(self):
+        """Interval, requests and slowdowns of each host so far.
+
+        Returns: dict mapping host to dict.
+        """
+        with self._lock:
+            return {host: {k: state[k] for k in ('Interval', 'Requests', 'Slowdowns')}
+                    for host, state in self._hosts.items()}
@@ -0,0 +1,150 @@
+"""
+Retries for requests that fail in ways that may pass on their own, e.g. a
+dropped connection, a timeout, a 429 or a 5xx response, or a page cut off
+before its closing tag.
+
+Each retry waits a random time between zero and an exponentially growing
+cap ("full jitter"), so workers that failed together do not retry together.
+A Retry-After header sets the least time to wait.
+"""
+
+import datetime
+from email.utils import parsedate_to_datetime
+import random
+
+import requests
+
+from Exceptions import InvalidPageError
+
+# Statuses worth retrying. Other error statuses, e.g. 404, fail at once.
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Request errors worth retrying, besides HTTPErrors with a status in RETRY_STATUSES.
+RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError,
+                InvalidPageError)
+
+
+class RetryPolicy:
+    """When to retry a failed request and how long to wait first.
+
+    Attributes:
+        retries (int) -- Retries after the first attempt.
+        base (float) -- Cap of the wait before the first retry, in seconds.
+        cap (float) -- Longest wait before any retry, in seconds.
+        statuses (frozenset (int)) -- HTTP statuses worth retrying.
+
+    Methods:
+        __init__ (None) -- Initialize the policy.
+        check (None) -- Raise for a failed or incomplete response.
+        backoff (float) -- Seconds to wait before the next attempt, or None to give up.
+        is_retryable (bool) -- Whether a request error may pass if sent again.
+    """
+
+    def __init__(self, retries=5, *, base=1, cap=60, statuses=RETRY_STATUSES, seed=None):
+        """Initialize RetryPolicy.
+
+        Arguments:
+            retries (int) -- Retries after the first attempt. (default 5)
+
+        Keyword arguments:
+            base (int, float) -- Cap of the wait before the first retry. Doubles with every retry. (default 1)
+            cap (int, float) -- Longest wait before any retry. (default 60)
+            statuses (iterable (int)) -- HTTP statuses worth retrying. (default RETRY_STATUSES)
+            seed (int) -- Seed of the jitter. (default None)
+
+        Returns: None
+        """
+        assert isinstance(retries, int), TypeError('retries parameter must be a positive int')
+        assert retries >= 0, TypeError('retries parameter must be a positive int')
+        assert isinstance(base, (int, float)), TypeError('base parameter must be a positive int or float')
+        assert base >= 0, TypeError('base parameter must be a positive int or float')
+        assert isinstance(cap, (int, float)), TypeError('cap parameter must be a positive int or float')
+        assert cap >= base, ValueError('cap parameter must be at least base')
+
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+        self.statuses = frozenset(statuses)
+        self._random = random.Random(seed)
+
+        return None
+
+
+    def check(self, response):
+        """Raise for a response that should not be saved.
+
+        Arguments:
+            response (requests.Response) -- Response to a request.
+
+        Errors:
+            requests.exceptions.HTTPError -- Response has an error status.
+            InvalidPageError -- Response is not a complete html page.
+
+        Returns: None
+        """
+        response.raise_for_status()
+        if not is_complete_page(response.content):
+            raise InvalidPageError('incomplete page ({} bytes) from {}'.format(len(response.content), response.url))
+        return None
+
+
+    def backoff(self, attempt, err):
+        """Seconds to wait before retrying a request that failed with err.
+
+        Arguments:
+            attempt (int) -- Number of attempts that failed before this one, from 0.
+            err (Exception) -- Error of the failed attempt.
+
+        Returns: float, or None if the request should not be retried.
+        """
+        if attempt >= self.retries or not self.is_retryable(err):
+            return None
+        delay = self._random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+        response = getattr(err, 'response', None)
+        if response is not None:
+            delay = max(delay, retry_after(response) or 0)
+        return delay
+
+
+    def is_retryable(self, err):
+        """Whether a request that failed with err may pass if sent again. Returns: bool"""
+        if isinstance(err, requests.exceptions.HTTPError):
+            return err.response is not None and err.response.status_code in self.statuses
+        return isinstance(err, RETRY_ERRORS)
+
+
+def is_complete_page(content):
+    """Whether content is an html page that was not cut off.
+
+    Arguments:
+        content (bytes) -- Response body.
+
+    Returns: bool
+    """
+    tail = content[-256:].rstrip().lower()
+    return tail.endswith(b'</html>')
+
+
+def retry_after(response):
+    """Seconds the server asked to wait in its Retry-After header.
+
+    Arguments:
+        response (requests.Response) -- Response to a request.
+
+    Returns: float, or None without a valid header.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
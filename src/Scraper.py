@@ -10,21 +10,35 @@ from copy import deepcopy
 from random import randrange
 import requests
 import os
-from time import sleep
+from time import perf_counter, sleep
 
 from bs4 import BeautifulSoup
 
+from Exceptions import InvalidPageError
+from HtmlCache import GZIP_SUFFIX, find_page, replace_file, write_page
+from HttpCache import HttpCache
+from Profiler import profiler
+from RateLimiter import HostRateLimiter
+from RetryPolicy import RetryPolicy, retry_after
+
 class Scraper:
     """Scraper class for web scraping from different urls.
+
+    Requests go through a HostRateLimiter instead of sleeping after each
+    one. It waits only as long as needed to keep crawl_delay between request
+    starts, randomizes the gaps with jitter, and slows down when the site
+    answers 429s or 5xx or gets slower. Pass one rate_limiter to several
+    scrapers to share it.
+
+    With an http_cache, requests for cached urls are conditional and a 304
+    is answered from disk. Its frozen policy skips the request altogether.
     
     Methods:
         __init__ (None) -- Initialize scraper.
-        set_crawl_delay (None) -- Set crawl delay to a positive int.
+        set_crawl_delay (None) -- Set crawl delay to a positive int or float.
+        fetch (bytes) -- Fetch raw html from given url, retrying transient failures.
         make_soup (BeautifulSoup object) -- Make soup out of given url.
-        write_html (None) -- Write given url to disc at specified path. 
-        
-    Todo:
-        Give option for randomized crawl delay. Adds protection against bot detectors.
+        write_html (bytes) -- Write given url to disc at specified path. 
     """
     _session = requests.Session()
     
@@ -38,13 +52,27 @@ class Scraper:
     # Insert your own VPN headers here
     _VPN_headers = deepcopy(_default_headers)
     
-    def __init__(self, *, use_VPN=False, encoding='utf-8', crawl_delay=5):
+    def __init__(self, *, use_VPN=False, encoding='utf-8', crawl_delay=5, compress=False,
+                 retry=None, timeout=30, jitter=0, min_crawl_delay=None, rate_limiter=None,
+                 http_cache=None):
         """Initialize Scraper class.
         
         Keyword arguments:
             use_VPN (bool) -- Whether to use VPN headers in request. Requests are slower if True. (default False)
             encoding (str) -- Which encoding to use when writing html to disk. (default 'utf-8')
-            crawl_delay (int, float) -- Number of seconds to delay the scraper.
+            crawl_delay (int, float) -- Seconds between request starts on one host.
+            compress (bool) -- Store raw responses gzip-compressed in txt.gz files
+                instead of prettified html. See HtmlCache. (default False)
+            retry (RetryPolicy) -- When to retry failed requests. (default RetryPolicy())
+            timeout (int, float) -- Seconds to wait for the server before a request fails. (default 30)
+            jitter (int, float) -- Randomly stretch each crawl delay by up to this
+                share, e.g. 0.5 for delays of 1 to 1.5 crawl_delay. (default 0)
+            min_crawl_delay (int, float) -- Shortest crawl delay the scraper speeds up
+                to while the site is healthy. (default crawl_delay)
+            rate_limiter (HostRateLimiter) -- Limiter shared with other scrapers. crawl_delay,
+                jitter and min_crawl_delay are ignored if given. (default None)
+            http_cache (HttpCache) -- Cache of validators and bodies for conditional
+                requests. (default None)
         
         Returns: None
         """
@@ -52,6 +80,13 @@ class Scraper:
         assert isinstance(encoding, str), TypeError('encoding parameter must be a str')        
         assert isinstance(crawl_delay, (int, float)), TypeError('crawl_delay parameter must be a positive int or float')
         assert crawl_delay >= 0, TypeError('crawl_delay parameter must be a positive int or float')
+        assert isinstance(compress, bool), TypeError('compress parameter must be True or False')
+        assert retry is None or isinstance(retry, RetryPolicy), TypeError('retry parameter must be a RetryPolicy')
+        assert isinstance(timeout, (int, float)), TypeError('timeout parameter must be a positive int or float')
+        assert timeout > 0, TypeError('timeout parameter must be a positive int or float')
+        assert rate_limiter is None or isinstance(rate_limiter, HostRateLimiter), \
+            TypeError('rate_limiter parameter must be a HostRateLimiter')
+        assert http_cache is None or isinstance(http_cache, HttpCache), TypeError('http_cache parameter must be a HttpCache')
         
         try:
             'a'.encode(encoding)
@@ -62,7 +97,13 @@ class Scraper:
         if use_VPN:
             self._session.headers = self._VPN_headers
         self._encoding = encoding
-        self._crawl_delay = crawl_delay
+        self._limiter = rate_limiter
+        if rate_limiter is None:
+            self._limiter = HostRateLimiter(crawl_delay, min_interval=min_crawl_delay, jitter=jitter)
+        self._compress = compress
+        self._retry = retry if retry is not None else RetryPolicy()
+        self._timeout = timeout
+        self._http_cache = http_cache
         
         return None
 
@@ -76,11 +117,125 @@ class Scraper:
         """
         assert isinstance(seconds, (int, float)), TypeError('seconds parameter must be a positive int or float')
         assert seconds >= 0, TypeError('seconds parameter must be a positive int or float')
-        self._crawl_delay = seconds
+        self._limiter.set_interval(seconds)
         
         return None
 
     
+    def fetch(self, url):
+        """Fetch raw html from a given url. Dropped connections, timeouts,
+        429s, 5xx responses and cut off pages are retried with backoff.
+        With an http_cache, a 304 or a frozen url is answered from disk.
+        
+        Arguments:
+            url (str) -- Full url to site.
+        
+        Errors:
+            requests.exceptions.RequestException -- Request failed for good.
+            InvalidPageError -- Every response was an incomplete page.
+
+        Returns: bytes
+        """
+        assert isinstance(url, str), TypeError('`url` must be a string')
+        content = self._frozen_body(url)
+        if content is not None:
+            return content
+
+        attempt = 0
+        while True:
+            with profiler.timer('scraper.rate_limit'):
+                self._limiter.wait(url)
+            start = perf_counter()
+            r, err = None, None
+            try:
+                with profiler.timer('scraper.fetch', url):
+                    r = self._get(url)
+                content = self._content(url, r)
+            except (requests.exceptions.RequestException, InvalidPageError) as e:
+                err = e
+            self._record(url, r, perf_counter() - start)
+            if err is None:
+                return content
+
+            delay = self._retry.backoff(attempt, err)
+            if delay is None:
+                if isinstance(err, requests.exceptions.ConnectionError):
+                    print('Your internet may be disconnected.', end='\r')
+                raise err
+            profiler.count('scraper.retries')
+            with profiler.timer('scraper.backoff'):
+                sleep(delay)
+            attempt += 1
+
+
+    def _record(self, url, r, seconds):
+        """Report a response, or None if none came back after seconds, to the
+        rate limiter. Returns: None"""
+        if r is None:
+            self._limiter.record(url, None, seconds)
+        else:
+            # elapsed stops at the response headers, so reading and parsing
+            # on a busy client do not look like a slow host.
+            self._limiter.record(url, r.status_code, r.elapsed.total_seconds(), retry_after=retry_after(r))
+        return None
+
+
+    def _get(self, url):
+        """Send one GET request with the scraper's timeout, conditional if
+        url is in the http cache. Returns: requests.Response"""
+        headers = self._http_cache.headers(url) if self._http_cache is not None else None
+        r = self._session.get(url, timeout=self._timeout, headers=headers)
+        profiler.count('scraper.requests')
+        profiler.count('scraper.bytes', len(r.content))
+        return r
+
+
+    def _content(self, url, r):
+        """Body of a response: the cached body for a 304, or the checked
+        body of any other response, which is cached.
+
+        Errors:
+            requests.exceptions.HTTPError -- Response has an error status.
+            InvalidPageError -- Response is not a complete page, or a 304 came
+                back for a body that is no longer cached.
+
+        Returns: bytes
+        """
+        if self._http_cache is None:
+            self._retry.check(r)
+            return r.content
+        if r.status_code == 304:
+            content = self._http_cache.body(url)
+            if content is None:
+                # Retried without validators, so the full page comes back.
+                self._http_cache.forget(url)
+                raise InvalidPageError('304 for {}, but its body is not cached'.format(url))
+            self._http_cache.refresh(url, r)
+            profiler.count('scraper.not_modified')
+            return content
+        self._retry.check(r)
+        self._http_cache.store(url, r)
+        return r.content
+
+
+    def _frozen_body(self, url):
+        """Cached body of url if the http cache's frozen policy says it is
+        final. Returns: bytes, or None to send a request."""
+        if self._http_cache is None or not self._http_cache.is_frozen(url):
+            return None
+        content = self._http_cache.body(url)
+        if content is not None:
+            profiler.count('scraper.frozen')
+        return content
+
+
+    def _is_frozen(self, url, path):
+        """Whether a page already on disk at path is final and is not
+        written again even when overwriting. Returns: bool"""
+        return (self._http_cache is not None and find_page(path) is not None
+                and self._http_cache.is_frozen(url))
+
+
     def make_soup(self, url):
         """Make a BeautifulSoup object out of html from a given url.
         
@@ -89,22 +244,17 @@ class Scraper:
         
         Returns: BeautifulSoup object with encoded bytestring.
         """
-        assert isinstance(url, str), TypeError('`url` must be a string')
-        try:
-            r = self._session.get(url)
-        except requests.exceptions.ConnectionError as e:
-            print('Your internet may be disconnected.', end='\r')
-            raise e
-        soup = BeautifulSoup(r.content, 'html.parser')
-        sleep(self._crawl_delay)
-        
-        return soup
+        content = self.fetch(url)
+        with profiler.timer('scraper.parse', url):
+            return BeautifulSoup(content, 'html.parser')
     
     
     def write_html(self, url, path, *, overwrite=False):
         """Write html source code from url to user-defined path as encoded byte string.
         Creates directories as necessary. Will not overwrite a file unless told to do so.
         Writes a commented hexadecimal ID line to top of html for identifying purposes.
+        With compress=True the raw response is written to path + '.gz' instead.
+        Pages the http cache's frozen policy says are final are never overwritten.
 
         Arguments:
             url (str) -- Full url to site.
@@ -117,7 +267,7 @@ class Scraper:
             TypeError -- url or path parameters not a string. No exceptions.
             LookupError -- User specified unknown encoding.
 
-        Returns: None
+        Returns: Raw response bytes, or None if the page was already cached.
         """
         assert isinstance(url, str), TypeError('`url` must be a string')
         assert isinstance(path, str), TypeError('`path` must be a string')
@@ -125,19 +275,61 @@ class Scraper:
         assert isinstance(overwrite, bool), TypeError('`headers` must be a bool')
         
         parent, child = os.path.split(path)
-        if os.path.exists(path) and not overwrite:
+        if find_page(path) and (not overwrite or self._is_frozen(url, path)):
             print('\t{} already exists. File was not overwritten.'\
                     .format(path), end='\r')
             return None
-        elif not os.path.exists(parent):
+        elif parent and not os.path.exists(parent):
             os.makedirs(parent)
         
-        soup = self.make_soup(url)
+        content = self.fetch(url)
+        self._save_content(content, url, path)
         
+        return content
+
+
+    def _save_content(self, content, url, path):
+        """Write a raw response to path in the scraper's cache format.
+
+        Arguments:
+            content (bytes) -- Raw response body.
+            url (str) -- Url the body was fetched from.
+            path (str) -- Full path to txt file. Parent directory must exist.
+
+        Returns: None
+        """
+        if self._compress:
+            print('\tsaving', path + GZIP_SUFFIX, end='         \r')
+            with profiler.timer('scraper.save', path):
+                write_page(path + GZIP_SUFFIX, content, url, hex(randrange(16**30)))
+            stale = path
+        else:
+            with profiler.timer('scraper.parse', url):
+                soup = BeautifulSoup(content, 'html.parser')
+            self._save_soup(soup, path)
+            stale = path + GZIP_SUFFIX
+
+        # Keep a single copy of each page when overwriting across formats.
+        if os.path.exists(stale):
+            os.remove(stale)
+
+        return None
+
+
+    def _save_soup(self, soup, path):
+        """Write soup to path as an encoded byte string headed by a hex ID line.
+
+        Arguments:
+            soup (BeautifulSoup) -- Parsed html to be written.
+            path (str) -- Full path to txt file. Parent directory must exist.
+
+        Returns: None
+        """
         # This may throw errors if you can't encode certain characters. 
         # If this happens, ignore bad encodings in the `encode` function or
         # remove the bad characters from the bytestring.
-        encoded_html = soup.prettify().encode(self._encoding)
+        with profiler.timer('scraper.prettify', path):
+            encoded_html = soup.prettify().encode(self._encoding)
 
         # We may want to uniquely identify the subjects of these htmls later.
         ID = hex(randrange(16**30))
@@ -145,7 +337,9 @@ class Scraper:
         # This line makes it easier to read what's happening when you 
         # run the program from the command line.
         print('\tsaving', path, end='         \r')
-        with open(path, 'wb') as html_txt:
+        # Written under a temporary name first, so a crash never leaves a
+        # partial page that later runs take for a cached one.
+        with replace_file(path) as html_txt:
             ID_line = '''<!--ID: {}-->\n'''.format(ID).encode(self._encoding)
             html_txt.write(ID_line)
             html_txt.write(encoded_html)
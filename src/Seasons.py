@@ -0,0 +1,136 @@
+"""
+This script can be run from the command line to move an html cache from the
+old flat layout into season partitions:
+
+    python Seasons.py --html-dir ./../html/
+
+A season is named by the year it ends in, so games from November 2016
+through April 2017 belong to season 2017. Each season keeps its own
+directories, and loaders only read the seasons they are asked for:
+
+    html/2017/gamesheets/2017-2-5.txt      -- scraped html
+    html/2017/boxscores/2017-02-04-duke.txt
+    data-raw/2017/gamesheets.txt            -- mined data
+    data-raw/2017/boxscores.txt
+    data/2017/Games.csv                     -- GameIDs of the season
+
+Teams.csv is shared by every season, so a team keeps its TeamID for good.
+"""
+
+import argparse
+import os
+import re
+
+from CrawlManifest import CrawlManifest
+from HtmlCache import is_page
+
+# Season being modeled when none is given.
+CURRENT_SEASON = 2017
+
+# Games from this month on belong to the next season.
+SEASON_START_MONTH = 7
+
+
+def season_of(date):
+    """Season of a date, named by the year it ends in.
+
+    Example:
+        > season_of(datetime.date(2016, 11, 11))
+        2017
+    """
+    return date.year + (date.month >= SEASON_START_MONTH)
+
+
+def seasons_of(dates):
+    """Season of every date in a pd.Series of datetimes. Returns: pd.Series of int"""
+    return dates.dt.year + (dates.dt.month >= SEASON_START_MONTH)
+
+
+def html_season_dir(season, html_dir='./../html/'):
+    """Directory of the scraped html of a season.
+
+    Example:
+        > html_season_dir(2017)
+        "./../html/2017"
+    """
+    return os.path.join(html_dir, str(season))
+
+
+def mined_path(kind, season, data_dir='./../data-raw/'):
+    """Path of the mined data of a season.
+
+    Arguments:
+        kind (str) -- 'gamesheets' or 'boxscores'.
+        season (int) -- Season, by the year it ends in.
+        data_dir (str) -- Directory holding mined data. (default './../data-raw/')
+
+    Example:
+        > mined_path('boxscores', 2017)
+        "./../data-raw/2017/boxscores.txt"
+    """
+    return os.path.join(data_dir, str(season), kind + '.txt')
+
+
+def id_path(filename, season, data_dir='./../data/'):
+    """Path of an ID table of a season.
+
+    Example:
+        > id_path('Games.csv', 2017)
+        "./../data/2017/Games.csv"
+    """
+    return os.path.join(data_dir, str(season), filename)
+
+
+def list_seasons(directory):
+    """Seasons partitioned under directory, in order. Returns: List of int"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(d) for d in os.listdir(directory)
+                  if d.isdigit() and os.path.isdir(os.path.join(directory, d)))
+
+
+# Cached pages are named after their date, e.g. 2017-2-5 or 2017-02-04-duke.
+_DATED_NAME = re.compile(r'^(\d{4})-(\d{1,2})-\d{1,2}')
+
+def partition_html(html_dir='./../html/'):
+    """Move pages of the flat html/gamesheets and html/boxscores layout into
+    season partitions and point the crawl manifest at their new paths, so
+    nothing is fetched again.
+
+    Returns: int number of pages moved.
+    """
+    moved = {}
+    for kind in ('gamesheets', 'boxscores'):
+        directory = os.path.join(html_dir, kind)
+        if not os.path.isdir(directory):
+            continue
+        for f in sorted(os.listdir(directory)):
+            match = _DATED_NAME.match(f)
+            if not is_page(f) or not match:
+                continue
+            season = int(match.group(1)) + (int(match.group(2)) >= SEASON_START_MONTH)
+            new_dir = os.path.join(html_season_dir(season, html_dir), kind)
+            os.makedirs(new_dir, exist_ok=True)
+            os.replace(os.path.join(directory, f), os.path.join(new_dir, f))
+            moved[os.path.join(directory, f)] = os.path.join(new_dir, f)
+
+    manifest_path = os.path.join(html_dir, 'manifest.tsv')
+    if moved and os.path.exists(manifest_path):
+        # Manifest paths name the .txt file, whichever format is on disk.
+        moved_txt = {os.path.normpath(old.rsplit('.txt', 1)[0] + '.txt'): new.rsplit('.txt', 1)[0] + '.txt'
+                     for old, new in moved.items()}
+        manifest = CrawlManifest(manifest_path)
+        for entry in manifest.entries.values():
+            entry['Path'] = moved_txt.get(os.path.normpath(entry['Path']), entry['Path'])
+        manifest.compact()
+        manifest.close()
+
+    return len(moved)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move a flat html cache into season partitions.')
+    parser.add_argument('--html-dir', default='./../html/')
+    args = parser.parse_args()
+
+    print(partition_html(args.html_dir), 'pages moved.')
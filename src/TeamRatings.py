@@ -0,0 +1,260 @@
+"""
+Team ratings updated day by day over the gamesheets.
+
+EloRatings is a streaming Elo rating. MarginRatings fits rating differences
+to score differences by least squares, solved again after every day with a
+sparse conjugate gradient solver started from the previous day's ratings.
+Both report each team's rating before every game it played, for use as
+model features, and turn final ratings into win probabilities for a Bracket.
+
+A gap of more than offseason_days between game days starts a new season.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import cg
+from scipy.stats import norm
+
+
+class Ratings:
+    """Base class for team ratings.
+
+    Attributes:
+        NAME (str) -- Name of the rating column. Set by subclasses.
+        ratings (pd.Series) -- Rating of each team after the last game, by TeamName.
+
+    Methods:
+        fit (pd.DataFrame) -- Rate teams game by game. Implemented by subclasses.
+        win_probability (float) -- Probability that one team beats another.
+        win_matrix (np.ndarray) -- Pairwise win probabilities of teams.
+    """
+
+    NAME = None
+
+    def __init__(self, *, offseason_days=90):
+        assert offseason_days > 0, TypeError('offseason_days parameter must be positive')
+        self.offseason_days = offseason_days
+        self.ratings = pd.Series(dtype=float)
+
+
+    def fit(self, Gamesheets):
+        """Rate teams over Gamesheets. Implemented by subclasses."""
+        raise NotImplementedError
+
+
+    def _probability(self, diff):
+        """Win probability for a rating difference. Implemented by subclasses."""
+        raise NotImplementedError
+
+
+    def win_probability(self, TeamName1, TeamName2):
+        """Probability that TeamName1 beats TeamName2 with current ratings.
+
+        Returns: float
+        """
+        return float(self._probability(self.ratings[TeamName1] - self.ratings[TeamName2]))
+
+
+    def win_matrix(self, teams):
+        """Matrix P with P[i, j] the probability that teams[i] beats teams[j],
+        e.g. for a BracketSimulator with teams=bracket.teams. Unrated teams
+        get the mean rating.
+
+        Returns: np.ndarray of float
+        """
+        r = self.ratings.reindex(teams).fillna(self.ratings.mean() if len(self.ratings) else 0.0).to_numpy()
+        P = self._probability(r[:, None] - r[None, :])
+        np.fill_diagonal(P, 0.5)
+        return P
+
+
+    def _days(self, Gamesheets):
+        """Split games into days.
+
+        Returns: Tuple of team names, winner codes, loser codes, margins,
+            dates and a list of (row slice, new season) per day.
+        """
+        Gamesheets = Gamesheets.sort_values('Date', kind='mergesort')
+        codes, teams = pd.factorize(pd.concat([Gamesheets['WinningTeam'], Gamesheets['LosingTeam']]).astype(str))
+        winners, losers = codes[:len(Gamesheets)], codes[len(Gamesheets):]
+        margins = (Gamesheets['WinningScore'] - Gamesheets['LosingScore']).to_numpy(dtype=float)
+        dates = Gamesheets['Date'].to_numpy(dtype='datetime64[ns]')
+
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        gaps = np.diff(dates[starts]) > np.timedelta64(self.offseason_days, 'D')
+        days = [(slice(start, end), bool(new_season))
+                for start, end, new_season in zip(starts, np.r_[starts[1:], len(dates)], np.r_[False, gaps])]
+        return np.asarray(teams), winners, losers, margins, dates, days
+
+
+    def _frame(self, teams, winners, losers, dates, before):
+        """Pre-game ratings of both teams of every game, as returned by fit."""
+        Ratings = pd.DataFrame({'Date': np.r_[dates, dates],
+                                'TeamName': teams[np.r_[winners, losers]],
+                                self.NAME: before})
+        return Ratings.sort_values(['Date', 'TeamName'], kind='mergesort').reset_index(drop=True)
+
+
+class EloRatings(Ratings):
+    """Elo ratings updated after every day of games.
+
+    Teams play at most once a day, so a day's games are updated together
+    from the ratings at the start of the day.
+
+    Methods:
+        __init__ (None) -- Choose the Elo parameters.
+        fit (pd.DataFrame) -- Pre-game Elo of every team and game.
+    """
+
+    NAME = 'Elo'
+
+    def __init__(self, *, k=20, initial=1500, scale=400, margin=True, revert=0.25,
+                 offseason_days=90):
+        """Initialize EloRatings.
+
+        Keyword arguments:
+            k (int, float) -- Largest rating change of an even game. (default 20)
+            initial (int, float) -- Rating of new teams. (default 1500)
+            scale (int, float) -- Rating difference giving 10:1 odds. (default 400)
+            margin (bool) -- Scale updates by the margin of victory. (default True)
+            revert (float) -- Share of each rating reverted to the mean between seasons. (default 0.25)
+            offseason_days (int) -- Days without games that start a new season. (default 90)
+
+        Returns: None
+        """
+        Ratings.__init__(self, offseason_days=offseason_days)
+        assert 0 <= revert <= 1, TypeError('revert parameter must be between 0 and 1')
+        self.k = k
+        self.initial = initial
+        self.scale = scale
+        self.margin = margin
+        self.revert = revert
+        return None
+
+
+    def _probability(self, diff):
+        return 1 / (1 + 10 ** (-np.asarray(diff) / self.scale))
+
+
+    def fit(self, Gamesheets):
+        """Rate teams over every game in Gamesheets, in date order.
+
+        Arguments:
+            Gamesheets (pd.DataFrame) -- Date, WinningTeam, WinningScore,
+                LosingTeam and LosingScore of each game, e.g. get_gamesheets().
+
+        Returns: pd.DataFrame with Date, TeamName and the Elo of the team
+            before the game.
+        """
+        teams, winners, losers, margins, dates, days = self._days(Gamesheets)
+        r = np.full(len(teams), float(self.initial))
+        before = np.empty(2 * len(winners))
+        for rows, new_season in days:
+            if new_season:
+                r += self.revert * (r.mean() - r)
+            w, l = winners[rows], losers[rows]
+            diff = r[w] - r[l]
+            before[rows] = r[w]
+            before[len(winners):][rows] = r[l]
+
+            delta = self.k * (1 - self._probability(diff))
+            if self.margin:
+                # Larger wins count more, less so for heavy favorites.
+                delta *= np.log1p(margins[rows]) * 2.2 / (diff * 0.001 + 2.2)
+            np.add.at(r, w, delta)
+            np.add.at(r, l, -delta)
+
+        self.ratings = pd.Series(r, index=teams)
+        return self._frame(teams, winners, losers, dates, before)
+
+
+class MarginRatings(Ratings):
+    """Least-squares margin ratings, solved again after every day.
+
+    Ratings r minimize the sum of (r[winner] - r[loser] - margin)^2 over the
+    season so far plus ridge * |r|^2. The normal equations are a sparse
+    graph Laplacian that grows by one day of games at a time.
+
+    Attributes:
+        sigma (float) -- Standard deviation of margins around the rating difference.
+
+    Methods:
+        __init__ (None) -- Choose the ridge penalty.
+        fit (pd.DataFrame) -- Pre-game margin rating of every team and game.
+    """
+
+    NAME = 'MarginRating'
+
+    def __init__(self, *, ridge=1.0, offseason_days=90):
+        """Initialize MarginRatings.
+
+        Keyword arguments:
+            ridge (float) -- Penalty pulling ratings of teams with few games to 0. (default 1.0)
+            offseason_days (int) -- Days without games that start a new season. (default 90)
+
+        Returns: None
+        """
+        Ratings.__init__(self, offseason_days=offseason_days)
+        assert ridge > 0, TypeError('ridge parameter must be positive')
+        self.ridge = ridge
+        # Typical spread of college basketball margins until fit
+        self.sigma = 11.0
+        return None
+
+
+    def _probability(self, diff):
+        return norm.cdf(np.asarray(diff) / self.sigma)
+
+
+    def fit(self, Gamesheets):
+        """Rate teams over every game in Gamesheets, in date order.
+
+        Arguments:
+            Gamesheets (pd.DataFrame) -- Date, WinningTeam, WinningScore,
+                LosingTeam and LosingScore of each game, e.g. get_gamesheets().
+
+        Errors:
+            ValueError -- The solver was given a bad system. A day whose solve
+                does not converge only warns, since later days start from it.
+
+        Returns: pd.DataFrame with Date, TeamName and the margin rating of
+            the team before the game.
+        """
+        teams, winners, losers, margins, dates, days = self._days(Gamesheets)
+        n = len(teams)
+        ridge = self.ridge * sparse.identity(n, format='csr')
+        r = np.zeros(n)
+        before = np.empty(2 * len(winners))
+        season_start = 0
+        for rows, new_season in days:
+            if new_season or rows.start == 0:
+                laplacian, b, r = sparse.csr_matrix((n, n)), np.zeros(n), np.zeros(n)
+                season_start = rows.start
+            w, l = winners[rows], losers[rows]
+            before[rows] = r[w]
+            before[len(winners):][rows] = r[l]
+
+            # Each game adds (e_w - e_l)(e_w - e_l)^T to the normal equations.
+            laplacian = laplacian + sparse.csr_matrix(
+                (np.r_[np.ones(2 * len(w)), -np.ones(2 * len(w))],
+                 (np.r_[w, l, w, l], np.r_[w, l, l, w])), shape=(n, n))
+            np.add.at(b, w, margins[rows])
+            np.add.at(b, l, -margins[rows])
+            r, info = cg(laplacian + ridge, b, x0=r)
+            if info:
+                day = np.datetime_as_string(dates[rows.start], unit='D')
+                if info < 0:
+                    raise ValueError('margin ratings solver failed on {} (info {})'.format(day, info))
+                warnings.warn('margin ratings did not converge on {} after {} iterations'.format(day, info),
+                              RuntimeWarning)
+
+        # Spread of the last season's margins around its final ratings
+        season = slice(season_start, len(winners))
+        residuals = margins[season] - (r[winners[season]] - r[losers[season]])
+        if len(residuals) > 1:
+            self.sigma = float(np.sqrt(np.mean(residuals ** 2)))
+        self.ratings = pd.Series(r, index=teams)
+        return self._frame(teams, winners, losers, dates, before)
@@ -0,0 +1,400 @@
+"""
+This script can be run from the command line to time how model data is
+built. Each benchmark times the row-wise `apply` that used to build a column
+against its vectorized replacement on a full season of games:
+
+    python benchmark.py --gamesheets ./../data-raw/!gamesheets-2017.txt
+
+With --stages it times every stage of the pipeline instead, from scraping
+the local stand-in server to scoring matchups, on the bundled html/sample-*
+and data-raw/sample-*.txt fixtures and on copies scaled up by --scale:
+
+    python benchmark.py --stages --scale 1 10 --label my-change --compare
+
+Each stage reports files/sec, rows/sec and peak memory. Results are appended
+to --ofile, so a run can be compared with the one before it.
+"""
+
+import argparse
+import asyncio
+import contextlib
+from datetime import datetime
+from itertools import combinations
+import io
+import os
+import re
+import shutil
+import tempfile
+import timeit
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from AsyncScraper import AsyncScraper
+from BoxscoreMiner import BoxscoreMiner
+from FeatureEngine import FeatureEngine
+from GamesheetMiner import GamesheetMiner
+from HtmlCache import is_page
+from LocalServer import LocalServer
+from MatchupIndex import MatchupIndex
+from Miner import Miner
+from PutIDFiles import make_matchups
+from Profiler import profiler
+from PutModelData import ModelData, read_mined
+from RetryPolicy import RetryPolicy
+
+# Full season of gamesheets that ships with the repo
+SEASON_GAMESHEETS_CSV = './../data-raw/!gamesheets-2017.txt'
+
+# Columns of the stage results file
+RESULT_COLNAMES = ('Run', 'Label', 'Stage', 'Scale', 'Files', 'Rows', 'Seconds',
+                   'FilesPerSec', 'RowsPerSec', 'PeakMB')
+
+# ModelData frames timed by the stage benchmarks, in build order
+MODEL_DATA_FRAMES = ('gamesheets', 'game_results', 'season_matchups', 'boxscores',
+                     'season_game_stats', 'season_cum_stats', 'season_stats', 'ratings')
+
+
+def best_time(func, repeat=5):
+    """Fastest of repeat calls to func in seconds."""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def bench_score_diff(Gamesheets):
+    Losers = pd.DataFrame({'ScoreDiff': Gamesheets['WinningScore'] - Gamesheets['LosingScore']})
+    return (len(Losers),
+            lambda: Losers.apply(lambda x: -x['ScoreDiff'], axis=1),
+            lambda: -Losers['ScoreDiff'])
+
+
+def bench_num_ot(Gamesheets):
+    # Two team-game rows per game with 0-3 overtimes of minutes played.
+    rng = np.random.default_rng(0)
+    overtimes = rng.choice(4, size=2 * len(Gamesheets), p=(0.93, 0.05, 0.015, 0.005))
+    SeasonGameStats = pd.DataFrame({'MP': 200 + 25 * overtimes})
+    return (len(SeasonGameStats),
+            lambda: SeasonGameStats.apply(lambda x: (x['MP'] - 200) // 25, axis=1),
+            lambda: (SeasonGameStats['MP'] - 200) // 25)
+
+
+def bench_matchup_ids(Teams):
+    def before():
+        Matchups = pd.DataFrame((c for c in combinations(Teams['TeamName'], 2)),
+                                columns=['Team1', 'Team2'])
+        Matchups = pd.merge(Matchups, Teams, left_on='Team1', right_on='TeamName').rename(columns={'TeamID': 'TeamID1'})
+        del Matchups['TeamName']
+        Matchups = pd.merge(Matchups, Teams, left_on='Team2', right_on='TeamName').rename(columns={'TeamID': 'TeamID2'})
+        del Matchups['TeamName']
+        Matchups['MatchupID'] = Matchups.apply(lambda x: '_'.join([str(x['TeamID1']), str(x['TeamID2'])]), axis=1)
+        return Matchups
+
+    return (len(Teams) * (len(Teams) - 1) // 2, before, lambda: make_matchups(Teams))
+
+
+def run_benchmarks(gamesheets_csv, teams_csv, *, repeat=5):
+    """Time every benchmark before and after vectorizing.
+
+    Returns: pd.DataFrame with one row per benchmark.
+    """
+    Gamesheets = read_mined(gamesheets_csv, GamesheetMiner.DTYPES)
+    Teams = pd.read_csv(teams_csv, index_col=False)
+    benchmarks = {'ScoreDiff': bench_score_diff(Gamesheets),
+                  'NumOT': bench_num_ot(Gamesheets),
+                  'MatchupID': bench_matchup_ids(Teams)}
+
+    results = []
+    for name, (rows, before, after) in benchmarks.items():
+        before_sec, after_sec = best_time(before, repeat), best_time(after, repeat)
+        results.append({'Benchmark': name, 'Rows': rows, 'Before': before_sec,
+                        'After': after_sec, 'Speedup': before_sec / after_sec})
+    return pd.DataFrame(results)
+
+
+# Cached pages are named after their date, e.g. 2017-2-5 or 2017-02-04-duke.
+_DATED_NAME = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})')
+
+def _shift_name(name, days):
+    """File name with its leading date moved by days, in the same format."""
+    match = _DATED_NAME.match(name)
+    date = datetime(*map(int, match.groups())) + pd.Timedelta(days=days)
+    if len(match.group(0)) == 10:
+        shifted = date.strftime('%Y-%m-%d')
+    else:
+        shifted = '{}-{}-{}'.format(date.year, date.month, date.day)
+    return shifted + name[match.end():]
+
+
+def _date_span(dates):
+    """Days from the first to the last of dates, inclusive."""
+    dates = pd.to_datetime(pd.Series(dates))
+    return (dates.max() - dates.min()).days + 1
+
+
+def scale_html(directory, ofile_dir, scale):
+    """Copy every page in directory scale times into ofile_dir. Copy k moves
+    the date in each file name by k times the days the pages span, so every
+    copy is a distinct day of pages.
+
+    Arguments:
+        directory (str) -- Directory of dated pages, e.g. html/sample-boxscores.
+        ofile_dir (str) -- Directory to copy to.
+        scale (int) -- Number of copies.
+
+    Returns: List of copied paths.
+    """
+    assert isinstance(scale, int) and scale > 0, TypeError('scale parameter must be a positive int')
+    names = sorted(f for f in os.listdir(directory) if is_page(f) and _DATED_NAME.match(f))
+    span = _date_span(['-'.join(_DATED_NAME.match(f).groups()) for f in names])
+    os.makedirs(ofile_dir, exist_ok=True)
+    paths = []
+    for k in range(scale):
+        for f in names:
+            path = os.path.join(ofile_dir, _shift_name(f, k * span))
+            shutil.copyfile(os.path.join(directory, f), path)
+            paths.append(path)
+    return paths
+
+
+def scale_mined(csvs, ofile_dir, scale):
+    """Copy mined data files scale times over into ofile_dir, moving the
+    dates of copy k by k times the days all files span together, so games
+    stay unique and files still match each other.
+
+    Arguments:
+        csvs (List (str)) -- Paths to exported tsv data, e.g. sample gamesheets and boxscores.
+        ofile_dir (str) -- Directory to write the scaled files to.
+        scale (int) -- Number of copies.
+
+    Returns: List of scaled paths, one per file in csvs.
+    """
+    assert isinstance(scale, int) and scale > 0, TypeError('scale parameter must be a positive int')
+    data = [pd.read_csv(csv, sep='\t', index_col=False, dtype=str, keep_default_na=False) for csv in csvs]
+    span = _date_span(pd.concat([d['Date'] for d in data]))
+    os.makedirs(ofile_dir, exist_ok=True)
+    paths = []
+    for csv, d in zip(csvs, data):
+        dates = pd.to_datetime(d['Date'])
+        scaled = pd.concat([d.assign(Date=(dates + pd.Timedelta(days=k * span)).dt.strftime('%Y-%m-%d'))
+                            for k in range(scale)], ignore_index=True)
+        path = os.path.join(ofile_dir, os.path.basename(csv))
+        scaled.to_csv(path, sep='\t', index=False)
+        paths.append(path)
+    return paths
+
+
+def stage_scrape(html_dir, ofile_dir, names, stack, failure_rate=0):
+    """Fetch and write boxscore pages from a LocalServer serving html_dir,
+    with no crawl delay. With a failure rate, that share of requests fail
+    and are retried with short backoffs. Returns: (files, rows, run)"""
+    server = stack.enter_context(LocalServer(html_dir, failure_rate=failure_rate, seed=0))
+    jobs = [(server.url + 'cbb/boxscores/{}.html'.format(name), os.path.join(ofile_dir, name + '.txt'))
+            for name in names]
+
+    def run():
+        # A scraper's semaphore belongs to one event loop, so each run gets its own.
+        scraper = AsyncScraper(crawl_delay=0, retry=RetryPolicy(10, base=0.01, cap=0.1))
+        try:
+            asyncio.run(scraper.crawl(jobs, overwrite=True))
+        finally:
+            scraper.close()
+
+    return len(jobs), 0, run
+
+
+def stage_make_soup(paths):
+    """Parse pages with Miner.make_soup. Returns: (files, rows, run)"""
+    miner = Miner(None)
+    return len(paths), 0, lambda: [miner.make_soup(path) for path in paths]
+
+
+def stage_mine(mine, paths):
+    """Mine pages one by one with a Miner method. Returns: (files, rows, run)"""
+    rows = sum(len(mine(path)) for path in paths)
+    return len(paths), rows, lambda: [mine(path) for path in paths]
+
+
+def stage_read_mined(csv, dtypes):
+    """Read exported tsv data. Returns: (files, rows, run)"""
+    return 1, len(read_mined(csv, dtypes)), lambda: read_mined(csv, dtypes)
+
+
+def stage_model_data(data, name):
+    """Build one ModelData frame from frames already built.
+    Returns: (files, rows, run)"""
+    build = getattr(data, '_build_' + name)
+    return 0, len(getattr(data, name)()), build
+
+
+def stage_features(data, variables):
+    """Team features of every game with FeatureEngine. Returns: (files, rows, run)"""
+    engine = FeatureEngine(variables, windows=(3,), halflifes=(5,))
+    GameStats = data.season_game_stats()
+    return 0, len(GameStats), lambda: engine.fit_transform(GameStats)
+
+
+def stage_score_matchups(data, teams_csv, X_vars):
+    """Score every pair of teams with a fixed logit through MatchupIndex.
+    Returns: (files, rows, run)"""
+    index = MatchupIndex(pd.read_csv(teams_csv, index_col=False), cache=False)
+    TeamStats = data.season_stats().reset_index()
+    TeamStats['TeamName'] = TeamStats['TeamName'].astype(str)
+    coef = np.linspace(-0.5, 0.5, len(X_vars) + 1)
+    predict = lambda exog: 1 / (1 + np.exp(-(exog.to_numpy(dtype=float) @ coef)))
+    pair_ids = np.arange(len(index))
+    return 0, len(pair_ids), lambda: index.score(pair_ids, predict, TeamStats, X_vars)
+
+
+def measure(run, repeat=3):
+    """Best time of repeat calls to run, then peak traced memory of one more
+    call. Tracing slows Python code down, so it is kept out of the timing.
+    Output of run is dropped.
+
+    Returns: Tuple of seconds and peak MB.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = best_time(run, repeat)
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak / 1e6
+
+
+def run_stages(scales=(1,), *, html_dir='./../html/', data_dir='./../data-raw/',
+               teams_csv='./../data/Teams.csv', repeat=3, label='', cprofile=()):
+    """Time every pipeline stage on the sample fixtures scaled by each of scales.
+
+    Arguments:
+        scales (iterable (int)) -- Number of copies of the fixtures. (default (1,))
+
+    Keyword arguments:
+        html_dir (str) -- Directory holding sample-gamesheets and sample-boxscores.
+        data_dir (str) -- Directory holding sample-gamesheets.txt and sample-boxscores.txt.
+        teams_csv (str) -- Teams.csv used to score matchups.
+        repeat (int) -- Timed calls per stage, the fastest is kept. (default 3)
+        label (str) -- Name of the run, e.g. a commit. (default '')
+        cprofile (iterable (str)) -- Stages to run once more under cProfile,
+            writing <stage>-<scale>.prof. (default ())
+
+    Returns: pd.DataFrame with RESULT_COLNAMES, one row per stage and scale.
+    """
+    run_id = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.ExitStack() as stack:
+            boxscores = scale_html(os.path.join(html_dir, 'sample-boxscores'), os.path.join(tmp, 'boxscores'), scale)
+            gamesheets = scale_html(os.path.join(html_dir, 'sample-gamesheets'), os.path.join(tmp, 'gamesheets'), scale)
+            boxscores_csv, gamesheets_csv = scale_mined([os.path.join(data_dir, 'sample-boxscores.txt'),
+                                                         os.path.join(data_dir, 'sample-gamesheets.txt')],
+                                                        os.path.join(tmp, 'data-raw'), scale)
+            data = ModelData(boxscores_csv, gamesheets_csv)
+
+            stages = {'scrape': lambda: stage_scrape(html_dir, os.path.join(tmp, 'scraped'),
+                                                     [os.path.basename(p)[:-len('.txt')] for p in boxscores], stack),
+                      'scrape_flaky': lambda: stage_scrape(html_dir, os.path.join(tmp, 'scraped-flaky'),
+                                                           [os.path.basename(p)[:-len('.txt')] for p in boxscores], stack,
+                                                           failure_rate=0.2),
+                      'make_soup': lambda: stage_make_soup(boxscores + gamesheets),
+                      'mine_boxscore': lambda: stage_mine(BoxscoreMiner(None).mine_boxscore, boxscores),
+                      'mine_boxscore_fast': lambda: stage_mine(BoxscoreMiner(None).mine_boxscore_fast, boxscores),
+                      'mine_gamesheet': lambda: stage_mine(GamesheetMiner(None).mine_gamesheet, gamesheets),
+                      'read_boxscores': lambda: stage_read_mined(boxscores_csv, BoxscoreMiner.DTYPES),
+                      'read_gamesheets': lambda: stage_read_mined(gamesheets_csv, GamesheetMiner.DTYPES)}
+            for name in MODEL_DATA_FRAMES:
+                stages['build_' + name] = lambda name=name: stage_model_data(data, name)
+            stages['features'] = lambda: stage_features(data, ['FG', 'FGA', 'PTS'])
+            stages['score_matchups'] = lambda: stage_score_matchups(data, teams_csv, ['FG', 'OppFG', 'PTS', 'OppPTS'])
+
+            for stage, setup in stages.items():
+                files, rows, run = setup()
+                seconds, peak = measure(run, repeat)
+                if stage in cprofile:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        profiler.profile(run, ofile='{}-{}.prof'.format(stage, scale))
+                results.append({'Run': run_id, 'Label': label, 'Stage': stage, 'Scale': scale,
+                                'Files': files, 'Rows': rows, 'Seconds': seconds,
+                                'FilesPerSec': files / seconds if files else np.nan,
+                                'RowsPerSec': rows / seconds if rows else np.nan, 'PeakMB': peak})
+    return pd.DataFrame(results, columns=RESULT_COLNAMES)
+
+
+def save_results(Results, ofile):
+    """Append stage results to a csv file, creating it if needed.
+
+    Returns: pd.DataFrame of every saved run.
+    """
+    if os.path.exists(ofile):
+        Results = pd.concat([pd.read_csv(ofile, index_col=False, keep_default_na=False,
+                                         na_values=['']), Results], ignore_index=True)
+    os.makedirs(os.path.dirname(ofile) or '.', exist_ok=True)
+    Results.to_csv(ofile, index=False)
+    return Results
+
+
+def compare_runs(Results, run=None, baseline=None):
+    """Compare the stages of two saved runs. Change is the ratio of seconds,
+    so values above 1 are slowdowns.
+
+    Arguments:
+        Results (pd.DataFrame) -- Saved runs, e.g. from save_results.
+        run (str) -- Run to compare. (default the last run)
+        baseline (str) -- Run to compare with. (default the run before run)
+
+    Returns: pd.DataFrame with one row per stage and scale of both runs.
+    """
+    runs = list(pd.unique(Results['Run']))
+    run = run or runs[-1]
+    if baseline is None:
+        earlier = runs[:runs.index(run)]
+        if not earlier:
+            raise ValueError('no run before {} to compare with'.format(run))
+        baseline = earlier[-1]
+    keys = ['Stage', 'Scale']
+    Compared = pd.merge(Results.loc[Results['Run'] == baseline, keys + ['Seconds']],
+                        Results.loc[Results['Run'] == run, keys + ['Seconds', 'PeakMB']],
+                        on=keys, suffixes=('Before', 'After'))
+    Compared['Change'] = Compared['SecondsAfter'] / Compared['SecondsBefore']
+    return Compared
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time row-wise apply against vectorized model data construction, '
+                                                 'or every pipeline stage with --stages.')
+    parser.add_argument('--gamesheets', default=SEASON_GAMESHEETS_CSV)
+    parser.add_argument('--teams', default='./../data/Teams.csv')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--stages', action='store_true',
+                        help='time every pipeline stage on the sample fixtures')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1],
+                        help='copies of the fixtures to time stages on (default 1)')
+    parser.add_argument('--html-dir', default='./../html/')
+    parser.add_argument('--data-dir', default='./../data-raw/')
+    parser.add_argument('--label', default='',
+                        help='name saved with the stage results, e.g. a commit')
+    parser.add_argument('--ofile', default='./../benchmarks/stages.csv',
+                        help='csv file stage results are appended to')
+    parser.add_argument('--cprofile', nargs='+', default=[], metavar='STAGE',
+                        help='stages to also run under cProfile')
+    parser.add_argument('--compare', action='store_true',
+                        help='compare the stages with the previous saved run')
+    args = parser.parse_args()
+    # Miners end every row with a separator, which pandas warns about on each read.
+    warnings.simplefilter('ignore', pd.errors.ParserWarning)
+
+    if not args.stages:
+        for path in (args.gamesheets, args.teams):
+            if not os.path.exists(path):
+                parser.error('{} not found. Pass --gamesheets and --teams, or mine them first.'.format(path))
+        print(run_benchmarks(args.gamesheets, args.teams, repeat=args.repeat).to_string(index=False))
+    else:
+        Results = run_stages(args.scale, html_dir=args.html_dir, data_dir=args.data_dir,
+                             teams_csv=args.teams, repeat=args.repeat, label=args.label,
+                             cprofile=args.cprofile)
+        print(Results.drop(columns=['Run', 'Label']).to_string(index=False))
+        Saved = save_results(Results, args.ofile)
+        if args.compare:
+            print(compare_runs(Saved).to_string(index=False))
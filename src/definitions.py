@@ -1,11 +1,13 @@
 """Root url used by internal links and references on sports-reference.com"""
 ROOT_URL = "http://www.sports-reference.com/"
 
+"""GameID of the game the winner of each tournament game plays next.
+GameIDs are 20000 + 1000 * round + game, starting with the First Four."""
 ADVANCEMENT_KEY = {
-    20000: 21000,
+    20000: 21028,
     20001: 21000,
-    20002: 21001,
-    20003: 21001,
+    20002: 21016,
+    20003: 21004,
     21000: 22000,
     21001: 22000,
     21002: 22001,
@@ -135,3 +137,5 @@ ADVANCEMENT_KEY = {
     27000: 28000
 }
 
+"""Round reached by the winner of a round 0 (First Four), 1, 2, ... game."""
+ROUNDS = ('R64', 'R32', 'S16', 'E8', 'F4', 'Final', 'Champion')
@@ -6,24 +6,48 @@
 
 # Gamesheet scraper for college basketball data on sports-reference.com
 
+import argparse
+import asyncio
 from copy import deepcopy  
 import datetime
 import os.path as ospath
-import requests
+from urllib.parse import parse_qs, urlsplit
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import requests
 
+from AsyncScraper import AsyncScraper
+from CrawlManifest import CrawlManifest
 from definitions import ROOT_URL
+from Exceptions import InvalidPageError
+from HtmlCache import find_page, read_page
+from HttpCache import FrozenDates, HttpCache
+from RateLimiter import HostRateLimiter
+from RetryPolicy import RetryPolicy
+from Seasons import html_season_dir, season_of
 from Scraper import Scraper
 
+# Boxscores are linked from the "Final" text in these cells of a gamesheet.
+GAMELINK_STRAINER = SoupStrainer('td', class_='right gamelink')
+
+# Crawl manifest kept in the html directory. See CrawlManifest.
+MANIFEST_FILENAME = 'manifest.tsv'
+
+# Pages that failed after every retry, rewritten at the end of each run.
+DEAD_LETTER_FILENAME = 'dead-letter.tsv'
 
-def make_dated_gamesheet_url(year, month, day):
+# Validators and bodies for conditional requests. See HttpCache.
+HTTP_CACHE_DIRNAME = 'http-cache'
+
+
+def make_dated_gamesheet_url(year, month, day, root_url=ROOT_URL):
     """Make absolute path to gamesheet for a given date. 
     
     Arguments:
         year (int) -- Year of gamesheet
         month (int) -- Month of gamesheet
         day (int) -- Day of gamesheet
+        root_url (str) -- Root url of the site. (default ROOT_URL)
         
     Returns:
         str -- Absolute path to gamesheet for given date.
@@ -32,45 +56,231 @@ def make_dated_gamesheet_url(year, month, day):
         > make_dated_url(2017, 2, 5)
         "http://www.sports-reference.com/cbb/boxscores/index.cgi?year=2017&month=2&day=5"
     """
-    return ROOT_URL + "cbb/boxscores/index.cgi?year={}&month={}&day={}".format(year, month, day)
+    return root_url + "cbb/boxscores/index.cgi?year={}&month={}&day={}".format(year, month, day)
 
 
-def make_dated_filepath(year, month, day):
-    """Make relative filepath to gamesheet for a given date. 
+def make_dated_filepath(year, month, day, html_dir='./../html/'):
+    """Make relative filepath to gamesheet for a given date, in the
+    partition of its season. See Seasons.
     
     Arguments:
         year (int) -- Year of gamesheet
         month (int) -- Month of gamesheet
         day (int) -- Day of gamesheet
+        html_dir (str) -- Directory holding the html cache. (default './../html/')
         
     Returns:
         str -- Relative filepath to gamesheet for given date.
         
     Example:
         > make_dated_filepath(2017, 2, 5)
-        "./../html/gamesheets/2017-2-5.txt"
+        "./../html/2017/gamesheets/2017-2-5.txt"
     """
-    return "./../html/gamesheets/{}-{}-{}.txt".format(year, month, day)
+    season = season_of(datetime.date(year, month, day))
+    return ospath.join(html_season_dir(season, html_dir), "gamesheets", "{}-{}-{}.txt".format(year, month, day))
+
+
+def make_boxscore_filepath(boxscore_url, html_dir='./../html/'):
+    """Make a unique relative filepath for a boxscore url, in the partition
+    of its season. Boxscore names start with the date of the game.
 
-def get_boxscore_urls(gamesheet_url):
-    """Collect boxscore urls from given gamesheet.
-    
     Arguments:
+        boxscore_url (str) -- Full url to boxscore.
+        html_dir (str) -- Directory holding the html cache. (default './../html/')
+
+    Returns:
+        str -- Relative filepath to boxscore.
+
+    Example:
+        > make_boxscore_filepath("http://www.sports-reference.com/cbb/boxscores/2017-02-03-ball-state.html")
+        "./../html/2017/boxscores/2017-02-03-ball-state.txt"
+    """
+    parent, child = ospath.split(boxscore_url)
+    child = child.replace('.html', '').strip(' ')
+    date = datetime.datetime.strptime(child[:len('2017-02-03')], '%Y-%m-%d')
+    return ospath.join(html_season_dir(season_of(date), html_dir), "boxscores", child + '.txt')
+
+
+def url_date(url):
+    """Date of the games on a gamesheet or boxscore url.
+
+    Example:
+        > url_date("http://www.sports-reference.com/cbb/boxscores/2017-02-03-ball-state.html")
+        datetime.date(2017, 2, 3)
+
+    Returns: datetime.date, or None for other urls.
+    """
+    parts = urlsplit(url)
+    if parts.path.endswith('index.cgi'):
+        params = parse_qs(parts.query)
+        try:
+            return datetime.date(*(int(params[k][0]) for k in ('year', 'month', 'day')))
+        except (KeyError, ValueError):
+            return None
+    try:
+        return datetime.datetime.strptime(ospath.basename(parts.path)[:len('2017-02-03')], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def make_http_cache(html_dir='./../html/', *, frozen_dates=False):
+    """HttpCache in html_dir, optionally never refetching pages of days
+    that were over when they were fetched.
+
+    Returns: HttpCache
+    """
+    frozen = FrozenDates(url_date) if frozen_dates else None
+    return HttpCache(ospath.join(html_dir, HTTP_CACHE_DIRNAME), frozen=frozen)
+
+
+def fetch_page(scraper, manifest, url, path, *, parent='', overwrite=False):
+    """Write a page to disk and record the attempt in the manifest.
+    A request that failed after every retry is recorded instead of raised.
+
+    Arguments:
+        scraper (Scraper) -- Scraper used to fetch the page.
+        manifest (CrawlManifest) -- Manifest to record the attempt in.
+        url (str) -- Full url to site.
+        path (str) -- Relative filepath to page.
+
+    Keyword arguments:
+        parent (str) -- Url of the gamesheet linking to this page. (default '')
+        overwrite (bool) -- Whether to overwrite a cached copy. (default False)
+
+    Returns: Tuple with success bool and the fetched bytes (None if cached or failed).
+    """
+    try:
+        html = scraper.write_html(url, path, overwrite=overwrite)
+    except (requests.exceptions.RequestException, InvalidPageError) as err:
+        print('\tfailed', url, err)
+        manifest.record(url, path, manifest.FAILED, parent=parent, error=err)
+        return False, None
+    manifest.record(url, path, manifest.OK, parent=parent, content=html)
+    return True, html
+
+
+def scrape_gamesheet(scraper, manifest, gamesheet_url, gamesheet_filepath, root_url=ROOT_URL,
+                     *, overwrite=False):
+    """Write a gamesheet to disk and collect its boxscore urls in one pass.
+    Urls come from the same response that was written, or from the local
+    file when the gamesheet is already cached, so each gamesheet is fetched
+    at most once.
+
+    Arguments:
+        scraper (Scraper) -- Scraper used to fetch the gamesheet.
+        manifest (CrawlManifest) -- Manifest to record the fetch in.
         gamesheet_url (str) -- Full url to gamesheet where boxscore url are found.
-       
-    Returns: List of boxscore urls.
+        gamesheet_filepath (str) -- Relative filepath to gamesheet.
+        root_url (str) -- Root url of the site. (default ROOT_URL)
+
+    Keyword arguments:
+        overwrite (bool) -- Whether to refetch a cached gamesheet. (default False)
+
+    Returns: List of boxscore urls, or None if the gamesheet could not be fetched.
+    """
+    ok, html = fetch_page(scraper, manifest, gamesheet_url, gamesheet_filepath, overwrite=overwrite)
+    if not ok:
+        return None
+    if html is None:
+        header, html = read_page(find_page(gamesheet_filepath))
+    return extract_boxscore_urls(parse_gamesheet_links(html), root_url)
+
+
+def gamesheet_is_stale(manifest, gamesheet_url, date):
+    """Whether a cached gamesheet was fetched before its day was over and may
+    be missing games. Gamesheets the manifest has never seen are not stale.
+
+    Returns: bool
     """
-    # gamesheet_url = "http://www.sports-reference.com/cbb/boxscores/index.cgi?month=02&day=03&year=2017"
-    r = requests.get(gamesheet_url)
-    soup = BeautifulSoup(r.content, 'html.parser')
+    return (manifest.get(gamesheet_url) is not None
+            and not manifest.fetched_after(gamesheet_url, date))
+
+
+def scrape_date(scraper, manifest, date, root_url=ROOT_URL, html_dir='./../html/'):
+    """Scrape the gamesheet and boxscores of one date, skipping every page the
+    manifest shows is already done. The gamesheet of a complete date is not
+    fetched at all.
+
+    A date is marked complete once its gamesheet was fetched after the day was
+    over and all of its boxscores are on disk.
+
+    Arguments:
+        scraper (Scraper) -- Scraper used to fetch pages.
+        manifest (CrawlManifest) -- Manifest of earlier runs.
+        date (datetime) -- Date to scrape.
+        root_url (str) -- Root url of the site. (default ROOT_URL)
+        html_dir (str) -- Directory holding the html cache. (default './../html/')
+
+    Returns: bool -- Whether the date is complete.
+    """
+    year, month, day = date.year, date.month, date.day
+    gamesheet_url = make_dated_gamesheet_url(year, month, day, root_url)
+    gamesheet_filepath = make_dated_filepath(year, month, day, html_dir)
+
+    if manifest.is_complete(gamesheet_url):
+        boxscore_urls = [entry['URL'] for entry in manifest.children(gamesheet_url)]
+    else:
+        boxscore_urls = scrape_gamesheet(scraper, manifest, gamesheet_url, gamesheet_filepath, root_url,
+                                         overwrite=gamesheet_is_stale(manifest, gamesheet_url, date))
+        if boxscore_urls is None:
+            return False
+
+    complete = True
+    for boxscore_url in boxscore_urls:
+        if manifest.is_fetched(boxscore_url):
+            continue
+        # Make a unique boxscore filepath for each url
+        boxscore_filepath = make_boxscore_filepath(boxscore_url, html_dir)
+        ok, html = fetch_page(scraper, manifest, boxscore_url, boxscore_filepath, parent=gamesheet_url)
+        complete = complete and ok
+
+    return mark_complete(manifest, gamesheet_url, gamesheet_filepath, date, complete)
+
 
+def mark_complete(manifest, gamesheet_url, gamesheet_filepath, date, boxscores_done):
+    """Mark a date complete if its gamesheet is final and its boxscores are done.
+
+    Returns: bool -- Whether the date is complete.
+    """
+    if manifest.is_complete(gamesheet_url):
+        return boxscores_done
+    if boxscores_done and manifest.fetched_after(gamesheet_url, date):
+        manifest.record(gamesheet_url, gamesheet_filepath, manifest.COMPLETE)
+        return True
+    return False
+
+
+def parse_gamesheet_links(html):
+    """Parse only the boxscore link cells of a gamesheet.
+
+    Arguments:
+        html (bytes) -- Gamesheet html, fetched or read from disk.
+
+    Returns: BeautifulSoup object holding the boxscore link cells.
+    """
+    return BeautifulSoup(html, 'html.parser', parse_only=GAMELINK_STRAINER)
+
+
+def extract_boxscore_urls(soup, root_url=ROOT_URL):
+    """Collect boxscore urls from a parsed gamesheet.
+
+    Arguments:
+        soup (BeautifulSoup) -- Parsed gamesheet.
+        root_url (str) -- Root url of the site. (default ROOT_URL)
+
+    Returns: List of boxscore urls.
+    """
     # I used the SelectorGadget to learn the class "teams" corresponds to boxscores
     boxscore_tags = soup.find_all(class_='right gamelink')
-    return [ROOT_URL + tag.a.get('href') for tag in boxscore_tags if tag.a]
+    return [root_url + tag.a.get('href') for tag in boxscore_tags if tag.a]
 
-def scrape_sports_reference():
+def scrape_sports_reference(start_date=datetime.datetime(year=2017, month=1, day=1),
+                            end_date=None, *, root_url=ROOT_URL,
+                            html_dir='./../html/', crawl_delay=3, compress=False,
+                            retries=5, timeout=30, jitter=0, min_crawl_delay=None,
+                            http_cache=False, frozen_dates=False):
     """Scrape gamesheets and boxscores from sports-reference.
-    Specify date range with while loop. 
+    Specify date range with start_date and end_date. 
     
     Sample gamesheet: 
         http://www.sports-reference.com/cbb/boxscores/index.cgi?month=02&day=03&year=2017
@@ -78,38 +288,223 @@ def scrape_sports_reference():
         http://www.sports-reference.com/cbb/boxscores/2017-02-03-ball-state.html
     
     Box scores are linked via the "Total" text beside each game score on the gamesheets page.
+    Every fetch is recorded in html_dir/manifest.tsv, so a rerun, e.g. after
+    a crash, only fetches dates that are not yet complete plus failed or
+    missing boxscores. Failed requests are retried with backoff first, and
+    pages that still failed are listed in html_dir/dead-letter.tsv.
+
+    With http_cache, refetched pages are requested conditionally and a 304
+    is served from html_dir/http-cache instead of downloaded again.
     
-    Todo:
-        Allow for command line interface using argparse library.
+    Arguments:
+        start_date (datetime) -- First date to scrape. (default 2017-01-01)
+        end_date (datetime) -- Last date to scrape. (default now)
+
+    Keyword arguments:
+        root_url (str) -- Root url of the site. (default ROOT_URL)
+        html_dir (str) -- Directory holding the html cache. (default './../html/')
+        crawl_delay (int, float) -- Seconds between request starts. Grows while the site
+            answers 429s or 5xx or slows down. (default 3)
+        compress (bool) -- Store raw responses gzip-compressed. (default False)
+        retries (int) -- Retries of a failed request. (default 5)
+        timeout (int, float) -- Seconds to wait for the server before a request fails. (default 30)
+        jitter (int, float) -- Randomly stretch each crawl delay by up to this share. (default 0)
+        min_crawl_delay (int, float) -- Shortest crawl delay while the site is healthy. (default crawl_delay)
+        http_cache (bool) -- Send conditional requests and serve 304s from disk. (default False)
+        frozen_dates (bool) -- Never refetch a cached page of a day that was over
+            when it was fetched. Implies http_cache. (default False)
+
+    Returns: int -- Number of pages that failed.
     """
-    scraper = Scraper(use_VPN=False, encoding='utf-8', crawl_delay=3)
-    
-    # Specify date range with start_date and end_date variables.
-    start_date = datetime.datetime(year=2017, month=1, day=1)
-    end_date = datetime.datetime.now()
+    cache = make_http_cache(html_dir, frozen_dates=frozen_dates) if http_cache or frozen_dates else None
+    scraper = Scraper(use_VPN=False, encoding='utf-8', crawl_delay=crawl_delay, compress=compress,
+                      retry=RetryPolicy(retries), timeout=timeout, jitter=jitter,
+                      min_crawl_delay=min_crawl_delay, http_cache=cache)
+    manifest = CrawlManifest(ospath.join(html_dir, MANIFEST_FILENAME))
     
+    try:
+        for date in date_range(start_date, end_date):
+            print(date.year, date.month, date.day)
+            scrape_date(scraper, manifest, date, root_url, html_dir)
+        manifest.compact()
+    finally:
+        failed = manifest.write_dead_letters(ospath.join(html_dir, DEAD_LETTER_FILENAME))
+        manifest.close()
+        if cache is not None:
+            cache.compact()
+            cache.close()
+
+    return failed
+
+
+def scrape_sports_reference_async(start_date=datetime.datetime(year=2017, month=1, day=1),
+                                  end_date=None, *, root_url=ROOT_URL,
+                                  html_dir='./../html/', crawl_delay=3, compress=False,
+                                  retries=5, timeout=30, jitter=0, min_crawl_delay=None,
+                                  http_cache=False, frozen_dates=False, max_in_flight=8):
+    """Scrape gamesheets and boxscores from sports-reference concurrently.
+
+    Every date is crawled at once. At most max_in_flight requests are open at
+    any time, and request starts on one host are spaced crawl_delay seconds
+    apart no matter how many are open. The delay grows while the site
+    struggles and shrinks back when it recovers. Uses the same manifest as
+    scrape_sports_reference.
+
+    Arguments:
+        start_date (datetime) -- First date to scrape. (default 2017-01-01)
+        end_date (datetime) -- Last date to scrape. (default now)
+
+    Keyword arguments:
+        root_url (str) -- Root url of the site. (default ROOT_URL)
+        html_dir (str) -- Directory holding the html cache. (default './../html/')
+        crawl_delay (int, float) -- Seconds between request starts on one host. (default 3)
+        compress (bool) -- Store raw responses gzip-compressed. (default False)
+        retries (int) -- Retries of a failed request. (default 5)
+        timeout (int, float) -- Seconds to wait for the server before a request fails. (default 30)
+        jitter (int, float) -- Randomly stretch each crawl delay by up to this share. (default 0)
+        min_crawl_delay (int, float) -- Shortest crawl delay while the site is healthy. (default crawl_delay)
+        http_cache (bool) -- Send conditional requests and serve 304s from disk. (default False)
+        frozen_dates (bool) -- Never refetch a cached page of a day that was over
+            when it was fetched. Implies http_cache. (default False)
+        max_in_flight (int) -- Maximum number of concurrent requests. (default 8)
+
+    Returns: dict -- CrawlStats summary with pages/sec, latency percentiles,
+        retries, the number of pages that failed and the final crawl delay.
+    """
+    limiter = HostRateLimiter(crawl_delay, min_interval=min_crawl_delay, jitter=jitter)
+    cache = make_http_cache(html_dir, frozen_dates=frozen_dates) if http_cache or frozen_dates else None
+    scraper = AsyncScraper(use_VPN=False, encoding='utf-8', compress=compress,
+                           retry=RetryPolicy(retries), timeout=timeout, rate_limiter=limiter,
+                           http_cache=cache, max_in_flight=max_in_flight)
+    manifest = CrawlManifest(ospath.join(html_dir, MANIFEST_FILENAME))
+
+    async def fetch_page_async(url, path, *, parent='', overwrite=False):
+        # Same as fetch_page, without blocking the event loop.
+        try:
+            html = await scraper.write_html(url, path, overwrite=overwrite)
+        except (requests.exceptions.RequestException, InvalidPageError) as err:
+            print('\tfailed', url, err)
+            manifest.record(url, path, manifest.FAILED, parent=parent, error=err)
+            return False, None
+        manifest.record(url, path, manifest.OK, parent=parent, content=html)
+        return True, html
+
+    async def scrape_date_async(date):
+        # Same as scrape_date, with the boxscores of a date fetched concurrently.
+        year, month, day = date.year, date.month, date.day
+        gamesheet_url = make_dated_gamesheet_url(year, month, day, root_url)
+        gamesheet_filepath = make_dated_filepath(year, month, day, html_dir)
+        loop = asyncio.get_running_loop()
+
+        if manifest.is_complete(gamesheet_url):
+            boxscore_urls = [entry['URL'] for entry in manifest.children(gamesheet_url)]
+        else:
+            ok, html = await fetch_page_async(gamesheet_url, gamesheet_filepath,
+                                              overwrite=gamesheet_is_stale(manifest, gamesheet_url, date))
+            if not ok:
+                return False
+            if html is None:
+                header, html = await loop.run_in_executor(None, read_page, find_page(gamesheet_filepath))
+            soup = await loop.run_in_executor(None, parse_gamesheet_links, html)
+            boxscore_urls = extract_boxscore_urls(soup, root_url)
+
+        results = await asyncio.gather(*(
+            fetch_page_async(boxscore_url, make_boxscore_filepath(boxscore_url, html_dir),
+                             parent=gamesheet_url)
+            for boxscore_url in boxscore_urls if not manifest.is_fetched(boxscore_url)))
+        print(year, month, day, end='         \r')
+        return mark_complete(manifest, gamesheet_url, gamesheet_filepath, date,
+                             all(ok for ok, html in results))
+
+    async def scrape_dates():
+        scraper.stats.start()
+        await asyncio.gather(*(scrape_date_async(date) for date in date_range(start_date, end_date)))
+
+    try:
+        asyncio.run(scrape_dates())
+        manifest.compact()
+    finally:
+        scraper.close()
+        failed = manifest.write_dead_letters(ospath.join(html_dir, DEAD_LETTER_FILENAME))
+        manifest.close()
+        if cache is not None:
+            cache.compact()
+            cache.close()
+
+    return dict(scraper.stats.summary(), failed=failed, crawl_delay=limiter.interval(root_url))
+
+
+def date_range(start_date, end_date=None):
+    """Yield each day from start_date through end_date.
+
+    Arguments:
+        start_date (datetime) -- First date.
+        end_date (datetime) -- Last date. (default now)
+
+    Yields: datetime
+    """
+    if end_date is None:
+        end_date = datetime.datetime.now()
     date = deepcopy(start_date)  # Always deepcopy containers
     one_day = datetime.timedelta(days=1)
     while start_date <= date <= end_date:
-        year, month, day = date.year, date.month, date.day
-        
-        print(year, month, day)
-        
-        gamesheet_url = make_dated_gamesheet_url(year, month, day)
-        gamesheet_filepath = make_dated_filepath(year, month, day)
-        scraper.write_html(gamesheet_url, gamesheet_filepath)
-        
-        for boxscore_url in get_boxscore_urls(gamesheet_url):
-            # Make a unique boxscore filepath for each url            
-            parent, child = ospath.split(boxscore_url)
-            child = child.replace('.html', '')
-            boxscore_filepath = "./../html/boxscores/" + child.strip(' ') + '.txt'
-            
-            scraper.write_html(boxscore_url, boxscore_filepath)
-        
+        yield date
         date += one_day
 
+
+def print_crawl_summary(summary):
+    """Print a CrawlStats summary to the command line. Returns: None"""
+    print()
+    print('{pages} pages in {elapsed:.1f}s ({pages_per_sec:.2f} pages/sec, {bytes} bytes)'.format(**summary))
+    print('latency p50 {p50:.3f}s  p95 {p95:.3f}s  p99 {p99:.3f}s  max {max:.3f}s'.format(**summary))
+    print('{retries} retries, {failed} pages failed, crawl delay ended at {crawl_delay:.2f}s'.format(**summary))
     return None
 
+
 if __name__ == '__main__':
-    scrape_sports_reference()
+    parse_date = lambda s: datetime.datetime.strptime(s, '%Y-%m-%d')
+    parser = argparse.ArgumentParser(description='Scrape gamesheets and boxscores from sports-reference.')
+    parser.add_argument('--start', type=parse_date, default=datetime.datetime(year=2017, month=1, day=1),
+                        help='first date to scrape, YYYY-MM-DD (default 2017-01-01)')
+    parser.add_argument('--end', type=parse_date, default=None,
+                        help='last date to scrape, YYYY-MM-DD (default today)')
+    parser.add_argument('--root-url', default=ROOT_URL,
+                        help='root url of the site, e.g. a LocalServer stand-in')
+    parser.add_argument('--html-dir', default='./../html/')
+    parser.add_argument('--crawl-delay', type=float, default=3)
+    parser.add_argument('--jitter', type=float, default=0,
+                        help='randomly stretch each crawl delay by up to this share, e.g. 0.5')
+    parser.add_argument('--min-crawl-delay', type=float, default=None,
+                        help='shortest crawl delay to speed up to while the site is healthy (default --crawl-delay)')
+    parser.add_argument('--compress', action='store_true',
+                        help='store raw responses gzip-compressed in txt.gz files')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='crawl many pages concurrently')
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--retries', type=int, default=5,
+                        help='retries of a failed request, with exponential backoff (default 5)')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--http-cache', action='store_true',
+                        help='send conditional requests and serve 304s from html-dir/http-cache')
+    parser.add_argument('--frozen-dates', action='store_true',
+                        help='never refetch cached pages of days that were over when fetched')
+    args = parser.parse_args()
+
+    if args.use_async:
+        summary = scrape_sports_reference_async(args.start, args.end, root_url=args.root_url,
+                                                html_dir=args.html_dir, crawl_delay=args.crawl_delay,
+                                                compress=args.compress, retries=args.retries,
+                                                timeout=args.timeout, jitter=args.jitter,
+                                                min_crawl_delay=args.min_crawl_delay,
+                                                http_cache=args.http_cache, frozen_dates=args.frozen_dates,
+                                                max_in_flight=args.max_in_flight)
+        print_crawl_summary(summary)
+    else:
+        failed = scrape_sports_reference(args.start, args.end, root_url=args.root_url,
+                                         html_dir=args.html_dir, crawl_delay=args.crawl_delay,
+                                         compress=args.compress, retries=args.retries, timeout=args.timeout,
+                                         jitter=args.jitter, min_crawl_delay=args.min_crawl_delay,
+                                         http_cache=args.http_cache, frozen_dates=args.frozen_dates)
+        print()
+        print(failed, 'pages failed. See', ospath.join(args.html_dir, DEAD_LETTER_FILENAME))
+
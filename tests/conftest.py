@@ -0,0 +1,75 @@
+"""
+Shared setup of the tests. The modules in src import each other by name and
+are run from src, so src goes on the path and data paths are absolute.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+HTML_DIR = os.path.join(ROOT_DIR, 'html')
+
+sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture(scope='session')
+def bracket():
+    """Bracket of data/Bracket.csv."""
+    from Bracket import Bracket
+    return Bracket(os.path.join(DATA_DIR, 'Bracket.csv'))
+
+
+@pytest.fixture
+def server():
+    """LocalServer serving the sample pages, 404 for anything else."""
+    from LocalServer import LocalServer
+    with LocalServer(HTML_DIR, strict=True) as server:
+        yield server
+
+
+def boxscore_urls(server):
+    """Urls of the sample boxscores on server."""
+    names = sorted(os.listdir(os.path.join(HTML_DIR, 'sample-boxscores')))
+    return [server.url + 'cbb/boxscores/' + name.split('.')[0] + '.html' for name in names]
+
+
+def load_script(name):
+    """Import a hyphenated script in src as a module."""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(name.replace('-', '_'), os.path.join(SRC_DIR, name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_scraper(cls=None, retries=3, **kwargs):
+    """Scraper with no waits. scraper.requests holds the url and status of
+    every response, scraper.attempts counts every failed attempt."""
+    from RateLimiter import HostRateLimiter
+    from RetryPolicy import RetryPolicy
+    from Scraper import Scraper
+
+    cls = cls or Scraper
+    scraper = cls(retry=RetryPolicy(retries, base=0, cap=0),
+                  rate_limiter=HostRateLimiter(0, adaptive=False), **kwargs)
+    scraper.requests = []
+    scraper.attempts = 0
+    get = scraper._get
+    backoff = scraper._retry.backoff
+
+    def counted_get(url):
+        r = get(url)
+        scraper.requests.append((url, r.status_code))
+        return r
+
+    def counted_backoff(attempt, err):
+        scraper.attempts += 1
+        return backoff(attempt, err)
+
+    scraper._get = counted_get
+    scraper._retry.backoff = counted_backoff
+    return scraper
@@ -0,0 +1,12 @@
+import numpy as np
+import pytest
+
+from BracketOptimizer import DEFAULT_POINTS, BracketOptimizer
+
+
+def test_points_must_cover_every_round(bracket):
+    P = np.full((len(bracket),) * 2, 0.5)
+    with pytest.raises(ValueError, match='7 values'):
+        BracketOptimizer(bracket, P, DEFAULT_POINTS[1:])
+    optimizer = BracketOptimizer(bracket, P, DEFAULT_POINTS)
+    assert optimizer.points.max() == 320
@@ -0,0 +1,52 @@
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+
+from BracketServer import UNKNOWN_ENDPOINT, BracketServer, HTTPError, load_test
+from conftest import DATA_DIR
+
+
+@pytest.fixture(scope='module')
+def teams():
+    return pd.read_csv(os.path.join(DATA_DIR, 'Teams.csv'), index_col=False)
+
+
+@pytest.fixture(scope='module')
+def scored_matchups():
+    ScoredMatchups = pd.read_csv(os.path.join(DATA_DIR, 'ScoredMatchups.csv'), index_col=False)
+    # Full probabilities, as MatchupScorer.py writes them
+    return ScoredMatchups.assign(Pred=0.25 + 0.5 * ScoredMatchups['PredWin'])
+
+
+def test_refuses_picks_without_probabilities(teams, scored_matchups):
+    with pytest.raises(ValueError, match='MatchupScorer'):
+        BracketServer(os.path.join(DATA_DIR, 'Bracket.csv'), scored_matchups.drop(columns='Pred'), Teams=teams)
+
+
+def test_refuses_a_team_against_itself(teams, scored_matchups):
+    server = BracketServer(os.path.join(DATA_DIR, 'Bracket.csv'), scored_matchups, Teams=teams)
+    assert server.probability(1000, 1000) is None
+    with pytest.raises(HTTPError) as error:
+        asyncio.run(server.handle('/probability?id1=1000&id2=1000'))
+    assert error.value.status == 400
+
+
+def test_unknown_paths_share_one_metric(teams, scored_matchups):
+    server = BracketServer(os.path.join(DATA_DIR, 'Bracket.csv'), scored_matchups, Teams=teams)
+
+    async def run():
+        await server.start('127.0.0.1', 0)
+        try:
+            paths = ['/health', '/health/'] + ['/nope/{}'.format(i) for i in range(20)]
+            return await load_test(server.url, paths, requests=len(paths), concurrency=1)
+        finally:
+            await server.stop()
+
+    result = asyncio.run(run())
+    assert result['errors'] == 20
+    endpoints = server.stats.summary()['endpoints']
+    assert set(endpoints) == {'/health', UNKNOWN_ENDPOINT}
+    assert endpoints[UNKNOWN_ENDPOINT]['requests'] == 20
+    assert endpoints['/health']['requests'] == 2
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from BracketSimulator import BracketSimulator
+from BracketSolver import BracketSolver
+
+RESULTS = [None, {22000: 'Wisconsin'}, {21000: "Mount St. Mary's", 24001: 'Gonzaga'}]
+
+
+def random_win_matrix(n, seed=0):
+    """Win matrix with P[i, j] + P[j, i] == 1."""
+    P = np.random.default_rng(seed).uniform(0.05, 0.95, (n, n))
+    P = np.triu(P, 1)
+    P = P + (1 - P.T) * np.tri(n, k=-1)
+    np.fill_diagonal(P, 0.5)
+    return P
+
+
+@pytest.mark.parametrize('results', RESULTS)
+@pytest.mark.parametrize('even', [True, False])
+def test_reach_never_increases(bracket, results, even):
+    P = np.full((len(bracket),) * 2, 0.5) if even else random_win_matrix(len(bracket))
+    reach = BracketSolver(bracket, P).advancement(results).to_numpy()
+    assert (np.diff(reach, axis=1) <= 1e-12).all()
+
+
+def test_forced_result_decides_path(bracket):
+    P = np.full((len(bracket),) * 2, 0.5)
+    Advancement = BracketSolver(bracket, P).advancement({22000: 'Wisconsin'})
+    assert Advancement.loc['Wisconsin', ['R32', 'S16']].tolist() == [1.0, 1.0]
+    assert Advancement.loc['Virginia Tech', 'R32'] == 0.0
+    assert np.allclose(Advancement.sum(axis=0).iloc[1:], [32, 16, 8, 4, 2, 1])
+
+
+@pytest.mark.parametrize('results', [{22000: 'Wisconsin', 21000: 'Wisconsin'},
+                                     {22000: 'Wisconsin', 22001: 'Wisconsin'},
+                                     {22000: 'Wisconsin', 21001: 'Virginia Tech'},
+                                     {99999: 'Wisconsin'}])
+def test_impossible_results_raise(bracket, results):
+    with pytest.raises(ValueError):
+        BracketSolver(bracket, np.full((len(bracket),) * 2, 0.5)).advancement(results)
+
+
+@pytest.mark.parametrize('results', RESULTS)
+def test_solver_matches_simulator(bracket, results):
+    P = random_win_matrix(len(bracket))
+    exact = BracketSolver(bracket, P).advancement(results)
+    simulated = BracketSimulator(bracket, P).simulate(200000, seed=0, results=results)
+    # Standard error is at most 0.5 / sqrt(200000) ~ 0.0011.
+    assert np.abs(exact - simulated).to_numpy().max() < 0.006
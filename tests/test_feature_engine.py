@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from FeatureEngine import FeatureEngine
+
+
+@pytest.fixture(scope='module')
+def game_stats():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2017-01-01', periods=6)
+    GameStats = pd.DataFrame({'Date': np.tile(dates, 2), 'TeamName': np.repeat(['Duke', 'Villanova'], 6),
+                              'FG': rng.integers(20, 40, 12).astype(float)})
+    GameStats.loc[3, 'FG'] = np.nan
+    return GameStats
+
+
+@pytest.mark.parametrize('min_periods, pandas_min_periods', [(1, 1), (2, 2), (None, 3)])
+def test_window_mean_matches_pandas_rolling(game_stats, min_periods, pandas_min_periods):
+    engine = FeatureEngine(['FG'], windows=(3,), min_periods=min_periods, cumulative=False)
+    Features = engine.fit_transform(game_stats).sort_index()
+    # The notebook's rolling mean of each team's previous games
+    expected = (game_stats.groupby('TeamName')['FG']
+                .transform(lambda s: s.shift(1).rolling(3, min_periods=pandas_min_periods).mean()))
+    np.testing.assert_allclose(Features['FG3GameAvg'], expected)
+
+
+def test_full_window_leaves_first_games_missing(game_stats):
+    Features = FeatureEngine(['FG'], windows=(3,), min_periods=None).fit_transform(game_stats)
+    first = Features.groupby('TeamName').head(3)
+    assert first['FG3GameAvg'].isna().all()
@@ -0,0 +1,86 @@
+import datetime
+import os
+
+from conftest import boxscore_urls, make_scraper
+from HttpCache import FrozenDates, HttpCache
+
+
+def spy(obj, name):
+    """Record the arguments of every call to obj.name in a list."""
+    calls = []
+    method = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return method(*args, **kwargs)
+
+    setattr(obj, name, wrapper)
+    return calls
+
+
+def test_not_modified_serves_cached_body(server, tmp_path):
+    cache = HttpCache(str(tmp_path / 'http-cache'))
+    scraper = make_scraper(http_cache=cache)
+    url = boxscore_urls(server)[0]
+    content = scraper.fetch(url)
+    assert cache.headers(url)['If-None-Match']
+
+    refreshed = spy(cache, 'refresh')
+    assert scraper.fetch(url) == content
+    assert [status for _, status in scraper.requests] == [200, 304]
+    assert [args[0] for args in refreshed] == [url]
+    cache.close()
+
+
+def test_cache_survives_reopening(server, tmp_path):
+    cache = HttpCache(str(tmp_path / 'http-cache'))
+    url = boxscore_urls(server)[0]
+    content = make_scraper(http_cache=cache).fetch(url)
+    cache.compact()
+    cache.close()
+
+    cache = HttpCache(str(tmp_path / 'http-cache'))
+    scraper = make_scraper(http_cache=cache)
+    assert scraper.fetch(url) == content
+    assert [status for _, status in scraper.requests] == [304]
+    cache.close()
+
+
+def test_frozen_dates_skip_the_request(server, tmp_path):
+    # Sample boxscores are from 2017, long over when they were fetched.
+    frozen = FrozenDates(lambda url: datetime.date(2017, 2, 4))
+    cache = HttpCache(str(tmp_path / 'http-cache'), frozen=frozen)
+    scraper = make_scraper(http_cache=cache)
+    url = boxscore_urls(server)[0]
+    content = scraper.fetch(url)
+    assert scraper.fetch(url) == content
+    assert len(scraper.requests) == 1
+
+    # Pages of today may still change.
+    cache.frozen = FrozenDates(lambda url: datetime.date.today())
+    assert scraper.fetch(url) == content
+    assert [status for _, status in scraper.requests] == [200, 304]
+    cache.close()
+
+
+def test_frozen_page_on_disk_is_not_rewritten(server, tmp_path):
+    cache = HttpCache(str(tmp_path / 'http-cache'), frozen=FrozenDates(lambda url: datetime.date(2017, 2, 4)))
+    scraper = make_scraper(http_cache=cache)
+    url, path = boxscore_urls(server)[0], str(tmp_path / 'page.txt')
+    assert scraper.write_html(url, path) is not None
+    assert scraper.write_html(url, path, overwrite=True) is None
+    assert len(scraper.requests) == 1
+    cache.close()
+
+
+def test_missing_body_is_fetched_again(server, tmp_path):
+    cache = HttpCache(str(tmp_path / 'http-cache'))
+    scraper = make_scraper(http_cache=cache)
+    url = boxscore_urls(server)[0]
+    content = scraper.fetch(url)
+    os.remove(cache.entries[url]['Path'])
+
+    assert scraper.fetch(url) == content
+    assert [status for _, status in scraper.requests] == [200, 304, 200]
+    assert cache.body(url) == content
+    cache.close()
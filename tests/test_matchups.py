@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_DIR
+from PutIDFiles import make_matchups
+
+
+@pytest.fixture(scope='module')
+def teams():
+    return pd.read_csv(os.path.join(DATA_DIR, 'Teams.csv'), index_col=False)
+
+
+@pytest.fixture(scope='module')
+def matchups_csv():
+    return pd.read_csv(os.path.join(DATA_DIR, 'Matchups.csv'), index_col=False)
+
+
+def test_make_matchups_keeps_file_order(teams, matchups_csv):
+    Matchups = make_matchups(teams)
+    assert len(Matchups) == len(matchups_csv)
+    for c in ('TeamID1', 'TeamID2'):
+        assert np.array_equal(Matchups[c].to_numpy(), matchups_csv[c].to_numpy())
+    assert np.array_equal(Matchups['Team1'].astype(str).to_numpy(), matchups_csv['Team1'].to_numpy())
+
+
+@pytest.fixture(scope='module')
+def index(teams):
+    from MatchupIndex import MatchupIndex
+    return MatchupIndex(teams)
+
+
+@pytest.mark.parametrize('row, MatchupID', [(0, '1000_1001'), (1, '1000_1002'), (2, '1001_1002'),
+                                            (3, '1000_1003'), (4, '1001_1003')])
+def test_pair_ids_of_known_rows(index, row, MatchupID):
+    TeamID1, TeamID2 = map(int, MatchupID.split('_'))
+    assert index.pair_ids(TeamID1, TeamID2) == row
+    assert index.pair_ids(TeamID2, TeamID1) == row
+    assert [int(t) for t in index.team_ids(row)] == [TeamID1, TeamID2]
+    assert index.matchups([row])['MatchupID'].tolist() == [MatchupID]
+
+
+def test_pair_id_is_row_of_matchups_csv(index, matchups_csv):
+    assert len(index) == len(matchups_csv)
+    pair_ids = index.pair_ids(matchups_csv['TeamID1'], matchups_csv['TeamID2'])
+    assert np.array_equal(pair_ids, np.arange(len(matchups_csv)))
+    TeamID1, TeamID2 = index.team_ids(pair_ids)
+    assert np.array_equal(TeamID1, matchups_csv['TeamID1'])
+    assert np.array_equal(TeamID2, matchups_csv['TeamID2'])
+    rows = [0, 371, 372, 20000, len(matchups_csv) - 1]
+    assert index.matchups(rows)['MatchupID'].tolist() == matchups_csv['MatchupID'].iloc[rows].tolist()
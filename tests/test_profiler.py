@@ -0,0 +1,42 @@
+import pstats
+import threading
+
+from Profiler import Profiler
+
+
+def square(x):
+    return x * x
+
+
+def test_cprofile_adds_up_every_call(tmp_path):
+    profiler = Profiler()
+    ofile = str(tmp_path / 'profile.json')
+    profiler.enable(ofile, cprofile=['stage'])
+    for x in range(5):
+        with profiler.timer('stage', x):
+            square(x)
+    profiler.dump()
+
+    stats = pstats.Stats(ofile + '.stage.prof').stats
+    calls = [v[1] for (path, line, func), v in stats.items() if func == 'square']
+    assert calls == [5]
+    assert profiler.summary()['Timers']['stage']['Calls'] == 5
+
+
+def test_cprofile_from_threads(tmp_path):
+    profiler = Profiler()
+    profiler.enable(str(tmp_path / 'profile.json'), cprofile=['stage'])
+
+    def work():
+        for x in range(200):
+            with profiler.timer('stage'):
+                square(x)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    profiler.dump()
+    assert profiler.summary()['Timers']['stage']['Calls'] == 800
+    assert not profiler._cprofile_active
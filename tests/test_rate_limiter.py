@@ -0,0 +1,34 @@
+import pytest
+
+from RateLimiter import HostRateLimiter
+
+URL = 'http://127.0.0.1/cbb/boxscores/'
+
+
+@pytest.mark.parametrize('status', [None, 429, 503])
+def test_failed_requests_slow_down(status):
+    limiter = HostRateLimiter(1)
+    limiter.record(URL, status, 0.01)
+    assert limiter.interval(URL) == 2
+
+
+def test_slowdowns_do_not_compound_within_an_interval():
+    limiter = HostRateLimiter(1)
+    for status in (None, 503, None):
+        limiter.record(URL, status, 0.01)
+    assert limiter.interval(URL) == 2
+    assert limiter.summary()['127.0.0.1']['Slowdowns'] == 1
+
+
+def test_healthy_responses_speed_back_up():
+    limiter = HostRateLimiter(1)
+    limiter.record(URL, None, 0.01)
+    for _ in range(20):
+        limiter.record(URL, 200, 0.01)
+    assert limiter.interval(URL) == 1
+
+
+def test_not_adaptive():
+    limiter = HostRateLimiter(1, adaptive=False)
+    limiter.record(URL, None, 0.01)
+    assert limiter.interval(URL) == 1
@@ -0,0 +1,74 @@
+import asyncio
+import csv
+import inspect
+
+from bs4 import BeautifulSoup
+import pytest
+
+from AsyncScraper import AsyncScraper
+from conftest import HTML_DIR, boxscore_urls, load_script, make_scraper
+from CrawlManifest import CrawlManifest
+from LocalServer import LocalServer
+from Scraper import Scraper
+
+scrape = load_script('scrape-sportsreference-cbb')
+
+
+def test_async_make_soup_is_awaited(server):
+    scraper = AsyncScraper(crawl_delay=0)
+    try:
+        assert inspect.iscoroutinefunction(scraper.make_soup)
+        soup = asyncio.run(scraper.make_soup(boxscore_urls(server)[0]))
+    finally:
+        scraper.close()
+    assert isinstance(soup, BeautifulSoup)
+    assert soup.find('html') is not None
+
+
+def test_failed_pages_end_in_dead_letters(tmp_path):
+    manifest = CrawlManifest(str(tmp_path / 'manifest.tsv'))
+    scraper = make_scraper(retries=3)
+    with LocalServer(HTML_DIR, strict=True, failure_rate=1, seed=0) as server:
+        url = boxscore_urls(server)[0]
+        ok, html = scrape.fetch_page(scraper, manifest, url, str(tmp_path / 'page.txt'))
+    assert not ok and html is None
+    assert scraper.attempts == 4
+    assert len(manifest.failed()) == 1
+    assert manifest.write_dead_letters(str(tmp_path / 'dead-letter.tsv')) == 1
+    with open(tmp_path / 'dead-letter.tsv', newline='') as f:
+        rows = list(csv.DictReader(f, delimiter='\t'))
+    assert [row['URL'] for row in rows] == [url]
+    assert rows[0]['Error']
+    assert not list(tmp_path.glob('page.txt*'))
+    manifest.close()
+
+
+def test_missing_pages_are_not_retried(server, tmp_path):
+    manifest = CrawlManifest(str(tmp_path / 'manifest.tsv'))
+    scraper = make_scraper(retries=3)
+    ok, html = scrape.fetch_page(scraper, manifest, server.url + 'cbb/boxscores/nope.html',
+                                 str(tmp_path / 'nope.txt'))
+    assert not ok
+    assert [status for url, status in scraper.requests] == [404]
+    assert scraper.attempts == 1
+    assert manifest.write_dead_letters(str(tmp_path / 'dead-letter.tsv')) == 1
+    manifest.close()
+
+
+@pytest.mark.parametrize('cls', [Scraper, AsyncScraper])
+def test_flaky_server_pages_recover(tmp_path, cls):
+    scraper = make_scraper(cls, retries=10)
+    with LocalServer(HTML_DIR, strict=True, failure_rate=0.3, seed=1) as server:
+        jobs = [(url, str(tmp_path / '{}.txt'.format(i))) for i, url in enumerate(boxscore_urls(server))]
+        try:
+            if cls is AsyncScraper:
+                asyncio.run(scraper.crawl(jobs))
+            else:
+                for url, path in jobs:
+                    scraper.write_html(url, path)
+        finally:
+            if cls is AsyncScraper:
+                scraper.close()
+    assert scraper.attempts > 0
+    assert len(list(tmp_path.glob('*.txt'))) == len(jobs)
+    assert not list(tmp_path.glob('*.tmp'))
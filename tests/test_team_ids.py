@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_DIR, SRC_DIR
+import PutIDFiles
+from PutIDFiles import put_game_ids, team_dtype
+from PutModelData import ModelData
+
+SAMPLE_BOXSCORES = os.path.join(SRC_DIR, '..', 'data-raw', 'sample-boxscores.txt')
+SAMPLE_GAMESHEETS = os.path.join(SRC_DIR, '..', 'data-raw', 'sample-gamesheets.txt')
+
+
+@pytest.fixture
+def sample_data(monkeypatch):
+    # Default paths are relative to src.
+    monkeypatch.chdir(SRC_DIR)
+    return ModelData(SAMPLE_BOXSCORES, SAMPLE_GAMESHEETS)
+
+
+def test_model_data_codes_match_team_ids(sample_data):
+    Teams = pd.read_csv(os.path.join(DATA_DIR, 'Teams.csv'), index_col=False)
+    names = sample_data.game_results()['TeamName']
+    known = names.astype(str).isin(Teams['TeamName']).to_numpy()
+    assert known.any()
+    expected = team_dtype(Teams).categories.get_indexer(names.astype(str))
+    assert np.array_equal(names.cat.codes.to_numpy()[known], expected[known])
+
+
+def test_put_game_ids_rejects_unknown_teams(sample_data, monkeypatch, tmp_path):
+    Teams = pd.read_csv(os.path.join(DATA_DIR, 'Teams.csv'), index_col=False)
+    missing = sample_data.game_results()['TeamName'].astype(str).iloc[0]
+    monkeypatch.setattr(PutIDFiles, 'put_team_ids', lambda **kwargs: Teams[Teams['TeamName'] != missing])
+    monkeypatch.setattr(PutIDFiles, 'get_season_data', lambda seasons: sample_data)
+    with pytest.raises(ValueError, match=missing):
+        put_game_ids(str(tmp_path / 'Games.csv'), verbose=False)
+    assert not (tmp_path / 'Games.csv').exists()
+
+
+def test_missing_mined_data_is_named(tmp_path):
+    from GamesheetMiner import GamesheetMiner
+    from PutModelData import read_mined
+    path = str(tmp_path / '2017' / 'gamesheets.txt')
+    with pytest.raises(FileNotFoundError, match='GamesheetMiner'):
+        read_mined(path, GamesheetMiner.DTYPES)
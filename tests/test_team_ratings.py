@@ -0,0 +1,32 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import TeamRatings
+from TeamRatings import MarginRatings
+
+# A beats B by 10, B beats C by 5 and A beats C by 15, so A - B = 10 and
+# B - C = 5 exactly. The ridge centers the ratings on 0.
+GAMESHEETS = pd.DataFrame({'Date': pd.to_datetime(['2017-02-01'] * 3),
+                           'WinningTeam': ['A', 'B', 'A'], 'WinningScore': [80, 75, 85],
+                           'LosingTeam': ['B', 'C', 'C'], 'LosingScore': [70, 70, 70]})
+
+
+def test_margin_ratings_recover_known_system():
+    ratings = MarginRatings(ridge=1e-6)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        ratings.fit(GAMESHEETS)
+    assert np.allclose(ratings.ratings[['A', 'B', 'C']], [25 / 3, -5 / 3, -20 / 3], atol=1e-3)
+    assert ratings.sigma < 1e-3
+
+
+def test_margin_ratings_report_solver_failures(monkeypatch):
+    monkeypatch.setattr(TeamRatings, 'cg', lambda A, b, x0: (x0, 7))
+    with pytest.warns(RuntimeWarning, match='2017-02-01'):
+        MarginRatings().fit(GAMESHEETS)
+    monkeypatch.setattr(TeamRatings, 'cg', lambda A, b, x0: (x0, -1))
+    with pytest.raises(ValueError):
+        MarginRatings().fit(GAMESHEETS)